@@ -3,6 +3,7 @@ Point d'entrée principal de l'API pour le système de JDR avec IA
 """
 
 import sys
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 import uvicorn
@@ -11,12 +12,15 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse
 from fastapi.staticfiles import StaticFiles
 
-from backend.config import API_CONFIG, SECURITY_CONFIG
+from backend.config import API_CONFIG, MAINTENANCE_CONFIG, SECURITY_CONFIG
 from backend.routes.characters import router as characters_router
 from backend.routes.chat import router as chat_router
 from backend.routes.memory import router as memory_router
 from backend.routes.system import router as system_router
+from backend.services.access_tracker import access_tracker
 from backend.services.llm_service import llm_service
+from backend.services.maintenance_scheduler import maintenance_scheduler
+from backend.services.memory_pipeline import memory_pipeline
 from backend.utils.errors import configure_exception_handlers
 from backend.utils.logging_config import configure_http_logging, setup_logging
 
@@ -41,10 +45,30 @@ if llm_service.mock_mode:
         "Démarrez Ollama et installez un modèle pour des réponses réelles."
     )
 else:
-    logger.info("LLM réel actif (mode mock désactivé).")
+    logger.info("LLM réel demandé : modèle vérifié et préchargé en arrière-plan.")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Démarrage et arrêt de l'application"""
+    # Vérifier la disponibilité du modèle et le précharger sans bloquer le démarrage
+    llm_service.start()
+    if MAINTENANCE_CONFIG["enabled"]:
+        maintenance_scheduler.start()
+    # Reprendre les mémorisations interrompues par un arrêt précédent
+    memory_pipeline.recover()
+    yield
+    memory_pipeline.stop()
+    maintenance_scheduler.stop()
+    # Écrire en base les accès aux mémoires encore en attente
+    access_tracker.close()
+    llm_service.stop()
+    await llm_service.aclose()
+
 
 # Initialisation de l'application FastAPI
 app = FastAPI(
+    lifespan=lifespan,
     title="Alezia AI - Système de JDR avec IA non censurée",
     description="API pour interagir avec des personnages IA dans divers univers",
     version="0.1.0",
@@ -126,6 +150,7 @@ async def health_check():
         "status": "healthy",
         "api": "online",
         "database": "connected",  # À implémenter avec une vérification réelle
+        "llm": llm_service.registry.status(),
     }
 
 
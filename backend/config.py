@@ -20,6 +20,26 @@ LLM_CONFIG = {
     'mock_mode': config('LLM_MOCK_MODE', default=False, cast=bool),
     'temperature': config('LLM_TEMPERATURE', default=0.7, cast=float),
     'max_tokens': config('LLM_MAX_TOKENS', default=1024, cast=int),
+    # Client HTTP vers Ollama : pool keep-alive, délais (s) et relances
+    'connect_timeout': config('LLM_CONNECT_TIMEOUT', default=3.0, cast=float),
+    'read_timeout': config('LLM_READ_TIMEOUT', default=120.0, cast=float),
+    'max_retries': config('LLM_MAX_RETRIES', default=2, cast=int),
+    'retry_backoff': config('LLM_RETRY_BACKOFF', default=0.5, cast=float),
+    'pool_size': config('LLM_POOL_SIZE', default=10, cast=int),
+    # Ordonnanceur des générations : concurrence, files d'attente, délai (s)
+    'max_in_flight': config('LLM_MAX_IN_FLIGHT', default=2, cast=int),
+    'max_queue': config('LLM_MAX_QUEUE', default=32, cast=int),
+    'max_queue_per_user': config('LLM_MAX_QUEUE_PER_USER', default=4, cast=int),
+    'background_slots': config('LLM_BACKGROUND_SLOTS', default=1, cast=int),
+    'queue_timeout': config('LLM_QUEUE_TIMEOUT', default=60.0, cast=float),
+    # Réutilisation du contexte KV entre les tours d'une session
+    'keep_alive': config('LLM_KEEP_ALIVE', default='30m'),
+    'context_sessions': config('LLM_CONTEXT_SESSIONS', default=256, cast=int),
+    # Durée (s) du cache de la liste des modèles, vérifiée en arrière-plan
+    'model_check_ttl': config('LLM_MODEL_CHECK_TTL', default=60.0, cast=float),
+    # Embeddings via /api/embed (modèle par défaut si vide), par lots de N textes
+    'embedding_model': config('LLM_EMBEDDING_MODEL', default=''),
+    'embedding_batch_size': config('LLM_EMBEDDING_BATCH_SIZE', default=256, cast=int),
 }
 
 # API configuration
@@ -30,6 +50,8 @@ API_CONFIG = {
     'debug': True,
     'workers': 4,  # Number of Uvicorn workers
     'timeout': 120,  # Timeout for long requests
+    # Threads for blocking work (SQLite, embeddings) in async chat routes
+    'blocking_threads': config('API_BLOCKING_THREADS', default=8, cast=int),
 }
 
 # Embeddings configuration
@@ -38,7 +60,85 @@ EMBEDDING_CONFIG = {
     'cache_dir': DATA_DIR / 'embeddings',
     'dimensions': config('EMBEDDING_DIMENSIONS', default=384, cast=int),
     'use_gpu': config('EMBEDDING_USE_GPU', default=False, cast=bool),
+    # Calcul des embeddings : 'sentence-transformers' (local) ou 'ollama'
+    # (LLM_EMBEDDING_MODEL ; ajuster EMBEDDING_DIMENSIONS à sa taille)
+    'backend': config('EMBEDDING_BACKEND', default='sentence-transformers'),
     'mock_mode': config('EMBEDDING_MOCK_MODE', default=True, cast=bool),
+    # Format binaire des embeddings en base : 'float32' ou 'float16'
+    'storage_dtype': config('EMBEDDING_STORAGE_DTYPE', default='float32'),
+    # Recherche : 'exact' (balayage NumPy) ou 'ivf' (index approché)
+    'index_backend': config('EMBEDDING_INDEX_BACKEND', default='exact'),
+    'ann_min_size': config('EMBEDDING_ANN_MIN_SIZE', default=20000, cast=int),
+    'ivf_nlist': config('EMBEDDING_IVF_NLIST', default=0, cast=int),  # 0 = auto
+    'ivf_nprobe': config('EMBEDDING_IVF_NPROBE', default=8, cast=int),
+    # Vecteurs de l'index en RAM : 'none' (float32) ou 'int8' (4x moins de
+    # mémoire) ; en int8, les N meilleures candidates sont rescorées en float32
+    'index_quantization': config('EMBEDDING_INDEX_QUANTIZATION', default='none'),
+    'rescore_candidates': config('EMBEDDING_RESCORE_CANDIDATES', default=200, cast=int),
+    # Micro-lots : encodages concurrents regroupés en un seul appel au modèle
+    'batch_max_size': config('EMBEDDING_BATCH_MAX_SIZE', default=32, cast=int),
+    'batch_max_wait_ms': config('EMBEDDING_BATCH_MAX_WAIT_MS', default=5, cast=float),
+    # Cache (modèle, hash du texte) -> vecteur : LRU mémoire + SQLite sous cache_dir
+    'cache_max_bytes': config(
+        'EMBEDDING_CACHE_MAX_BYTES', default=64 * 1024 * 1024, cast=int
+    ),
+    'cache_persist': config('EMBEDDING_CACHE_PERSIST', default=True, cast=bool),
+}
+
+# Memory configuration
+MEMORY_CONFIG = {
+    # Accès aux mémoires : tampon écrit en base toutes les N secondes
+    # ou dès que le seuil de mémoires en attente est atteint
+    'access_flush_interval': config(
+        'MEMORY_ACCESS_FLUSH_INTERVAL', default=5.0, cast=float
+    ),
+    'access_flush_threshold': config(
+        'MEMORY_ACCESS_FLUSH_THRESHOLD', default=500, cast=int
+    ),
+    # Traitement des échanges après la réponse (embed -> importance -> faits -> traits)
+    'pipeline_workers': config('MEMORY_PIPELINE_WORKERS', default=2, cast=int),
+    'pipeline_max_attempts': config(
+        'MEMORY_PIPELINE_MAX_ATTEMPTS', default=5, cast=int
+    ),
+    'pipeline_retry_delay': config(
+        'MEMORY_PIPELINE_RETRY_DELAY', default=2.0, cast=float
+    ),
+    # Un job 'running' sans progrès depuis N secondes (processus arrêté)
+    # peut être repris par un autre processus
+    'pipeline_lease': config('MEMORY_PIPELINE_LEASE', default=300.0, cast=float),
+    # Recherche hybride : BM25 (FTS5) sur tout l'historique fusionné par rang
+    # réciproque avec les `hybrid_candidates` meilleurs scores vectoriels
+    'hybrid_search': config('MEMORY_HYBRID_SEARCH', default=True, cast=bool),
+    'hybrid_candidates': config('MEMORY_HYBRID_CANDIDATES', default=50, cast=int),
+    'rrf_k': config('MEMORY_RRF_K', default=60, cast=int),
+    # Archivage : mémoires dégradées sous le seuil, peu consultées et
+    # inactives depuis N jours, déplacées dans une table compressée
+    'archive_importance_threshold': config(
+        'MEMORY_ARCHIVE_IMPORTANCE_THRESHOLD', default=0.3, cast=float
+    ),
+    'archive_max_access_count': config(
+        'MEMORY_ARCHIVE_MAX_ACCESS_COUNT', default=2, cast=int
+    ),
+    'archive_min_age_days': config('MEMORY_ARCHIVE_MIN_AGE_DAYS', default=90, cast=int),
+}
+
+# Background memory maintenance (decay + consolidation of every character)
+MAINTENANCE_CONFIG = {
+    'enabled': config('MAINTENANCE_ENABLED', default=True, cast=bool),
+    'workers': config('MAINTENANCE_WORKERS', default=2, cast=int),
+    # Délai minimal entre deux cycles pour un même personnage
+    'interval': config('MAINTENANCE_INTERVAL', default=3600.0, cast=float),
+    'poll_interval': config('MAINTENANCE_POLL_INTERVAL', default=30.0, cast=float),
+    # Budgets par cycle : durée maximale et part de CPU d'un worker
+    'time_budget': config('MAINTENANCE_TIME_BUDGET', default=30.0, cast=float),
+    'cpu_share': config('MAINTENANCE_CPU_SHARE', default=0.25, cast=float),
+    # Bail d'un personnage en base, partagé entre processus : au-delà, un
+    # cycle interrompu (processus arrêté) peut être repris par un autre
+    'lease': config('MAINTENANCE_LEASE', default=900.0, cast=float),
+    # Pause tant que le chat dépasse ce nombre de messages par minute
+    'busy_messages_per_minute': config(
+        'MAINTENANCE_BUSY_MESSAGES_PER_MINUTE', default=20, cast=int
+    ),
 }
 
 # System limits
@@ -49,6 +149,21 @@ SYSTEM_LIMITS = {
     'max_universes': 10,
 }
 
+# Assemblage du prompt dans SYSTEM_LIMITS['max_context_length'] jetons
+PROMPT_CONFIG = {
+    # Part maximale du budget par section, remplies dans cet ordre ; la
+    # dernière (l'historique) reçoit tout ce qui reste
+    'section_shares': {
+        'profile': config('PROMPT_PROFILE_SHARE', default=0.25, cast=float),
+        'facts': config('PROMPT_FACTS_SHARE', default=0.10, cast=float),
+        'memories': config('PROMPT_MEMORIES_SHARE', default=0.25, cast=float),
+        'history': 1.0,
+    },
+    # Jetons réservés en plus de la réponse, pour l'écart de l'estimation
+    'safety_margin': config('PROMPT_SAFETY_MARGIN', default=256, cast=int),
+    'history_messages': config('PROMPT_HISTORY_MESSAGES', default=50, cast=int),
+}
+
 # Security configuration
 SECURITY_CONFIG = {
     # Token validity duration (in seconds)
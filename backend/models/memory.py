@@ -14,12 +14,14 @@ from sqlalchemy import (
     Float,
     ForeignKey,
     Integer,
+    LargeBinary,
     String,
     Text,
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 
 from backend.database import Base
+from backend.utils.embedding_codec import EmbeddingType
 
 
 class MemoryModel(Base):
@@ -40,7 +42,8 @@ class MemoryModel(Base):
     memory_metadata = Column(
         "metadata", JSON
     )  # Use different attribute name to avoid conflict
-    embedding = Column(JSON)  # Store as JSON array
+    # BLOB float32/float16 (voir utils/embedding_codec), chargé à la demande
+    embedding = deferred(Column(EmbeddingType))
     created_at = Column(DateTime, default=datetime.now, nullable=False)
     last_accessed = Column(DateTime)
     access_count = Column(Integer, default=0)
@@ -80,6 +83,72 @@ class FactModel(Base):
     source_memory = relationship("MemoryModel", back_populates="facts")
 
 
+class MemoryJobModel(Base):
+    """SQLAlchemy model for post-reply memory pipeline jobs
+
+    A job records the exchange to memorize and the next pipeline stage, so
+    that unfinished work survives a restart and is retried. A job being
+    processed is 'running' and leased by one process (`owner`, renewed in
+    `leased_at` at every stage); completed jobs are deleted, failed ones
+    remain with their error.
+    """
+
+    __tablename__ = "memory_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    character_id = Column(Integer, nullable=False, index=True)
+    content = Column(Text, nullable=False)
+    interaction_text = Column(Text)
+    stage = Column(String, nullable=False, default="embed")
+    status = Column(String, nullable=False, default="pending", index=True)
+    memory_id = Column(Integer)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text)
+    owner = Column(String)
+    leased_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.now, nullable=False)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+
+class ArchivedMemoryModel(Base):
+    """SQLAlchemy model for archived (cold) memories
+
+    Old, rarely accessed, low-importance memories are moved out of the
+    `memories` table. The row keeps the memory id and the columns used to
+    select or list it; the text fields are stored as a zlib-compressed JSON
+    payload and restored when the memory is requested again.
+    """
+
+    __tablename__ = "memory_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    character_id = Column(Integer, nullable=False, index=True)
+    type = Column(String, nullable=False)
+    importance = Column(Float)
+    access_count = Column(Integer, default=0)
+    created_at = Column(DateTime, nullable=False)
+    archived_at = Column(DateTime, default=datetime.now, nullable=False)
+    # zlib(JSON: content, metadata)
+    payload = deferred(Column(LargeBinary, nullable=False))
+    embedding = deferred(Column(EmbeddingType))
+
+
+class MaintenanceLeaseModel(Base):
+    """SQLAlchemy model for per-character memory maintenance leases
+
+    Shared by every process that runs the maintenance scheduler: a character
+    is maintained only by the process holding an unexpired lease (`owner`,
+    `leased_until`), and `finished_at` records the end of its last cycle.
+    """
+
+    __tablename__ = "maintenance_leases"
+
+    character_id = Column(Integer, primary_key=True, autoincrement=False)
+    owner = Column(String)
+    leased_until = Column(DateTime)
+    finished_at = Column(DateTime)
+
+
 class MemoryType(str, Enum):
     CONVERSATION = "conversation"
     EVENT = "event"
@@ -2,12 +2,16 @@
 Routes pour la gestion des conversations
 """
 
+import json
 import logging
 
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
 from backend.models.chat import MessageCreate, SessionCreate
 from backend.services.chat_service import chat_service
+from backend.utils.errors import LLMOverloadedException
 
 router = APIRouter(prefix='/chat', tags=['chat'])
 logger = logging.getLogger(__name__)
@@ -64,8 +68,8 @@ async def send_message(message_data: MessageCreate):
     Envoie un message dans une session de chat et reçoit la réponse du personnage
     """
     try:
-        # Envoyer le message et récupérer la réponse
-        response = chat_service.send_message(
+        # Envoyer le message et attendre la réponse sans bloquer la boucle
+        response = await chat_service.asend_message(
             session_id=message_data.session_id,
             user_input=message_data.content,
             metadata=message_data.metadata.model_dump()
@@ -75,11 +79,52 @@ async def send_message(message_data: MessageCreate):
         return response
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except LLMOverloadedException:
+        raise  # 429/503 avec Retry-After, via le gestionnaire d'exceptions
     except Exception as e:
         logger.error(f"Erreur lors de l'envoi du message: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _sse(events):
+    """Formate les événements du service de chat en Server-Sent Events"""
+    for event in events:
+        data = json.dumps(event['data'], ensure_ascii=False)
+        yield f'event: {event["event"]}\ndata: {data}\n\n'
+
+
+@router.post('/message/stream')
+async def stream_message(message_data: MessageCreate):
+    """
+    Envoie un message et diffuse la réponse du personnage en Server-Sent Events
+
+    Événements : `token` (fragment de texte), puis `done` (message enregistré,
+    même forme que POST /chat/message) ou `error`.
+    """
+    try:
+        events = await run_in_threadpool(
+            chat_service.stream_message,
+            session_id=message_data.session_id,
+            user_input=message_data.content,
+            metadata=message_data.metadata.model_dump()
+            if message_data.metadata
+            else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except LLMOverloadedException:
+        raise  # 429/503 avec Retry-After, via le gestionnaire d'exceptions
+    except Exception as e:
+        logger.error(f"Erreur lors de l'envoi du message: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return StreamingResponse(
+        _sse(events),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
 @router.get('/messages/{session_id}')
 async def get_session_messages(session_id: str, limit: int = 50, offset: int = 0):
     """
@@ -2,14 +2,18 @@
 Routes for memory management
 """
 
+import json
 import logging
 from typing import Any
 
-from fastapi import APIRouter, Body, Depends, HTTPException, Query
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
 
 from backend.database import get_db
 from backend.models.memory import Fact, Memory, MemoryCreate, RetrievedMemory
+from backend.services.maintenance_scheduler import maintenance_scheduler
 from backend.services.memory_manager import memory_manager
 
 router = APIRouter(prefix='/memory', tags=['Memory'])
@@ -64,6 +68,97 @@ async def create_memory(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _parse_ndjson_line(line: str) -> Any:
+    """Parses one NDJSON line; blank lines give None, bad lines the error"""
+    if not line.strip():
+        return None
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError as e:
+        return e
+
+
+@router.post('/character/{character_id}/memories/bulk')
+@router.post('/character/{character_id}/memories/bulk/')
+async def create_memories_bulk(
+    character_id: int, request: Request, db: Session = Depends(get_db)
+) -> dict[str, Any]:
+    """
+    Creates many memories in one transaction
+
+    The body is either a JSON array of memories or NDJSON (one memory per
+    line, with the application/x-ndjson content type). `character_id` may be
+    omitted from the items. Invalid items are reported and skipped; the
+    valid ones are created together.
+    """
+    body = await request.body()
+    try:
+        if 'ndjson' in request.headers.get('content-type', ''):
+            raw_items = [
+                _parse_ndjson_line(line) for line in body.decode().splitlines()
+            ]
+        else:
+            raw_items = json.loads(body)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f'Invalid request body: {e}')
+    if not isinstance(raw_items, list):
+        raise HTTPException(status_code=400, detail='Expected a list of memories')
+
+    items: list[dict[str, Any]] = []
+    valid: list[tuple[int, MemoryCreate]] = []
+    for index, raw in enumerate(raw_items):
+        if raw is None:
+            continue  # blank NDJSON line
+        if isinstance(raw, json.JSONDecodeError):
+            items.append({'index': index, 'status': 'error', 'detail': str(raw)})
+            continue
+        if not isinstance(raw, dict):
+            items.append({'index': index, 'status': 'error', 'detail': 'Not an object'})
+            continue
+        raw.setdefault('character_id', character_id)
+        try:
+            memory = MemoryCreate.model_validate(raw)
+        except ValidationError as e:
+            items.append(
+                {
+                    'index': index,
+                    'status': 'error',
+                    'detail': e.errors(include_url=False, include_context=False),
+                }
+            )
+            continue
+        if memory.character_id != character_id:
+            items.append(
+                {
+                    'index': index,
+                    'status': 'error',
+                    'detail': 'The character ID does not match the one in the URL',
+                }
+            )
+            continue
+        valid.append((index, memory))
+
+    try:
+        memory_ids = await run_in_threadpool(
+            memory_manager.create_memories, db, [memory for _, memory in valid]
+        )
+    except Exception as e:
+        logger.error(f'Error during bulk memory creation: {e}')
+        raise HTTPException(status_code=500, detail=str(e))
+
+    items.extend(
+        {'index': index, 'status': 'created', 'id': memory_id}
+        for (index, _), memory_id in zip(valid, memory_ids)
+    )
+    items.sort(key=lambda item: item['index'])
+    return {
+        'success': len(memory_ids) == len(items),
+        'created': len(memory_ids),
+        'failed': len(items) - len(memory_ids),
+        'items': items,
+    }
+
+
 @router.get('/memories/{memory_id}')
 @router.get('/memories/{memory_id}/')
 async def get_memory(memory_id: int, db: Session = Depends(get_db)) -> Memory:
@@ -103,7 +198,9 @@ async def update_memory_importance(
 
 @router.delete('/memories/{memory_id}')
 @router.delete('/memories/{memory_id}/')
-async def delete_memory(memory_id: int, db: Session = Depends(get_db)) -> dict[str, bool]:
+async def delete_memory(
+    memory_id: int, db: Session = Depends(get_db)
+) -> dict[str, bool]:
     """
     Deletes a memory
     """
@@ -113,6 +210,32 @@ async def delete_memory(memory_id: int, db: Session = Depends(get_db)) -> dict[s
     return {'success': True}
 
 
+@router.get('/character/{character_id}/archive')
+@router.get('/character/{character_id}/archive/')
+async def get_archive_status(
+    character_id: int, db: Session = Depends(get_db)
+) -> dict[str, Any]:
+    """
+    Returns the number of archived (cold) memories of a character
+    """
+    return {
+        'character_id': character_id,
+        'archived': memory_manager.archiver.count(db, character_id),
+    }
+
+
+@router.post('/memories/{memory_id}/restore')
+@router.post('/memories/{memory_id}/restore/')
+async def restore_memory(memory_id: int, db: Session = Depends(get_db)) -> Memory:
+    """
+    Moves an archived memory back to the working set
+    """
+    restored = memory_manager.archiver.restore(db, [memory_id])
+    if not restored:
+        raise HTTPException(status_code=404, detail='Archived memory not found')
+    return restored[0]
+
+
 @router.post('/character/{character_id}/maintenance')
 @router.post('/character/{character_id}/maintenance/')
 async def run_memory_maintenance(
@@ -122,11 +245,28 @@ async def run_memory_maintenance(
     Runs a maintenance cycle on a character's memories
     """
     try:
-        stats = memory_manager.maintenance_cycle(db, character_id)
-        return {'success': True, 'statistics': stats}
+        # Off the event loop: consolidation is CPU-bound
+        run = await run_in_threadpool(
+            maintenance_scheduler.run_character, character_id, db
+        )
     except Exception as e:
         logger.error(f'Error during maintenance cycle: {e}')
         raise HTTPException(status_code=500, detail=str(e))
+    if run.get('busy'):
+        raise HTTPException(
+            status_code=409,
+            detail='A maintenance cycle is already running for this character',
+        )
+    return {'success': True, 'statistics': run['statistics']}
+
+
+@router.get('/maintenance/status')
+@router.get('/maintenance/status/')
+async def get_maintenance_status() -> dict[str, Any]:
+    """
+    Returns the background maintenance scheduler state and last-run statistics
+    """
+    return maintenance_scheduler.status()
 
 
 @router.get('/character/{character_id}/relevant')
@@ -5,6 +5,7 @@ Routes for system functions
 from typing import Any
 
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import inspect
 
 from backend.database import engine
@@ -25,9 +26,21 @@ async def check_database():
 
 @router.get('/check-llm', response_model=dict[str, Any])
 async def check_llm():
-    """Checks the LLM service status"""
+    """Checks the LLM service status (model list cached for LLM_MODEL_CHECK_TTL)"""
     try:
-        status = llm_service.check_model_availability()
-        return {'status': 'ok' if status else 'error'}
+        status = await run_in_threadpool(llm_service.check_model_availability)
+        return {'status': 'ok' if status else 'error', **llm_service.registry.status()}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f'LLM service error: {str(e)}')
+
+
+@router.get('/llm-stats', response_model=dict[str, Any])
+async def llm_stats():
+    """Returns call counts, retries and recent latencies of the LLM HTTP client"""
+    return llm_service.http.stats()
+
+
+@router.get('/llm-queue', response_model=dict[str, Any])
+async def llm_queue():
+    """Returns in-flight generations, queue depths and recent queue waits"""
+    return llm_service.scheduler.stats()
@@ -0,0 +1,274 @@
+"""
+Suivi des accès aux mémoires en écriture différée (write-behind)
+"""
+
+import atexit
+import collections
+import datetime
+import logging
+import sqlite3
+import threading
+from typing import cast
+
+import numpy as np
+from sqlalchemy import DateTime, Integer, bindparam, case, func, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from backend.config import MEMORY_CONFIG
+from backend.models.memory import MemoryModel
+from backend.services.memory_index import memory_index
+
+logger = logging.getLogger(__name__)
+
+
+# Au-delà de 5 accès, chaque accès multiplie l'importance par
+# 1 + 0.05 · ⌊total / 5⌋ (plafond 9.0)
+BOOST_MIN_ACCESSES = 5
+MAX_IMPORTANCE = 9.0
+
+
+def _accumulated_boost(access_count: int, hits: int) -> float:
+    """Facteur d'importance de `hits` accès successifs après `access_count`
+
+    Produit des bonus que l'ancienne mise à jour accès par accès appliquait
+    pour chaque total access_count + 1 … access_count + hits : le résultat
+    ne dépend ni de l'intervalle de vidage ni du découpage en lots.
+    """
+    factor = 1.0
+    first = max(access_count + 1, BOOST_MIN_ACCESSES + 1)
+    for total in range(first, access_count + hits + 1):
+        factor *= 1 + 0.05 * (total // BOOST_MIN_ACCESSES)
+    return factor
+
+
+def _build_flush_statement():
+    """UPDATE groupé : compteur, date du dernier accès et bonus d'importance"""
+    table = MemoryModel.__table__
+    access_count = func.coalesce(table.c.access_count, 0)
+    hits = bindparam('hits', type_=Integer)
+    return (
+        update(table)
+        .where(table.c.id == bindparam('memory_id'))
+        .values(
+            access_count=access_count + hits,
+            last_accessed=bindparam('accessed_at', type_=DateTime),
+            # Fonction SQL enregistrée sur la connexion au vidage
+            importance=case(
+                (
+                    access_count + hits > BOOST_MIN_ACCESSES,
+                    func.min(
+                        MAX_IMPORTANCE,
+                        table.c.importance
+                        * func.memory_access_boost(access_count, hits),
+                    ),
+                ),
+                else_=table.c.importance,
+            ),
+        )
+    )
+
+
+class AccessTracker:
+    """Tampon des accès aux mémoires, vidé en un seul UPDATE groupé
+
+    Le chemin de lecture n'écrit plus en base : les accès sont agrégés par
+    mémoire (nombre d'accès, date du dernier) puis appliqués par un thread en
+    arrière-plan toutes les `flush_interval` secondes, dès que
+    `max_pending` mémoires sont en attente, et une dernière fois à l'arrêt.
+    L'index en mémoire vive est mis à jour immédiatement pour que le score de
+    pertinence reflète les accès sans attendre le vidage. Le bonus
+    d'importance y est calculé comme dans l'UPDATE, accès par accès, à partir
+    de l'importance au dernier vidage (conservée dans l'entrée en attente).
+    Un lot dont l'écriture échoue est remis en attente et retenté au vidage
+    suivant. Les accès en attente d'une mémoire absorbée par la consolidation
+    sont reportés sur la mémoire conservée (`redirect`) ; ceux d'une mémoire
+    en attente d'écriture l'excluent de l'archivage (`pending_ids`). Seuls
+    les accès tamponnés par ce processus sont connus : ceux d'un autre
+    worker sur une mémoire archivée entre-temps sont perdus à son vidage.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = MEMORY_CONFIG['access_flush_interval'],
+        max_pending: int = MEMORY_CONFIG['access_flush_threshold'],
+    ):
+        """Initialise le tampon (le thread démarre au premier accès)"""
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.index = memory_index
+        self._statement = _build_flush_statement()
+        # engine -> memory_id -> [nombre d'accès, date du dernier accès,
+        # importance au dernier vidage (None si absente de l'index)]
+        self._pending: dict[Engine, dict[int, list]] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._worker: threading.Thread | None = None
+        self.stats = {'recorded': 0, 'flushes': 0, 'rows_written': 0}
+
+    def record(self, db: Session, character_id: int, memory_ids: list[int]):
+        """Enregistre un accès à chacune des mémoires (sans écriture en base)"""
+        if not memory_ids:
+            return
+        now = datetime.datetime.now()
+        engine = db.get_bind()
+        hits = collections.Counter(int(memory_id) for memory_id in memory_ids)
+        with self._lock:
+            pending = self._pending.setdefault(engine, {})
+            for memory_id, count in hits.items():
+                entry = pending.setdefault(memory_id, [0, now, None])
+                entry[0] += count
+                entry[1] = now
+            self._apply_to_index(db, character_id, hits, pending)
+            self.stats['recorded'] += len(memory_ids)
+            size = sum(len(p) for p in self._pending.values())
+
+        self._ensure_worker()
+        if size >= self.max_pending:
+            self._wakeup.set()
+
+    def _apply_to_index(
+        self,
+        db: Session,
+        character_id: int,
+        hits: collections.Counter,
+        pending: dict[int, list],
+    ):
+        index = self.index.peek(db, character_id)
+        if index is None:
+            return
+        with index.lock:
+            found = [
+                (memory_id, row)
+                for memory_id in hits
+                if (row := index.position(memory_id)) is not None
+            ]
+            if not found:
+                return
+            access_count = index.attribute('access_count')
+            importance = index.attribute('importance')
+            rows = np.array([row for _, row in found], dtype=np.int64)
+            access_count[rows] += [hits[memory_id] for memory_id, _ in found]
+            for memory_id, row in found:
+                hits_pending, _, base = pending[memory_id]
+                if base is None:
+                    base = pending[memory_id][2] = float(importance[row])
+                factor = _accumulated_boost(
+                    int(access_count[row]) - hits_pending, hits_pending
+                )
+                if factor > 1.0:
+                    importance[row] = min(MAX_IMPORTANCE, base * factor)
+                else:
+                    importance[row] = base
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return sum(len(p) for p in self._pending.values())
+
+    def pending_ids(self, db: Session) -> set[int]:
+        """Ids des mémoires de cette base dont des accès attendent le vidage"""
+        with self._lock:
+            return set(self._pending.get(db.get_bind(), ()))
+
+    def redirect(self, db: Session, character_id: int, merges: dict[int, int]):
+        """Reporte les accès en attente de mémoires absorbées (id -> id conservé)
+
+        Appelé après la validation de la fusion et la mise à jour de l'index :
+        l'importance de la mémoire conservée y est alors celle de la base, qui
+        redevient la référence de son bonus.
+        """
+        moved: collections.Counter[int] = collections.Counter()
+        with self._lock:
+            pending = self._pending.get(db.get_bind())
+            if not pending:
+                return
+            for discarded_id, kept_id in merges.items():
+                entry = pending.pop(discarded_id, None)
+                if entry is None:
+                    continue
+                kept = pending.setdefault(kept_id, [0, entry[1], None])
+                kept[0] += entry[0]
+                kept[1] = max(kept[1], entry[1])
+                kept[2] = None
+                moved[kept_id] += entry[0]
+            if moved:
+                self._apply_to_index(db, character_id, moved, pending)
+
+    def flush(self) -> int:
+        """Écrit les accès en attente ; retourne le nombre de lignes mises à jour"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        written = 0
+        for engine, entries in pending.items():
+            params = [
+                {'memory_id': memory_id, 'hits': hits, 'accessed_at': accessed_at}
+                for memory_id, (hits, accessed_at, _) in entries.items()
+            ]
+            try:
+                with engine.begin() as connection:
+                    driver = cast(
+                        sqlite3.Connection, connection.connection.driver_connection
+                    )
+                    driver.create_function(
+                        'memory_access_boost', 2, _accumulated_boost, deterministic=True
+                    )
+                    connection.execute(self._statement, params)
+                written += len(params)
+            except Exception as e:
+                logger.error(
+                    f"Erreur lors de l'écriture de {len(params)} accès mémoire, "
+                    f'nouvel essai au prochain vidage: {e}'
+                )
+                self._requeue(engine, entries)
+
+        if written:
+            with self._lock:
+                self.stats['flushes'] += 1
+                self.stats['rows_written'] += written
+            logger.debug(f'Accès mémoire écrits en base: {written} lignes')
+        return written
+
+    def _requeue(self, engine: Engine, entries: dict[int, list]):
+        """Remet en attente un lot non écrit, fusionné aux accès arrivés depuis"""
+        with self._lock:
+            pending = self._pending.setdefault(engine, {})
+            for memory_id, (hits, accessed_at, base) in entries.items():
+                entry = pending.get(memory_id)
+                if entry is None:
+                    pending[memory_id] = [hits, accessed_at, base]
+                    continue
+                entry[0] += hits
+                entry[1] = max(entry[1], accessed_at)
+                # La base n'a pas été écrite : elle reste celle du lot en échec
+                if base is not None:
+                    entry[2] = base
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._stopped.clear()
+                self._worker = threading.Thread(
+                    target=self._run, name='memory-access-flush', daemon=True
+                )
+                self._worker.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def close(self):
+        """Arrête le thread et écrit les derniers accès en attente"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._worker is not None:
+            self._worker.join(timeout=5)
+        self.flush()
+
+
+# Instance globale du suivi des accès
+access_tracker = AccessTracker()
+atexit.register(access_tracker.close)
@@ -0,0 +1,222 @@
+"""
+Index approché (IVF) pour les personnages ayant un très grand historique
+
+Les embeddings normalisés sont partitionnés par un k-means sphérique en
+`nlist` listes inversées. Une requête ne compare que les vecteurs des
+`nprobe` listes dont le centroïde est le plus proche : le coût par tour
+reste quasi constant quand l'historique grandit.
+
+L'index est aligné ligne à ligne sur un CharacterMemoryIndex : il ne stocke
+que les centroïdes et l'affectation de chaque ligne, pas de copie des
+vecteurs.
+"""
+
+import logging
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Taille des blocs pour l'affectation aux centroïdes (borne la mémoire)
+_ASSIGN_BLOCK = 65536
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Affecte chaque vecteur au centroïde le plus proche (produit scalaire)"""
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), _ASSIGN_BLOCK):
+        block = vectors[start : start + _ASSIGN_BLOCK]
+        assignments[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def spherical_kmeans(
+    vectors: np.ndarray,
+    nlist: int,
+    iterations: int = 10,
+    sample_size: int = 64,
+    seed: int = 0,
+) -> np.ndarray:
+    """Entraîne `nlist` centroïdes normalisés sur un échantillon des vecteurs"""
+    rng = np.random.default_rng(seed)
+    n = len(vectors)
+    sample = vectors[rng.choice(n, min(n, nlist * sample_size), replace=False)]
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        filled = norms[:, 0] > 0
+        # Les listes vides conservent leur centroïde précédent
+        centroids[filled] = sums[filled] / norms[filled]
+
+    return centroids
+
+
+class IVFIndex:
+    """Listes inversées sur les lignes d'un index vectoriel de personnage"""
+
+    def __init__(
+        self,
+        dimensions: int,
+        nlist: int = 0,
+        nprobe: int = 8,
+        min_size: int = 20000,
+        path: Path | None = None,
+    ):
+        """Initialise un index non entraîné
+
+        Args:
+            dimensions: Dimension des embeddings
+            nlist: Nombre de listes (0 = racine carrée du nombre de vecteurs)
+            nprobe: Nombre de listes explorées par requête
+            min_size: Taille en dessous de laquelle la recherche exacte suffit
+            path: Fichier .npz de persistance des centroïdes (optionnel)
+        """
+        self.dimensions = dimensions
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_size = min_size
+        self.path = path
+
+        self.centroids: np.ndarray | None = None
+        self.trained_size = 0
+        self._assignments = np.empty(0, dtype=np.int32)
+        self._size = 0
+
+        # Listes inversées (format CSR) sur les `_built` premières lignes ;
+        # les lignes ajoutées depuis forment une « queue » filtrée à la volée.
+        self._order = np.empty(0, dtype=np.int64)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._built = 0
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def needs_training(self, size: int) -> bool:
+        """Entraînement initial, ou ré-entraînement si la taille a doublé"""
+        if size < self.min_size:
+            return False
+        return not self.trained or size >= 2 * self.trained_size
+
+    def train(self, ids: np.ndarray, vectors: np.ndarray):
+        """Entraîne les centroïdes sur les vecteurs courants et les persiste"""
+        start = time.time()
+        nlist = self.nlist or max(16, int(np.sqrt(len(vectors))))
+        nlist = min(nlist, len(vectors))
+        self.centroids = spherical_kmeans(vectors, nlist)
+        self.trained_size = len(vectors)
+        self._assignments = _assign(vectors, self.centroids)
+        self._size = len(vectors)
+        self._rebuild()
+        self.save(ids)
+        logger.info(
+            f'Index IVF entraîné: {len(vectors)} vecteurs, {nlist} listes '
+            f'en {time.time() - start:.2f} secondes'
+        )
+
+    def append(self, vectors: np.ndarray):
+        """Affecte de nouvelles lignes (ajoutées en fin d'index) aux listes"""
+        if not self.trained:
+            return
+        self._assignments = np.concatenate(
+            [self._assignments[: self._size], _assign(vectors, self.centroids)]
+        )
+        self._size += len(vectors)
+
+    def compact(self, keep: np.ndarray):
+        """Répercute une compaction de l'index parent (masque des lignes gardées)"""
+        if not self.trained:
+            return
+        self._assignments = self._assignments[: self._size][keep]
+        self._size = len(self._assignments)
+        self._built = 0  # les positions ont changé : reconstruction complète
+
+    def _rebuild(self):
+        assignments = self._assignments[: self._size]
+        self._order = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=len(self.centroids))
+        self._offsets = np.concatenate([[0], np.cumsum(counts)])
+        self._built = self._size
+
+    def probe(self, query: np.ndarray) -> np.ndarray:
+        """Positions candidates pour une requête normalisée"""
+        tail = self._size - self._built
+        if self._built == 0 or tail > max(1024, self._built // 10):
+            self._rebuild()
+
+        nprobe = min(self.nprobe, len(self.centroids))
+        closest = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        parts = [self._order[self._offsets[c] : self._offsets[c + 1]] for c in closest]
+        if self._size > self._built:
+            tail_assignments = self._assignments[self._built : self._size]
+            parts.append(
+                self._built + np.flatnonzero(np.isin(tail_assignments, closest))
+            )
+        return np.concatenate(parts)
+
+    def save(self, ids: np.ndarray):
+        """Persiste centroïdes et affectations (écriture atomique)"""
+        if self.path is None or not self.trained:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(self.path.name + '.tmp')
+            with open(tmp_path, 'wb') as f:
+                np.savez(
+                    f,
+                    centroids=self.centroids,
+                    ids=np.asarray(ids[: self._size]),
+                    assignments=self._assignments[: self._size],
+                    trained_size=self.trained_size,
+                )
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Impossible de persister l'index IVF {self.path}: {e}")
+
+    def load(self, ids: np.ndarray, vectors: np.ndarray) -> bool:
+        """Recharge les centroïdes persistés et réaligne les affectations
+
+        Les affectations sauvegardées sont réutilisées pour les ids connus ;
+        seules les lignes nouvelles sont recalculées.
+        """
+        if self.path is None or not self.path.exists():
+            return False
+        try:
+            with np.load(self.path) as data:
+                centroids = data['centroids']
+                saved_ids = data['ids']
+                saved_assignments = data['assignments']
+                trained_size = int(data['trained_size'])
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f'Index IVF illisible {self.path}: {e}')
+            return False
+        if centroids.shape[1] != self.dimensions:
+            return False
+
+        order = np.argsort(saved_ids)
+        sorted_ids = saved_ids[order]
+        slots = np.clip(
+            np.searchsorted(sorted_ids, ids), 0, max(len(sorted_ids) - 1, 0)
+        )
+        known = (
+            sorted_ids[slots] == ids if len(sorted_ids) else np.zeros(len(ids), bool)
+        )
+
+        assignments = np.empty(len(ids), dtype=np.int32)
+        assignments[known] = saved_assignments[order][slots[known]]
+        if (~known).any():
+            assignments[~known] = _assign(vectors[~known], centroids)
+
+        self.centroids = centroids
+        self.trained_size = trained_size
+        self._assignments = assignments
+        self._size = len(ids)
+        self._rebuild()
+        return True
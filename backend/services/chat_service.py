@@ -2,19 +2,37 @@
 Service de gestion des sessions de chat et intégration LLM (ORM SQLAlchemy).
 """
 
+import asyncio
+import functools
 import json
 import logging
 import time
 import uuid
+from collections.abc import Callable, Iterator
 from datetime import datetime
 from typing import Any
 
+import anyio
+
+from backend.config import API_CONFIG, PROMPT_CONFIG
 from backend.database import SessionLocal
 from backend.models.chat import ChatSessionModel, MessageModel
-from backend.models.memory import MemoryCreate
 from backend.services.character_manager import CharacterManager
 from backend.services.llm_service import llm_service
+from backend.services.maintenance_scheduler import maintenance_scheduler
 from backend.services.memory_manager import MemoryManager
+from backend.services.memory_pipeline import memory_pipeline
+from backend.services.prompt_builder import (
+    AssembledPrompt,
+    count_tokens,
+    format_turn,
+    prompt_assembler,
+)
+from backend.services.session_context import (
+    SessionContext,
+    SessionContextCache,
+    session_contexts,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -22,9 +40,14 @@ logger = logging.getLogger(__name__)
 class ChatService:
     """Gère les sessions de chat et la génération de réponses via le LLM."""
 
-    def __init__(self):
+    def __init__(self, blocking_threads: int = API_CONFIG["blocking_threads"]):
         self.character_manager = CharacterManager()
         self.memory_manager = MemoryManager()
+        # Threads réservés au travail bloquant (SQLite, embeddings) du chemin
+        # asynchrone ; le limiteur est propre à chaque boucle d'événements
+        self.blocking_threads = blocking_threads
+        self._limiter: anyio.CapacityLimiter | None = None
+        self._limiter_loop: asyncio.AbstractEventLoop | None = None
 
     @staticmethod
     def _session_to_dict(s: ChatSessionModel) -> dict[str, Any]:
@@ -122,27 +145,221 @@ class ChatService:
                 return False
             db.delete(session)  # cascade supprime les messages
             db.commit()
+            session_contexts.invalidate(session_id)
             return True
         finally:
             db.close()
 
-    def _build_prompt(
-        self, db, session_id: str, context: dict, user_input: str
-    ) -> str:
-        character_profile = (context or {}).get("character_profile", "")
+    def _assemble_prompt(
+        self,
+        db,
+        session: ChatSessionModel,
+        system_prompt: str,
+        profile: str,
+        user_input: str,
+        user_message_id: str,
+        reused: SessionContext | None,
+    ) -> AssembledPrompt:
+        """Assemble le prompt dans le budget de jetons du modèle
+
+        Avec un contexte KV réutilisé, le profil et l'historique y sont
+        déjà : seuls les faits et mémoires retrouvés qui n'y figurent pas
+        encore accompagnent le nouveau tour. La recherche est sautée quand
+        la fenêtre ne laisse plus de place à une mémoire.
+        """
+        if reused is not None and (
+            prompt_assembler.turn_room(user_input, len(reused.tokens)) <= 0
+        ):
+            return prompt_assembler.assemble_turn(user_input, len(reused.tokens))
+
+        relevant = self.memory_manager.get_relevant_memories(
+            db, session.character_id, user_input
+        )
+        memories = [r.memory.content for r in relevant]
+        facts = [
+            f"{f.subject} {f.predicate} {f.object}"
+            for f in sorted(
+                self.memory_manager.get_facts(db, session.character_id),
+                key=lambda fact: fact.confidence or 0.0,
+                reverse=True,
+            )
+        ]
+        if reused is not None:
+            return prompt_assembler.assemble_turn(
+                user_input,
+                len(reused.tokens),
+                facts=[f for f in facts if f not in reused.sent],
+                memories=[m for m in memories if m not in reused.sent],
+            )
+
+        # Historique du plus récent au plus ancien, hors message en cours
         recent = (
-            db.query(MessageModel)
-            .filter_by(session_id=session_id)
-            .order_by(MessageModel.timestamp.asc())
-            .limit(10)
+            db.query(MessageModel.sender, MessageModel.content)
+            .filter(
+                MessageModel.session_id == session.id,
+                MessageModel.id != user_message_id,
+            )
+            .order_by(MessageModel.timestamp.desc())
+            .limit(PROMPT_CONFIG["history_messages"])
             .all()
         )
-        prompt = f"# CHARACTER PROFILE:\n{character_profile}\n\n# CONVERSATION:\n"
-        for m in recent:
-            sender = "User" if m.sender == "user" else "Assistant"
-            prompt += f"{sender}: {m.content}\n"
-        prompt += f"User: {user_input}\nAssistant: "
-        return prompt
+        return prompt_assembler.assemble(
+            user_input,
+            system_prompt=system_prompt,
+            profile=profile,
+            facts=facts,
+            memories=memories,
+            history=[(m.sender, m.content) for m in recent],
+        )
+
+    def _prepare_exchange(
+        self,
+        db,
+        session_id: str,
+        user_input: str,
+        metadata: dict[str, Any] | None,
+    ) -> tuple[ChatSessionModel, dict[str, Any], dict[str, Any]]:
+        """Enregistre le message utilisateur et prépare la génération
+
+        Retourne la session, les arguments de génération du LLM et le
+        relevé d'évaluation du prompt que la génération remplira (voir
+        `_plan_generation`).
+        """
+        session = db.query(ChatSessionModel).filter_by(id=session_id).first()
+        if not session:
+            raise ValueError(f"Session {session_id} not found")
+        character_id = session.character_id
+
+        # Message utilisateur
+        user_message = MessageModel(
+            id=str(uuid.uuid4()),
+            session_id=session_id,
+            sender="user",
+            content=user_input,
+            character_id=character_id,
+            message_metadata=json.dumps(metadata) if metadata else None,
+        )
+        db.add(user_message)
+        session.updated_at = datetime.now()
+        db.commit()
+
+        context = json.loads(session.context) if session.context else {}
+        system_prompt = context.get(
+            "system_instructions", "You are a conversational AI assistant."
+        )
+        profile = context.get("character_profile", "")
+        fingerprint = SessionContextCache.fingerprint(
+            llm_service.default_model, system_prompt, profile
+        )
+        reused = session_contexts.lookup(
+            session.id, fingerprint, count_tokens(format_turn(user_input))
+        )
+        assembled = self._assemble_prompt(
+            db, session, system_prompt, profile, user_input, user_message.id, reused
+        )
+        # Identifiants copiés avant le commit, qui expire `session` : les
+        # relire depuis la boucle d'événements déclencherait un SELECT
+        generation, usage = self._plan_generation(
+            session.id, session.user_id, fingerprint, system_prompt, assembled, reused
+        )
+        # Clore la transaction de lecture : la connexion retourne au pool
+        # pendant la génération au lieu d'être retenue par chaque échange
+        db.commit()
+        return session, generation, usage
+
+    @staticmethod
+    def _plan_generation(
+        session_id: str,
+        user_id: str,
+        fingerprint: str,
+        system_prompt: str,
+        assembled: AssembledPrompt,
+        reused: SessionContext | None,
+    ) -> tuple[dict[str, Any], dict[str, Any]]:
+        """Arguments de génération, en réutilisant le contexte KV de la session
+
+        Si Ollama a déjà évalué le profil et l'historique de la session (même
+        modèle, même consigne, même profil), seul le nouveau tour est envoyé
+        avec le contexte du tour précédent ; sinon le prompt complet part
+        sans contexte. Le contexte renvoyé en fin de génération est conservé
+        pour le tour suivant, avec les faits et mémoires qu'il contient.
+        """
+        usage: dict[str, Any] = {"context_reused": reused is not None}
+        sent = (reused.sent if reused else frozenset()).union(
+            *assembled.kept.values()
+        )
+
+        def on_done(final: dict[str, Any]):
+            usage["prompt_eval_count"] = final.get("prompt_eval_count")
+            if final.get("prompt_eval_duration") is not None:
+                usage["prompt_eval_ms"] = final["prompt_eval_duration"] / 1e6
+            if final.get("context"):
+                session_contexts.store(session_id, fingerprint, final["context"], sent)
+
+        if reused is None:
+            generation = {"prompt": assembled.text, "system_prompt": system_prompt}
+        else:
+            # La consigne système fait déjà partie du contexte
+            generation = {"prompt": assembled.text, "context": reused.tokens}
+        generation.update(user_id=user_id, on_done=on_done)
+        return generation, usage
+
+    @staticmethod
+    def _settle_context(session_id: str, usage: dict[str, Any]) -> dict:
+        """Métadonnées d'évaluation du tour ; abandonne un contexte resté sans réponse
+
+        Si la génération n'a pas abouti (erreur, réponse de repli), le
+        contexte de la session est oublié : le tour suivant renvoie le
+        prompt complet au lieu de réessayer un contexte peut-être invalide.
+        """
+        if "prompt_eval_count" not in usage:
+            session_contexts.invalidate(session_id)
+        return usage
+
+    def _complete_exchange(
+        self,
+        db,
+        session: ChatSessionModel,
+        user_input: str,
+        response_text: str,
+        assistant_meta: dict[str, Any],
+    ) -> dict[str, Any]:
+        """Enregistre la réponse du personnage et met la mémorisation en file"""
+        character_id = session.character_id
+        assistant_msg = MessageModel(
+            id=str(uuid.uuid4()),
+            session_id=session.id,
+            sender="assistant",
+            content=response_text,
+            character_id=character_id,
+            message_metadata=json.dumps(assistant_meta),
+        )
+        db.add(assistant_msg)
+        session.updated_at = datetime.now()
+        db.commit()
+        db.refresh(assistant_msg)
+
+        # Mémoire de la conversation et évolution des traits : traitées
+        # en arrière-plan, après l'envoi de la réponse
+        try:
+            memory_pipeline.submit(
+                character_id,
+                f"User: {user_input}\n{response_text}",
+                interaction_text=user_input,
+                session_factory=SessionLocal,
+            )
+        except Exception as e:
+            logger.error(f"Erreur mise en file de la mémoire: {e}")
+
+        return {
+            "id": assistant_msg.id,
+            "session_id": session.id,
+            "character_id": character_id,
+            "content": response_text,
+            "sender": "assistant",
+            "timestamp": assistant_msg.timestamp.isoformat() if assistant_msg.timestamp else None,
+            "metadata": assistant_meta,
+        }
 
     def send_message(
         self,
@@ -150,93 +367,145 @@ class ChatService:
         user_input: str,
         metadata: dict[str, Any] | None = None,
     ) -> dict[str, Any]:
+        maintenance_scheduler.notify_activity()
         db = SessionLocal()
         try:
-            session = db.query(ChatSessionModel).filter_by(id=session_id).first()
-            if not session:
-                raise ValueError(f"Session {session_id} not found")
-            character_id = session.character_id
-
-            # Message utilisateur
-            db.add(
-                MessageModel(
-                    id=str(uuid.uuid4()),
-                    session_id=session_id,
-                    sender="user",
-                    content=user_input,
-                    character_id=character_id,
-                    message_metadata=json.dumps(metadata) if metadata else None,
-                )
+            session, generation, usage = self._prepare_exchange(
+                db, session_id, user_input, metadata
             )
-            session.updated_at = datetime.now()
-            db.commit()
 
-            # Contexte mémoire (db passé correctement — corrige le bug latent)
-            relevant = self.memory_manager.get_relevant_memories(
-                db, character_id, user_input
+            start = time.time()
+            response_text = llm_service.generate_text(**generation)
+            generation_time = time.time() - start
+
+            assistant_meta = {
+                "generation_time": generation_time,
+                "model": llm_service.default_model,
+                **self._settle_context(session_id, usage),
+            }
+            return self._complete_exchange(
+                db, session, user_input, response_text, assistant_meta
             )
-            session_dict = self._session_to_dict(session)
-            session_dict.setdefault("context", {})["relevant_memories"] = [
-                m.model_dump() for m in relevant
-            ]
-
-            prompt = self._build_prompt(db, session_id, session_dict.get("context", {}), user_input)
-            system_prompt = session_dict["context"].get(
-                "system_instructions", "You are a conversational AI assistant."
+        finally:
+            db.close()
+
+    async def _run_blocking(self, func: Callable, *args) -> Any:
+        """Exécute un appel bloquant dans le pool de threads borné"""
+        loop = asyncio.get_running_loop()
+        if self._limiter is None or self._limiter_loop is not loop:
+            self._limiter = anyio.CapacityLimiter(self.blocking_threads)
+            self._limiter_loop = loop
+        return await anyio.to_thread.run_sync(
+            functools.partial(func, *args), limiter=self._limiter
+        )
+
+    async def asend_message(
+        self,
+        session_id: str,
+        user_input: str,
+        metadata: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
+        """Version asynchrone de send_message, pour les routes async
+
+        La génération (l'essentiel du temps de réponse) est attendue sans
+        bloquer la boucle d'événements ; seuls la construction du prompt et
+        l'enregistrement, qui touchent SQLite et les embeddings, passent par
+        le pool de threads borné (`API_CONFIG["blocking_threads"]`).
+        """
+        maintenance_scheduler.notify_activity()
+        db = SessionLocal()
+        try:
+            session, generation, usage = await self._run_blocking(
+                self._prepare_exchange, db, session_id, user_input, metadata
             )
 
             start = time.time()
-            response_text = llm_service.generate_text(
-                prompt=prompt, system_prompt=system_prompt
-            )
+            response_text = await llm_service.agenerate_text(**generation)
             generation_time = time.time() - start
 
             assistant_meta = {
                 "generation_time": generation_time,
                 "model": llm_service.default_model,
+                **self._settle_context(session_id, usage),
             }
-            assistant_msg = MessageModel(
-                id=str(uuid.uuid4()),
-                session_id=session_id,
-                sender="assistant",
-                content=response_text,
-                character_id=character_id,
-                message_metadata=json.dumps(assistant_meta),
+            return await self._run_blocking(
+                self._complete_exchange,
+                db,
+                session,
+                user_input,
+                response_text,
+                assistant_meta,
             )
-            db.add(assistant_msg)
-            session.updated_at = datetime.now()
-            db.commit()
-            db.refresh(assistant_msg)
+        finally:
+            db.close()
 
-            # Mémoire de la conversation (db passé correctement)
-            self.memory_manager.create_memory(
-                db,
-                MemoryCreate(
-                    character_id=character_id,
-                    content=f"User: {user_input}\n{response_text}",
-                    memory_type="conversation",
-                    importance=1.0,
-                ),
+    def stream_message(
+        self,
+        session_id: str,
+        user_input: str,
+        metadata: dict[str, Any] | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """Envoie un message et diffuse la réponse au fil de sa génération
+
+        Le message utilisateur est enregistré et le prompt construit avant
+        le retour (une session inconnue lève ValueError immédiatement). Le
+        générateur retourné produit des événements {"event", "data"} :
+        "token" pour chaque fragment, puis "done" avec le message enregistré
+        (même forme que send_message) une fois le flux terminé, ou "error".
+        Si le client se déconnecte, rien n'est enregistré.
+        """
+        maintenance_scheduler.notify_activity()
+        db = SessionLocal()
+        try:
+            session, generation, usage = self._prepare_exchange(
+                db, session_id, user_input, metadata
             )
+            # Le créneau de génération est obtenu ici : un refus de
+            # l'ordonnanceur remonte avant le début de la réponse HTTP
+            stream = llm_service.generate_stream(**generation)
+        except Exception:
+            db.close()
+            raise
+        return self._stream_reply(db, session, session_id, user_input, stream, usage)
 
-            # Évolution des traits à partir de l'échange utilisateur
+    def _stream_reply(
+        self,
+        db,
+        session: ChatSessionModel,
+        session_id: str,
+        user_input: str,
+        stream: Iterator[str],
+        usage: dict[str, Any],
+    ) -> Iterator[dict[str, Any]]:
+        try:
+            start = time.time()
+            time_to_first_token = None
+            fragments = []
             try:
-                self.character_manager.update_traits_from_interaction(
-                    db, character_id, user_input, intensity=1.0
-                )
+                for fragment in stream:
+                    if time_to_first_token is None:
+                        time_to_first_token = time.time() - start
+                    fragments.append(fragment)
+                    yield {"event": "token", "data": {"content": fragment}}
             except Exception as e:
-                logger.error(f"Erreur évolution des traits: {e}")
-
-            return {
-                "id": assistant_msg.id,
-                "session_id": session_id,
-                "character_id": character_id,
-                "content": response_text,
-                "sender": "assistant",
-                "timestamp": assistant_msg.timestamp.isoformat() if assistant_msg.timestamp else None,
-                "metadata": assistant_meta,
+                logger.error(f"Erreur pendant la génération en flux: {e}")
+                session_contexts.invalidate(session_id)
+                yield {"event": "error", "data": {"detail": str(e)}}
+                return
+
+            assistant_meta = {
+                "generation_time": time.time() - start,
+                "time_to_first_token": time_to_first_token,
+                "model": llm_service.default_model,
+                "streamed": True,
+                **self._settle_context(session_id, usage),
             }
+            message = self._complete_exchange(
+                db, session, user_input, "".join(fragments), assistant_meta
+            )
+            yield {"event": "done", "data": message}
         finally:
+            stream.close()  # rend le créneau si le client est parti
             db.close()
 
 
@@ -0,0 +1,181 @@
+"""
+Service d'embeddings : regroupe les encodages concurrents en micro-lots
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import nullcontext
+
+import numpy as np
+
+from backend.config import EMBEDDING_CONFIG
+from backend.services.llm_scheduler import Priority
+from backend.utils.embedding_loader import (
+    EmbeddingCache,
+    get_embedding_cache,
+    get_embedding_model,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingService:
+    """Encodeur partagé qui regroupe les requêtes concurrentes en un seul lot
+
+    Chaque appelant dépose ses textes dans une file ; un thread unique les
+    rassemble pendant au plus `max_wait_ms` (ou jusqu'à `max_batch_size`
+    textes), lance un seul `encode` sur le lot puis rend à chacun ses
+    vecteurs. Un appelant seul n'attend pas : le lot part dès qu'aucune autre
+    requête n'est en cours. Les textes déjà présents dans le cache
+    d'embeddings ne passent pas par le modèle.
+
+    Un lot ne contenant que des demandes de fond (`Priority.BACKGROUND`)
+    prend un créneau de l'ordonnanceur LLM quand le modèle en expose un
+    (`slot()`, embeddings calculés par Ollama) : il cède alors la place aux
+    tours de conversation.
+    """
+
+    def __init__(
+        self,
+        model=None,
+        cache: EmbeddingCache | None = None,
+        max_batch_size: int = EMBEDDING_CONFIG.get('batch_max_size', 32),
+        max_wait_ms: float = EMBEDDING_CONFIG.get('batch_max_wait_ms', 5),
+    ):
+        """Initialise le service (le modèle est chargé au premier encodage)
+
+        Sans modèle explicite, le service utilise le modèle global et son
+        cache ; avec un modèle explicite, seul le cache fourni est utilisé.
+        """
+        self._model = model
+        self._cache = cache
+        self._use_global_cache = model is None and cache is None
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: queue.Queue = queue.Queue()
+        self._worker: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._waiting = 0  # appelants en attente d'un résultat
+        self.stats = {'requests': 0, 'batches': 0, 'texts': 0}
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = get_embedding_model()
+        return self._model
+
+    @property
+    def cache(self) -> EmbeddingCache | None:
+        if self._cache is None and self._use_global_cache:
+            self._cache = get_embedding_cache()
+        return self._cache
+
+    def encode(
+        self, text: str, priority: Priority = Priority.INTERACTIVE
+    ) -> np.ndarray:
+        """Encode un texte (éventuellement regroupé avec d'autres appelants)"""
+        return self.encode_many([text], priority)[0]
+
+    def encode_many(
+        self, texts: list[str], priority: Priority = Priority.INTERACTIVE
+    ) -> np.ndarray:
+        """Encode une liste de textes ; retourne une matrice (n, dimensions)"""
+        if not texts:
+            return np.empty((0, EMBEDDING_CONFIG['dimensions']), dtype=np.float32)
+        cache = self.cache
+        if cache is None:
+            return self._encode_uncached(list(texts), priority)
+
+        cached = cache.get_many(texts)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if missing:
+            fresh = self._encode_uncached([texts[i] for i in missing], priority)
+            cache.put_many([texts[i] for i in missing], fresh)
+            for i, vector in zip(missing, fresh):
+                cached[i] = vector
+        return np.vstack(cached).astype(np.float32, copy=False)
+
+    def _encode_uncached(self, texts: list[str], priority: Priority) -> np.ndarray:
+        if len(texts) >= self.max_batch_size:
+            # Déjà un lot complet : inutile de passer par la file
+            return self._encode_batch(texts, priority)
+
+        self._ensure_worker()
+        future: Future = Future()
+        with self._lock:
+            self._waiting += 1
+            self.stats['requests'] += 1
+        self._queue.put((texts, future, priority))
+        try:
+            return future.result()
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def _encode_batch(
+        self, texts: list[str], priority: Priority = Priority.INTERACTIVE
+    ) -> np.ndarray:
+        model = self.model
+        slot = getattr(model, 'slot', None) if priority is Priority.BACKGROUND else None
+        with slot(priority) if slot is not None else nullcontext():
+            embeddings = np.asarray(model.encode(texts), dtype=np.float32)
+        with self._lock:
+            self.stats['batches'] += 1
+            self.stats['texts'] += len(texts)
+        return embeddings.reshape(len(texts), -1)
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name='embedding-batcher', daemon=True
+                )
+                self._worker.start()
+
+    def _collect(self) -> list[tuple[list[str], Future, Priority]]:
+        """Attend une première requête puis rassemble celles qui suivent"""
+        jobs = [self._queue.get()]
+        size = len(jobs[0][0])
+        deadline = time.monotonic() + self.max_wait
+
+        while size < self.max_batch_size:
+            with self._lock:
+                alone = self._waiting <= len(jobs)
+            if alone and self._queue.empty():
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                job = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            jobs.append(job)
+            size += len(job[0])
+        return jobs
+
+    def _run(self):
+        while True:
+            jobs = self._collect()
+            texts = [text for job_texts, _, _ in jobs for text in job_texts]
+            # Un seul appelant interactif suffit à rendre le lot interactif
+            priority = min(job_priority for _, _, job_priority in jobs)
+            try:
+                embeddings = self._encode_batch(texts, priority)
+            except Exception as e:
+                logger.error(f"Erreur lors de l'encodage d'un lot d'embeddings: {e}")
+                for _, future, _ in jobs:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            for job_texts, future, _ in jobs:
+                future.set_result(embeddings[offset : offset + len(job_texts)])
+                offset += len(job_texts)
+
+
+# Instance globale du service d'embeddings
+embedding_service = EmbeddingService()
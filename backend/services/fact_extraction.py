@@ -0,0 +1,318 @@
+"""
+Extraction de faits : motifs compilés en un seul balayage, stockage groupé
+"""
+
+import datetime
+import logging
+import re
+from collections.abc import Iterable
+from typing import NamedTuple
+
+from sqlalchemy import bindparam, insert, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from backend.models.memory import FactModel
+
+logger = logging.getLogger(__name__)
+
+
+class FactRule(NamedTuple):
+    """Motif d'extraction ; `{groupe}` dans subject/predicate/object est substitué"""
+
+    pattern: str
+    subject: str
+    predicate: str
+    object: str
+    confidence: float = 0.8
+    # Un fait déjà connu voit sa confiance augmenter à chaque confirmation
+    confirm: bool = True
+    # Texte obligatoirement présent (par défaut : préfixe littéral du motif)
+    keyword: str | None = None
+
+
+class FactCandidate(NamedTuple):
+    """Fait trouvé dans un texte, avec son nombre d'occurrences"""
+
+    subject: str
+    predicate: str
+    object: str
+    confidence: float
+    confirm: bool
+    occurrences: int = 1
+
+
+_WORDS = r'[a-zA-Z\s-]+'
+
+FACT_RULES = [
+    FactRule(rf"je m'appelle (?P<name>[A-Z]{_WORDS})", 'user', "s'appelle", '{name}'),
+    FactRule(rf'mon nom est (?P<name>[A-Z]{_WORDS})', 'user', 'a pour nom', '{name}'),
+    FactRule(r"j'ai (?P<age>\d+) ans?", 'user', 'a pour âge', '{age}'),
+    FactRule(
+        rf'je suis (?P<article>un|une) (?P<what>{_WORDS})',
+        'user',
+        'est',
+        '{article} {what}',
+    ),
+    FactRule(
+        rf"j'habite (?:à|en|au|aux) (?P<place>{_WORDS})", 'user', 'habite à', '{place}'
+    ),
+    FactRule(rf"j'aime (?:le|la|les|l') (?P<what>{_WORDS})", 'user', 'aime', '{what}'),
+    FactRule(
+        rf"je déteste (?:le|la|les|l') (?P<what>{_WORDS})", 'user', 'déteste', '{what}'
+    ),
+    FactRule(rf'mon travail est (?P<job>{_WORDS})', 'user', 'travaille comme', '{job}'),
+    FactRule(
+        rf'je travaille comme (?P<job>{_WORDS})', 'user', 'travaille comme', '{job}'
+    ),
+    FactRule(rf'ma passion est (?P<what>{_WORDS})', 'user', 'a pour passion', '{what}'),
+    FactRule(
+        rf"je fais (?:du|de la|de l'|des) (?P<what>{_WORDS})", 'user', 'fait', '{what}'
+    ),
+    # Relations émotionnelles : ajoutées une fois, sans renforcement
+    FactRule(
+        rf'(?P<cause>{_WORDS}) me rend (?P<emotion>heureux|triste|nerveux|calme|fier)',
+        '{cause}',
+        'rend {emotion}',
+        'user',
+        confidence=0.7,
+        confirm=False,
+        keyword=' me rend ',
+    ),
+    FactRule(
+        rf"j'ai peur de (?P<what>{_WORDS})",
+        'user',
+        'a peur de',
+        '{what}',
+        confidence=0.7,
+        confirm=False,
+    ),
+]
+
+_GROUP = re.compile(r'\(\?P<(\w+)>')
+_LITERAL_PREFIX = re.compile(r'[^\\()\[\]{}|.*+?^$]*')
+_CHUNK_SIZE = 500
+
+
+def _keyword(rule: FactRule) -> str | None:
+    """Texte que tout texte correspondant à la règle contient forcément"""
+    if rule.keyword is not None:
+        return rule.keyword.lower()
+    literal = _LITERAL_PREFIX.match(rule.pattern)
+    prefix = literal.group() if literal else ''
+    if prefix and rule.pattern[len(prefix) : len(prefix) + 1] in ('*', '?', '{'):
+        prefix = prefix[:-1]  # dernier caractère optionnel ou répété
+    return prefix.lower() or None
+
+
+class FactExtractor:
+    """Extracteur de faits à motifs précompilés
+
+    Les règles sont combinées dans une seule expression : une porte
+    `(?=A|B|...)` ne s'arrête qu'aux positions où au moins une règle
+    s'applique, puis une assertion optionnelle par règle capture ses groupes
+    nommés. Chaque règle est ainsi évaluée à chaque position du texte en un
+    seul balayage, avec les mêmes correspondances (gourmandes, sans
+    chevauchement pour une même règle) que `re.findall` appliqué règle par
+    règle. Un préfiltre par mot-clé écarte d'abord les règles dont le texte
+    littéral est absent ; l'expression combinée des règles restantes est
+    compilée une fois puis conservée.
+    """
+
+    def __init__(self, rules: list[FactRule] = FACT_RULES, confirm_step: float = 0.1):
+        """Prépare les fragments de motif de chaque règle"""
+        self.rules = rules
+        self.confirm_step = confirm_step
+        self._keywords = [_keyword(rule) for rule in rules]
+        self._groups: list[list[tuple[str, str]]] = []
+        self._gates: list[str] = []
+        self._captures: list[str] = []
+        for number, rule in enumerate(rules):
+            names = _GROUP.findall(rule.pattern)
+            self._groups.append([(name, f'r{number}_{name}') for name in names])
+            self._gates.append(_GROUP.sub('(?:', rule.pattern))
+            renamed = _GROUP.sub(lambda m: f'(?P<r{number}_{m.group(1)}>', rule.pattern)
+            self._captures.append(f'(?:(?=(?P<r{number}>{renamed})))?')
+        self._scanners: dict[tuple[int, ...], re.Pattern] = {}
+
+    def scanner(self, numbers: tuple[int, ...]) -> re.Pattern:
+        """Expression combinée des règles données (compilée une seule fois)"""
+        scanner = self._scanners.get(numbers)
+        if scanner is None:
+            gate = '|'.join(self._gates[number] for number in numbers)
+            captures = ''.join(self._captures[number] for number in numbers)
+            scanner = re.compile(f'(?={gate}){captures}', re.IGNORECASE)
+            self._scanners[numbers] = scanner
+        return scanner
+
+    def scan(self, content: str) -> list[FactCandidate]:
+        """Faits présents dans un texte, dans l'ordre d'apparition"""
+        content = content.lower()
+        numbers = tuple(
+            number
+            for number, keyword in enumerate(self._keywords)
+            if keyword is None or keyword in content
+        )
+        if not numbers:
+            return []
+
+        candidates: dict[tuple[str, str, str], FactCandidate] = {}
+        next_start = [0] * len(self.rules)
+        for match in self.scanner(numbers).finditer(content):
+            position = match.start()
+            for number in numbers:
+                if match.start(f'r{number}') < 0 or position < next_start[number]:
+                    continue
+                next_start[number] = match.end(f'r{number}')
+                rule = self.rules[number]
+                values = {
+                    name: match.group(group).strip()
+                    for name, group in self._groups[number]
+                }
+                templates = (rule.subject, rule.predicate, rule.object)
+                subject, predicate, obj = (
+                    t.format(**values).strip() for t in templates
+                )
+                fact = (subject, predicate, obj)
+                # Les parties extraites du texte doivent être non triviales
+                if any(
+                    '{' in template and len(value) <= 1
+                    for template, value in zip(templates, fact)
+                ):
+                    continue
+                if fact in candidates:
+                    candidates[fact] = candidates[fact]._replace(
+                        occurrences=candidates[fact].occurrences + 1
+                    )
+                else:
+                    candidates[fact] = FactCandidate(
+                        *fact, rule.confidence, rule.confirm
+                    )
+        return list(candidates.values())
+
+    def store(
+        self,
+        db: Session,
+        character_id: int,
+        found: Iterable[tuple[int, FactCandidate]],
+        commit: bool = True,
+    ) -> list[int]:
+        """Insère ou confirme des faits (mémoire source, fait) en une transaction
+
+        Les faits déjà connus sont cherchés en une requête ; les nouveaux sont
+        insérés en un seul INSERT multi-lignes et les confirmations appliquées
+        en un seul UPDATE groupé. Retourne les ids des faits touchés. Avec
+        `commit=False`, les écritures restent dans la transaction de l'appelant.
+        """
+        merged: dict[tuple[str, str, str], tuple[int, FactCandidate]] = {}
+        for memory_id, candidate in found:
+            key = candidate[:3]
+            if key in merged:
+                first_memory, previous = merged[key]
+                candidate = previous._replace(
+                    occurrences=previous.occurrences + candidate.occurrences
+                )
+                memory_id = first_memory
+            merged[key] = (memory_id, candidate)
+        if not merged:
+            return []
+
+        facts = FactModel.__table__
+        keys = list(merged)
+        existing: dict[tuple[str, str, str], tuple[int, float]] = {}
+        for start in range(0, len(keys), _CHUNK_SIZE):
+            rows = db.execute(
+                select(
+                    facts.c.id,
+                    facts.c.subject,
+                    facts.c.predicate,
+                    facts.c.object,
+                    facts.c.confidence,
+                ).where(
+                    facts.c.character_id == character_id,
+                    tuple_(facts.c.subject, facts.c.predicate, facts.c.object).in_(
+                        keys[start : start + _CHUNK_SIZE]
+                    ),
+                )
+            )
+            for fact_id, subject, predicate, obj, confidence in rows:
+                existing.setdefault((subject, predicate, obj), (fact_id, confidence))
+
+        now = datetime.datetime.now()
+        new_rows, confirmations, fact_ids = [], [], []
+        for key, (memory_id, candidate) in merged.items():
+            if key in existing:
+                fact_id, confidence = existing[key]
+                fact_ids.append(fact_id)
+                if candidate.confirm:
+                    confirmations.append(
+                        {
+                            'fact_id': fact_id,
+                            'confidence': min(
+                                1.0,
+                                (confidence or 0.0)
+                                + self.confirm_step * candidate.occurrences,
+                            ),
+                            'confirmed_at': now,
+                        }
+                    )
+                continue
+
+            confidence = candidate.confidence
+            if candidate.confirm:
+                confidence += self.confirm_step * (candidate.occurrences - 1)
+            new_rows.append(
+                {
+                    'character_id': character_id,
+                    'subject': candidate.subject,
+                    'predicate': candidate.predicate,
+                    'object': candidate.object,
+                    'confidence': min(1.0, confidence),
+                    'source_memory_id': memory_id,
+                    'created_at': now,
+                    'last_confirmed': now,
+                }
+            )
+
+        try:
+            # INSERT multi-lignes par paquets (limite de paramètres SQLite)
+            for start in range(0, len(new_rows), _CHUNK_SIZE):
+                chunk = new_rows[start : start + _CHUNK_SIZE]
+                fact_ids.extend(
+                    db.execute(insert(facts).values(chunk).returning(facts.c.id))
+                    .scalars()
+                    .all()
+                )
+            if confirmations:
+                db.execute(
+                    update(facts)
+                    .where(facts.c.id == bindparam('fact_id'))
+                    .values(
+                        confidence=bindparam('confidence'),
+                        last_confirmed=bindparam('confirmed_at'),
+                    ),
+                    confirmations,
+                )
+            if commit:
+                db.commit()
+        except Exception:
+            if commit:
+                db.rollback()
+            raise
+
+        logger.debug(
+            f'Faits du personnage {character_id}: {len(new_rows)} ajoutés, '
+            f'{len(confirmations)} confirmés'
+        )
+        return fact_ids
+
+    def extract(
+        self, db: Session, character_id: int, memory_id: int, content: str
+    ) -> list[int]:
+        """Extrait et stocke les faits d'une mémoire"""
+        return self.store(
+            db, character_id, ((memory_id, fact) for fact in self.scan(content))
+        )
+
+
+# Instance globale de l'extracteur de faits
+fact_extractor = FactExtractor()
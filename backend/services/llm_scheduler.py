@@ -0,0 +1,286 @@
+"""
+Ordonnanceur des générations : concurrence bornée, files équitables, priorités
+"""
+
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterator, Callable, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from enum import IntEnum
+
+import numpy as np
+
+from backend.utils.errors import LLMOverloadedException
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Classes de priorité : une valeur plus basse passe d'abord"""
+
+    INTERACTIVE = 0  # tour de conversation attendu par un utilisateur
+    BACKGROUND = 1  # maintenance, résumés : peut attendre
+
+
+class _Ticket:
+    """Demande de créneau en attente ou accordée"""
+
+    __slots__ = ('user', 'priority', 'enqueued', 'granted', 'started', 'wake')
+
+    def __init__(self, user, priority: Priority, wake: Callable[[], None]):
+        self.user = user
+        self.priority = priority
+        self.enqueued = time.monotonic()
+        self.granted = False
+        self.started = 0.0
+        self.wake = wake
+
+
+class LLMScheduler:
+    """Régule l'accès au backend LLM
+
+    Au plus `max_in_flight` générations tournent à la fois ; les autres
+    attendent dans une file par classe de priorité. Dans une classe, chaque
+    utilisateur a sa propre file et les créneaux sont servis à tour de rôle
+    entre utilisateurs : un client qui envoie dix messages d'affilée ne fait
+    pas attendre les autres derrière lui. Les tâches de fond ne passent
+    qu'en l'absence de tour interactif en attente et n'occupent jamais plus
+    de `background_slots` créneaux, ce qui en laisse toujours un libre pour
+    la conversation.
+
+    Quand l'attente devient déraisonnable, la demande est refusée plutôt
+    que mise en file : 429 si l'utilisateur a déjà `max_queue_per_user`
+    demandes en attente, 503 si la file globale est pleine ou si le
+    créneau n'a pas été obtenu en `queue_timeout` secondes. La latence de
+    queue reste ainsi bornée au lieu de croître avec la charge.
+
+    Les appelants synchrones (threads) et asynchrones partagent les mêmes
+    files : `slot()` et `aslot()` sont deux façons d'attendre le même tour.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 2,
+        max_queue: int = 32,
+        max_queue_per_user: int = 4,
+        background_slots: int = 1,
+        queue_timeout: float = 60.0,
+        window: int = 512,
+    ):
+        """Initialise l'ordonnanceur"""
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self.background_slots = max(1, min(background_slots, self.max_in_flight))
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        # priorité -> {utilisateur: file de tickets}, servie à tour de rôle
+        self._queues: dict[Priority, OrderedDict] = {p: OrderedDict() for p in Priority}
+        self._queued = {p: 0 for p in Priority}
+        self._in_flight = {p: 0 for p in Priority}
+        self._waits = {p: deque(maxlen=window) for p in Priority}
+        self._runs: deque = deque(maxlen=window)
+        self._counters = {
+            'admitted': 0,
+            'completed': 0,
+            'rejected_user': 0,
+            'rejected_full': 0,
+            'timeouts': 0,
+        }
+
+    # -- File d'attente (toujours sous self._lock) --
+
+    def _user_queued(self, user) -> int:
+        return sum(len(queues.get(user, ())) for queues in self._queues.values())
+
+    def _retry_after(self) -> int:
+        """Estimation (s) du temps d'écoulement de la file actuelle"""
+        run = float(np.median(self._runs)) if self._runs else 1.0
+        waiting = sum(self._queued.values()) + 1
+        return max(1, math.ceil(run * waiting / self.max_in_flight))
+
+    def _has_room(self, priority: Priority) -> bool:
+        """Vrai si une demande de cette priorité démarrerait sans attendre"""
+        if sum(self._in_flight.values()) >= self.max_in_flight:
+            return False
+        return (
+            priority is not Priority.BACKGROUND
+            or self._in_flight[priority] < self.background_slots
+        )
+
+    def _admit(self, user, priority: Priority, wake: Callable[[], None]) -> _Ticket:
+        with self._lock:
+            if user is not None and self._user_queued(user) >= self.max_queue_per_user:
+                self._counters['rejected_user'] += 1
+                raise LLMOverloadedException(
+                    'Trop de messages en attente pour cet utilisateur',
+                    status_code=429,
+                    retry_after=self._retry_after(),
+                )
+            if sum(self._queued.values()) >= self.max_queue and not self._has_room(
+                priority
+            ):
+                self._counters['rejected_full'] += 1
+                raise LLMOverloadedException(
+                    'Le modèle de langage est saturé',
+                    status_code=503,
+                    retry_after=self._retry_after(),
+                )
+            ticket = _Ticket(user, priority, wake)
+            self._queues[priority].setdefault(user, deque()).append(ticket)
+            self._queued[priority] += 1
+            self._counters['admitted'] += 1
+            self._dispatch()
+            return ticket
+
+    def _next(self) -> _Ticket | None:
+        for priority in Priority:
+            if (
+                priority is Priority.BACKGROUND
+                and self._in_flight[priority] >= self.background_slots
+            ):
+                continue
+            queues = self._queues[priority]
+            if not queues:
+                continue
+            user, tickets = next(iter(queues.items()))
+            ticket = tickets.popleft()
+            if tickets:
+                queues.move_to_end(user)  # au tour de l'utilisateur suivant
+            else:
+                del queues[user]
+            self._queued[priority] -= 1
+            return ticket
+        return None
+
+    def _dispatch(self):
+        while sum(self._in_flight.values()) < self.max_in_flight:
+            ticket = self._next()
+            if ticket is None:
+                return
+            ticket.granted = True
+            ticket.started = time.monotonic()
+            self._in_flight[ticket.priority] += 1
+            self._waits[ticket.priority].append(ticket.started - ticket.enqueued)
+            ticket.wake()
+
+    def _withdraw(self, ticket: _Ticket) -> bool:
+        """Retire un ticket non servi ; False s'il a été accordé entre-temps"""
+        with self._lock:
+            if ticket.granted:
+                return False
+            tickets = self._queues[ticket.priority].get(ticket.user)
+            tickets.remove(ticket)
+            if not tickets:
+                del self._queues[ticket.priority][ticket.user]
+            self._queued[ticket.priority] -= 1
+            return True
+
+    def _timed_out(self, ticket: _Ticket) -> LLMOverloadedException:
+        with self._lock:
+            self._counters['timeouts'] += 1
+            self._waits[ticket.priority].append(time.monotonic() - ticket.enqueued)
+            retry_after = self._retry_after()
+        logger.warning(
+            f'Créneau de génération non obtenu en {self.queue_timeout}s '
+            f'(priorité {ticket.priority.name.lower()})'
+        )
+        return LLMOverloadedException(
+            "Délai d'attente du modèle de langage dépassé",
+            status_code=503,
+            retry_after=retry_after,
+        )
+
+    def _release(self, ticket: _Ticket):
+        with self._lock:
+            self._in_flight[ticket.priority] -= 1
+            self._counters['completed'] += 1
+            self._runs.append(time.monotonic() - ticket.started)
+            self._dispatch()
+
+    # -- API publique --
+
+    @contextmanager
+    def slot(
+        self,
+        user_id: str | None = None,
+        priority: Priority = Priority.INTERACTIVE,
+        timeout: float | None = None,
+    ) -> Iterator[None]:
+        """Attend un créneau de génération (appelant synchrone)
+
+        Lève LLMOverloadedException si la demande est refusée ou si
+        l'attente dépasse `timeout` (par défaut `queue_timeout`).
+        """
+        granted = threading.Event()
+        ticket = self._admit(user_id, Priority(priority), granted.set)
+        wait = self.queue_timeout if timeout is None else timeout
+        if not granted.wait(wait) and self._withdraw(ticket):
+            raise self._timed_out(ticket)
+        try:
+            yield
+        finally:
+            self._release(ticket)
+
+    @asynccontextmanager
+    async def aslot(
+        self,
+        user_id: str | None = None,
+        priority: Priority = Priority.INTERACTIVE,
+        timeout: float | None = None,
+    ) -> AsyncIterator[None]:
+        """Attend un créneau de génération sans bloquer la boucle d'événements"""
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def wake():
+            # Appelé sous le verrou, éventuellement depuis un autre thread
+            loop.call_soon_threadsafe(
+                lambda: granted.done() or granted.set_result(None)
+            )
+
+        ticket = self._admit(user_id, Priority(priority), wake)
+        wait = self.queue_timeout if timeout is None else timeout
+        try:
+            # asyncio.wait n'annule pas `granted` à l'échéance : un créneau
+            # accordé entre-temps est détecté par l'échec du retrait
+            done, _ = await asyncio.wait({granted}, timeout=wait)
+        except BaseException:
+            # Requête annulée (client parti) : rendre le créneau s'il a été accordé
+            if not self._withdraw(ticket):
+                self._release(ticket)
+            raise
+        if not done and self._withdraw(ticket):
+            raise self._timed_out(ticket)
+        try:
+            yield
+        finally:
+            self._release(ticket)
+
+    def stats(self) -> dict:
+        """Occupation, profondeur des files et temps d'attente (ms) récents"""
+        with self._lock:
+            waits = {p: np.array(self._waits[p]) for p in Priority}
+            snapshot = {
+                'max_in_flight': self.max_in_flight,
+                'in_flight': {p.name.lower(): self._in_flight[p] for p in Priority},
+                'queued': {p.name.lower(): self._queued[p] for p in Priority},
+                'users_waiting': len(
+                    {user for p in Priority for user in self._queues[p]}
+                ),
+                **self._counters,
+            }
+        snapshot['wait_ms'] = {
+            p.name.lower(): {
+                'p50': round(float(np.percentile(waits[p], 50)) * 1000, 2),
+                'p95': round(float(np.percentile(waits[p], 95)) * 1000, 2),
+                'max': round(float(waits[p].max()) * 1000, 2),
+            }
+            for p in Priority
+            if len(waits[p])
+        }
+        return snapshot
@@ -2,14 +2,22 @@
 Service for accessing language models (LLM)
 """
 
+import asyncio
+import json
 import logging
 import random
 import time
+from collections.abc import Callable, Iterator
 from typing import Optional
 
-import requests
+import numpy as np
 
-from backend.config import LLM_CONFIG
+from backend.config import EMBEDDING_CONFIG, LLM_CONFIG, SYSTEM_LIMITS
+from backend.services.llm_scheduler import LLMScheduler, Priority
+from backend.services.model_registry import ModelRegistry
+from backend.utils.errors import LLMServiceException
+from backend.utils.http_client import AsyncHttpClient, HttpClient, LatencyRecorder
+from backend.utils.mock_embeddings import mock_embeddings
 
 logger = logging.getLogger(__name__)
 
@@ -25,67 +33,122 @@ class LLMService:
         self.mock_mode = self.config.get('mock_mode', True)
         self.temperature = self.config.get('temperature', 0.7)
         self.max_tokens = self.config.get('max_tokens', 1024)
+        self.keep_alive = self.config.get('keep_alive', '30m')
+        # Context window requested from Ollama; prompts are budgeted to fit it
+        self.num_ctx = SYSTEM_LIMITS['max_context_length']
+        self.embedding_model = self.config.get('embedding_model') or self.default_model
+        self.embedding_batch_size = max(1, self.config.get('embedding_batch_size', 256))
+        # Size of mock vectors, replaced by the real size once Ollama answers
+        self.embedding_dimensions = EMBEDDING_CONFIG.get('dimensions', 384)
+        # Pooled keep-alive connections with bounded timeouts and retries;
+        # the sync and async clients share the same latency statistics
+        http_options = dict(
+            connect_timeout=self.config.get('connect_timeout', 3.0),
+            read_timeout=self.config.get('read_timeout', 120.0),
+            max_retries=self.config.get('max_retries', 2),
+            retry_backoff=self.config.get('retry_backoff', 0.5),
+            pool_size=self.config.get('pool_size', 10),
+            latencies=LatencyRecorder(),
+        )
+        self.http = HttpClient(**http_options)
+        self.ahttp = AsyncHttpClient(**http_options)
+        # Bounded concurrency and per-user fair queuing in front of Ollama
+        self.scheduler = LLMScheduler(
+            max_in_flight=self.config.get('max_in_flight', 2),
+            max_queue=self.config.get('max_queue', 32),
+            max_queue_per_user=self.config.get('max_queue_per_user', 4),
+            background_slots=self.config.get('background_slots', 1),
+            queue_timeout=self.config.get('queue_timeout', 60.0),
+        )
+
+        # Installed models, checked in the background (see start()) rather
+        # than here, so importing the service never waits on the network
+        self.registry = ModelRegistry(
+            self.http,
+            self.api_url,
+            ttl=self.config.get('model_check_ttl', 60.0),
+            keep_alive=self.keep_alive,
+        )
+        if self.mock_mode:
+            self.registry.state = 'mock'
+        self._warm_up_pending = True
 
-        # Check model availability
+    def start(self):
+        """Starts background availability checks and model warm-up"""
         if not self.mock_mode:
-            self.check_model_availability()
+            self.registry.start(self.refresh_model)
+
+    def stop(self):
+        """Stops background availability checks"""
+        self.registry.stop()
+
+    def refresh_model(self):
+        """
+        Re-checks model availability and preloads the model into Ollama
 
-    def check_model_availability(self) -> bool:
+        The model is warmed up the first time it is found available (at
+        startup, or once Ollama comes back), so the first chat turn does
+        not pay the cold load. A model that Ollama has since unloaded
+        (keep_alive expired) is reported as available but no longer ready.
+        """
+        if not self.check_model_availability():
+            self._warm_up_pending = True
+            return
+        if self._warm_up_pending:
+            self._warm_up_pending = not self.registry.warm_up(self.default_model)
+        elif self.registry.state == 'ready':
+            loaded = self.registry.loaded_models()
+            if loaded is not None and self.default_model not in loaded:
+                self.registry.state = 'available'
+
+    def check_model_availability(self, max_age: Optional[float] = None) -> bool:
         """
         Checks if the specified model is available on the Ollama API
 
+        Args:
+            max_age: Maximum age in seconds of the cached model list
+                (registry TTL by default, 0 forces a new query)
+
         Returns:
             True if the model is available, False otherwise
         """
-        try:
-            # Retrieve the list of available models
-            response = requests.get(f'{self.api_url}/tags')
-
-            if response.status_code == 200:
-                models = response.json().get('models', [])
-                available_models = [model.get('name') for model in models]
-
-                # Correspondance exacte, sinon tolérante par préfixe
-                # (ex. 'llama3' -> 'llama3.1:latest') pour éviter une bascule
-                # mock surprise quand seul un tag versionné est installé.
-                resolved = None
-                if self.default_model in available_models:
-                    resolved = self.default_model
-                else:
-                    resolved = next(
-                        (m for m in available_models if m.startswith(self.default_model)),
-                        None,
-                    )
+        available_models = self.registry.models(max_age)
+        # Log state changes only: the check repeats every TTL in the background
+        was_live = not self.mock_mode and self.registry.model is not None
+        first_check = self.registry.state == 'checking'
 
-                if resolved:
-                    if resolved != self.default_model:
-                        logger.info(
-                            f"Model '{self.default_model}' résolu vers '{resolved}'."
-                        )
-                        self.default_model = resolved
-                    else:
-                        logger.info(f'Model {self.default_model} available on Ollama.')
-                    self.mock_mode = False
-                    return True
-                else:
-                    logger.warning(
-                        f'Model {self.default_model} not available on Ollama. Available models: {available_models}'
-                    )
-                    logger.warning('Switching to mock mode.')
-                    self.mock_mode = True
-                    return False
-            else:
-                logger.error(f'Error checking available models: {response.status_code}')
+        if available_models is None:
+            if was_live or first_check:
+                logger.error(
+                    f'Error checking available models: {self.registry.status()["last_error"]}'
+                )
                 logger.warning('Switching to mock mode.')
-                self.mock_mode = True
-                return False
+            self.mock_mode = True
+            self.registry.state = 'unavailable'
+            return False
 
-        except Exception as e:
-            logger.error(f'Exception while checking model: {e}')
-            logger.warning('Switching to mock mode.')
+        resolved = self.registry.resolve(self.default_model, available_models)
+        if not resolved:
+            if was_live or first_check:
+                logger.warning(
+                    f'Model {self.default_model} not available on Ollama. Available models: {available_models}'
+                )
+                logger.warning('Switching to mock mode.')
             self.mock_mode = True
+            self.registry.state = 'unavailable'
             return False
 
+        if resolved != self.default_model:
+            logger.info(f"Model '{self.default_model}' résolu vers '{resolved}'.")
+            self.default_model = resolved
+        elif not was_live:
+            logger.info(f'Model {self.default_model} available on Ollama.')
+        self.mock_mode = False
+        self.registry.model = resolved
+        if self.registry.state not in ('warming', 'ready'):
+            self.registry.state = 'available'
+        return True
+
     def generate_text(
         self,
         prompt: str,
@@ -93,6 +156,10 @@ class LLMService:
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
         system_prompt: Optional[str] = None,
+        user_id: Optional[str] = None,
+        priority: Priority = Priority.INTERACTIVE,
+        context: Optional[list[int]] = None,
+        on_done: Optional[Callable[[dict], None]] = None,
     ) -> str:
         """
         Generates text from a prompt using the configured model
@@ -103,49 +170,240 @@ class LLMService:
             temperature: Temperature for generation (controls creativity)
             max_tokens: Maximum number of tokens to generate
             system_prompt: System prompt to define the model's overall behavior
+            user_id: Requesting user, for fair queuing (optional)
+            priority: Scheduling class of the request
+            context: Token context returned by a previous generation; Ollama
+                reuses its evaluated prefix and only evaluates `prompt`
+            on_done: Called with Ollama's final response object ('context',
+                'prompt_eval_count', ...) when the model actually answered;
+                not called for mock or fallback responses
 
         Returns:
             Text generated by the model
+
+        Raises:
+            LLMOverloadedException: The scheduler refused or timed out the request
         """
+        payload = self._build_payload(
+            prompt, model, temperature, max_tokens, system_prompt, False, context
+        )
+        with self.scheduler.slot(user_id, priority):
+            return self._generate_text(prompt, payload, on_done)
+
+    def _generate_text(
+        self, prompt: str, payload: dict, on_done: Optional[Callable[[dict], None]]
+    ) -> str:
+        """Generation proper, once a scheduler slot is held"""
         if self.mock_mode:
             return self._generate_mock_response(prompt)
 
-        model = model or self.default_model
-        temperature = temperature or self.temperature
-        max_tokens = max_tokens or self.max_tokens
+        try:
+            response = self.http.post(f'{self.api_url}/generate', json=payload)
 
-        # Prepare parameters for the Ollama API
-        payload = {
-            'model': model,
-            'prompt': prompt,
-            'temperature': temperature,
-            'max_tokens': max_tokens,
-            'stream': False,
-        }
+            if response.status_code == 200:
+                result = response.json()
+                if on_done:
+                    on_done(result)
+                return result.get('response', '')
+            else:
+                logger.error(
+                    f'Error generating text: {response.status_code} - {response.text}'
+                )
+                return self._generate_mock_response(prompt)
+        except Exception as e:
+            logger.error(f'Exception during text generation: {e}')
+            return self._generate_mock_response(prompt)
 
-        if system_prompt:
-            payload['system'] = system_prompt
+    async def agenerate_text(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        system_prompt: Optional[str] = None,
+        user_id: Optional[str] = None,
+        priority: Priority = Priority.INTERACTIVE,
+        context: Optional[list[int]] = None,
+        on_done: Optional[Callable[[dict], None]] = None,
+    ) -> str:
+        """
+        Async counterpart of generate_text: awaits Ollama without blocking
+        the event loop, so one slow generation does not stall other requests
+
+        Same arguments as generate_text.
+
+        Returns:
+            Text generated by the model
+
+        Raises:
+            LLMOverloadedException: The scheduler refused or timed out the request
+        """
+        payload = self._build_payload(
+            prompt, model, temperature, max_tokens, system_prompt, False, context
+        )
+        async with self.scheduler.aslot(user_id, priority):
+            return await self._agenerate_text(prompt, payload, on_done)
+
+    async def _agenerate_text(
+        self, prompt: str, payload: dict, on_done: Optional[Callable[[dict], None]]
+    ) -> str:
+        """Async generation proper, once a scheduler slot is held"""
+        if self.mock_mode:
+            return await self._agenerate_mock_response(prompt)
 
         try:
-            response = requests.post(f'{self.api_url}/generate', json=payload)
+            response = await self.ahttp.post(f'{self.api_url}/generate', json=payload)
 
             if response.status_code == 200:
-                return response.json().get('response', '')
+                result = response.json()
+                if on_done:
+                    on_done(result)
+                return result.get('response', '')
             else:
                 logger.error(
                     f'Error generating text: {response.status_code} - {response.text}'
                 )
-                return self._generate_mock_response(prompt)
+                return await self._agenerate_mock_response(prompt)
         except Exception as e:
             logger.error(f'Exception during text generation: {e}')
-            return self._generate_mock_response(prompt)
+            return await self._agenerate_mock_response(prompt)
+
+    def generate_stream(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        system_prompt: Optional[str] = None,
+        user_id: Optional[str] = None,
+        priority: Priority = Priority.INTERACTIVE,
+        context: Optional[list[int]] = None,
+        on_done: Optional[Callable[[dict], None]] = None,
+    ) -> Iterator[str]:
+        """
+        Generates text token by token from Ollama's NDJSON stream
+
+        Same arguments as generate_text; `on_done` receives the final chunk.
+        The scheduler slot is obtained before this method returns, so a
+        refused request raises here rather than on first iteration; it is
+        held until the stream is exhausted or the returned generator is
+        closed. Fragments are yielded as soon as
+        Ollama emits them; closing the generator closes the HTTP stream.
+        If the request fails before the first fragment, the mock response
+        is streamed instead, as generate_text would return it.
+
+        Returns:
+            Iterator over successive fragments of the generated text
+
+        Raises:
+            LLMOverloadedException: The scheduler refused or timed out the request
+        """
+        payload = self._build_payload(
+            prompt, model, temperature, max_tokens, system_prompt, True, context
+        )
+        fragments = self._scheduled_stream(prompt, payload, on_done, user_id, priority)
+        next(fragments)  # runs admission and waits for the slot
+        return fragments
+
+    def _scheduled_stream(
+        self,
+        prompt: str,
+        payload: dict,
+        on_done: Optional[Callable[[dict], None]],
+        user_id: Optional[str],
+        priority: Priority,
+    ) -> Iterator[Optional[str]]:
+        """Holds a scheduler slot around _stream_text; first yields None once granted"""
+        with self.scheduler.slot(user_id, priority):
+            yield None
+            yield from self._stream_text(prompt, payload, on_done)
+
+    def _stream_text(
+        self, prompt: str, payload: dict, on_done: Optional[Callable[[dict], None]]
+    ) -> Iterator[str]:
+        """Streaming generation proper, once a scheduler slot is held"""
+        if self.mock_mode:
+            yield from self._stream_mock_response(prompt)
+            return
+
+        started = False
+        try:
+            with self.http.post(
+                f'{self.api_url}/generate', json=payload, stream=True
+            ) as response:
+                if response.status_code != 200:
+                    logger.error(
+                        f'Error streaming text: {response.status_code} - {response.text}'
+                    )
+                    yield from self._stream_mock_response(prompt)
+                    return
+
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get('error'):
+                        raise RuntimeError(chunk['error'])
+                    fragment = chunk.get('response', '')
+                    if fragment:
+                        started = True
+                        yield fragment
+                    if chunk.get('done'):
+                        if on_done:
+                            on_done(chunk)
+                        return
+        except Exception as e:
+            logger.error(f'Exception during text streaming: {e}')
+            if started:
+                raise
+            yield from self._stream_mock_response(prompt)
 
-    def _generate_mock_response(self, prompt: str) -> str:
+    def _build_payload(
+        self,
+        prompt: str,
+        model: Optional[str],
+        temperature: Optional[float],
+        max_tokens: Optional[int],
+        system_prompt: Optional[str],
+        stream: bool,
+        context: Optional[list[int]] = None,
+    ) -> dict:
+        """
+        Builds the request body of the Ollama /generate endpoint
+
+        Sampling parameters go in 'options', the only place Ollama reads
+        them ('num_predict' is its name for the maximum number of tokens,
+        'num_ctx' for the context window, which Ollama otherwise defaults to
+        a smaller size and silently truncates to).
+        'keep_alive' keeps the model, and with it the evaluated prefix of
+        the last context, loaded between turns.
+        """
+        payload = {
+            'model': model or self.default_model,
+            'prompt': prompt,
+            'stream': stream,
+            'keep_alive': self.keep_alive,
+            'options': {
+                'temperature': temperature or self.temperature,
+                'num_predict': max_tokens or self.max_tokens,
+                'num_ctx': self.num_ctx,
+            },
+        }
+
+        if system_prompt:
+            payload['system'] = system_prompt
+        if context:
+            payload['context'] = context
+
+        return payload
+
+    def _generate_mock_response(self, prompt: str, think_time: float = 0.5) -> str:
         """
         Generates a mock response in mock mode
 
         Args:
             prompt: Prompt text
+            think_time: Simulated generation delay in seconds
 
         Returns:
             Mock response
@@ -179,10 +437,34 @@ class LLMService:
         selected_response = random.choice(responses)
 
         # Add a small variation with a simulated "thinking" time
-        time.sleep(0.5)
+        if think_time:
+            time.sleep(think_time)
 
         return selected_response
 
+    async def _agenerate_mock_response(self, prompt: str) -> str:
+        """Mock response whose simulated delay does not block the event loop"""
+        await asyncio.sleep(0.5)
+        return self._generate_mock_response(prompt, think_time=0)
+
+    def _stream_mock_response(self, prompt: str) -> Iterator[str]:
+        """
+        Streams the mock response word by word
+
+        Args:
+            prompt: Prompt text
+
+        Yields:
+            Successive fragments of the mock response
+        """
+        words = self._generate_mock_response(prompt).split(' ')
+        for position, word in enumerate(words):
+            yield word if position == 0 else f' {word}'
+
+    async def aclose(self):
+        """Closes the async HTTP client (application shutdown)"""
+        await self.ahttp.aclose()
+
     def get_embedding(self, text: str) -> list[float]:
         """
         Gets the embedding of a text
@@ -193,30 +475,70 @@ class LLMService:
         Returns:
             Embedding vector
         """
-        if self.mock_mode:
-            # In mock mode, generate a random but deterministic vector
-            random.seed(hash(text))
-            return [random.uniform(-1, 1) for _ in range(384)]
+        return self.get_embeddings([text])[0].tolist()
 
-        try:
-            payload = {'model': self.default_model, 'prompt': text}
+    def get_embeddings(
+        self, texts: list[str], model: Optional[str] = None, fallback: bool = True
+    ) -> np.ndarray:
+        """
+        Gets the embeddings of several texts
 
-            response = requests.post(f'{self.api_url}/embeddings', json=payload)
+        Texts go to Ollama's multi-input /embed endpoint, one HTTP request
+        per `embedding_batch_size` texts instead of one per text.
 
-            if response.status_code == 200:
-                return response.json().get('embedding', [])
-            else:
-                logger.error(
-                    f'Error generating embedding: {response.status_code} - {response.text}'
+        Args:
+            texts: Texts to encode
+            model: Embedding model (optional, LLM_EMBEDDING_MODEL by default)
+            fallback: If True, mock mode and failed batches yield mock
+                vectors; if False, Ollama is always queried and a failure
+                raises LLMServiceException, so that mock vectors are never
+                mistaken for real ones (e.g. stored in a cache)
+
+        Returns:
+            float32 matrix of shape (len(texts), dimensions)
+        """
+        if fallback and self.mock_mode:
+            return self._mock_embeddings(texts)
+
+        model = model or self.embedding_model
+        size = self.embedding_batch_size
+        batches = [
+            self._embed_batch(texts[start : start + size], model, fallback)
+            for start in range(0, len(texts), size)
+        ]
+        if not batches:
+            return np.empty((0, self.embedding_dimensions), dtype=np.float32)
+        return np.vstack(batches)
+
+    def _embed_batch(self, texts: list[str], model: str, fallback: bool) -> np.ndarray:
+        """One /embed request for a batch of texts"""
+        payload = {'model': model, 'input': texts, 'keep_alive': self.keep_alive}
+        try:
+            response = self.http.post(f'{self.api_url}/embed', json=payload)
+            if response.status_code != 200:
+                raise RuntimeError(f'{response.status_code} - {response.text}')
+            embeddings = np.asarray(
+                response.json().get('embeddings', []), dtype=np.float32
+            )
+            if embeddings.ndim != 2 or len(embeddings) != len(texts):
+                raise RuntimeError(
+                    f'{len(embeddings)} embeddings for {len(texts)} texts'
                 )
-                # Fallback to mock mode
-                random.seed(hash(text))
-                return [random.uniform(-1, 1) for _ in range(384)]
         except Exception as e:
-            logger.error(f'Exception during embedding generation: {e}')
+            logger.error(f'Error generating embeddings: {e}')
+            if not fallback:
+                raise LLMServiceException(
+                    f'Error generating embeddings: {e}', model=model
+                ) from e
             # Fallback to mock mode
-            random.seed(hash(text))
-            return [random.uniform(-1, 1) for _ in range(384)]
+            return self._mock_embeddings(texts)
+        # Mock fallback vectors must stack with the real ones
+        self.embedding_dimensions = embeddings.shape[1]
+        return embeddings
+
+    def _mock_embeddings(self, texts: list[str]) -> np.ndarray:
+        """Deterministic mock vectors in [-1, 1], identical across processes"""
+        return mock_embeddings(texts, self.embedding_dimensions)
 
 
 # Global instance of the LLM service
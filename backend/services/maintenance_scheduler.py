@@ -0,0 +1,350 @@
+"""
+Maintenance des mémoires en arrière-plan : rotation sur tous les personnages
+"""
+
+import collections
+import datetime
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from backend.config import MAINTENANCE_CONFIG
+from backend.database import SessionLocal
+from backend.models.character import CharacterModel
+from backend.models.memory import MaintenanceLeaseModel
+from backend.services.memory_manager import memory_manager
+
+logger = logging.getLogger(__name__)
+
+
+class MaintenanceScheduler:
+    """Exécute `maintenance_cycle` pour chaque personnage, à tour de rôle
+
+    Un thread coordinateur choisit les personnages dont le dernier cycle
+    remonte à plus de `interval` secondes (les plus anciens d'abord) et les
+    confie à un pool de `workers` threads. Chaque cycle est borné par
+    `time_budget` secondes ; après un cycle, le worker se met en pause le
+    temps nécessaire pour ne pas dépasser `cpu_share` d'un cœur. Tant que
+    le chat reçoit plus de `busy_messages_per_minute` messages, aucun
+    nouveau cycle ne démarre.
+
+    Chaque worker uvicorn a son planificateur : le personnage est réservé
+    en base (table `maintenance_leases`, bail de `lease` secondes) avant
+    chaque cycle, et la fin du dernier cycle y est enregistrée. Un même
+    personnage n'est donc jamais maintenu deux fois en parallèle, ni deux
+    fois par intervalle, quel que soit le nombre de processus.
+    """
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        manager=memory_manager,
+        workers: int = MAINTENANCE_CONFIG['workers'],
+        interval: float = MAINTENANCE_CONFIG['interval'],
+        poll_interval: float = MAINTENANCE_CONFIG['poll_interval'],
+        time_budget: float = MAINTENANCE_CONFIG['time_budget'],
+        cpu_share: float = MAINTENANCE_CONFIG['cpu_share'],
+        busy_messages_per_minute: int = MAINTENANCE_CONFIG['busy_messages_per_minute'],
+        lease: float = MAINTENANCE_CONFIG['lease'],
+    ):
+        """Initialise le planificateur (aucun thread avant `start`)"""
+        self.session_factory = session_factory
+        self.manager = manager
+        self.workers = max(1, workers)
+        self.interval = interval
+        self.poll_interval = poll_interval
+        self.time_budget = time_budget
+        self.cpu_share = min(1.0, max(0.01, cpu_share))
+        self.busy_messages_per_minute = busy_messages_per_minute
+        self.lease = lease
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{id(self)}'
+        self._activity: collections.deque = collections.deque()
+        self._last_runs: dict[int, dict] = {}
+        self._running: set[int] = set()
+        self._cooling = 0
+        self._ready_engines: set = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._coordinator: threading.Thread | None = None
+        self._pool: ThreadPoolExecutor | None = None
+        self.skipped_busy = 0
+
+    # --- Activité du chat ---
+
+    def notify_activity(self):
+        """Signale un message de chat (utilisé pour suspendre la maintenance)"""
+        now = time.monotonic()
+        with self._lock:
+            self._activity.append(now)
+            self._trim_activity(now)
+
+    def _trim_activity(self, now: float):
+        while self._activity and now - self._activity[0] > 60:
+            self._activity.popleft()
+
+    def is_busy(self) -> bool:
+        """Vrai si le trafic du chat dépasse le seuil par minute"""
+        with self._lock:
+            self._trim_activity(time.monotonic())
+            return len(self._activity) >= self.busy_messages_per_minute
+
+    # --- Cycle de vie ---
+
+    def start(self):
+        """Démarre le coordinateur et le pool de workers"""
+        if self._coordinator is not None and self._coordinator.is_alive():
+            return
+        self._stopped.clear()
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix='memory-maintenance'
+        )
+        self._coordinator = threading.Thread(
+            target=self._run, name='memory-maintenance-scheduler', daemon=True
+        )
+        self._coordinator.start()
+        logger.info(
+            f'Maintenance des mémoires démarrée ({self.workers} workers, '
+            f'cycle toutes les {self.interval:.0f}s par personnage)'
+        )
+
+    def stop(self):
+        """Arrête le coordinateur et attend la fin des cycles en cours"""
+        self._stopped.set()
+        if self._coordinator is not None:
+            self._coordinator.join(timeout=5)
+            self._coordinator = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    # --- Planification ---
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self._schedule()
+            except Exception as e:
+                logger.error(f'Erreur du planificateur de maintenance: {e}')
+            self._stopped.wait(self.poll_interval)
+
+    def _schedule(self):
+        if self.is_busy():
+            self.skipped_busy += 1
+            logger.debug('Trafic du chat élevé, maintenance différée')
+            return
+
+        with self._lock:
+            free_slots = self.workers - len(self._running) - self._cooling
+        for character_id in self.due_characters()[: max(0, free_slots)]:
+            if self._claim(character_id, due_only=True):
+                self._pool.submit(self._work, character_id)
+
+    def _ensure_table(self, db: Session):
+        engine = db.get_bind()
+        if engine not in self._ready_engines:
+            MaintenanceLeaseModel.__table__.create(engine, checkfirst=True)
+            self._ready_engines.add(engine)
+
+    def _claim(self, character_id: int, due_only: bool = False) -> bool:
+        """Réserve le personnage ; faux si un cycle est déjà en cours pour lui
+
+        La réservation locale évite l'aller-retour en base ; le bail en base
+        (UPDATE conditionnel) tranche entre processus. Avec `due_only`, le
+        bail n'est accordé que si le dernier cycle, éventuellement terminé
+        par un autre processus depuis `due_characters`, date de plus de
+        `interval` secondes.
+        """
+        with self._lock:
+            if character_id in self._running:
+                return False
+            self._running.add(character_id)
+        now = datetime.datetime.now()
+        table = MaintenanceLeaseModel
+        try:
+            with self.session_factory() as db:
+                self._ensure_table(db)
+                db.execute(
+                    insert(table)
+                    .prefix_with('OR IGNORE')
+                    .values(character_id=character_id)
+                )
+                conditions = [
+                    table.character_id == character_id,
+                    or_(table.owner.is_(None), table.leased_until < now),
+                ]
+                if due_only:
+                    conditions.append(
+                        or_(
+                            table.finished_at.is_(None),
+                            table.finished_at
+                            <= now - datetime.timedelta(seconds=self.interval),
+                        )
+                    )
+                claimed = db.execute(
+                    update(table)
+                    .where(*conditions)
+                    .values(
+                        owner=self.owner,
+                        leased_until=now + datetime.timedelta(seconds=self.lease),
+                    )
+                )
+                db.commit()
+            if claimed.rowcount == 1:
+                return True
+        except Exception as e:
+            logger.error(f'Bail de maintenance du personnage {character_id}: {e}')
+        with self._lock:
+            self._running.discard(character_id)
+        return False
+
+    def _release(self, character_id: int, finished: bool):
+        """Rend le bail ; `finished` enregistre la fin du cycle en base"""
+        values = {'owner': None, 'leased_until': None}
+        if finished:
+            values['finished_at'] = datetime.datetime.now()
+        try:
+            with self.session_factory() as db:
+                db.execute(
+                    update(MaintenanceLeaseModel)
+                    .where(
+                        MaintenanceLeaseModel.character_id == character_id,
+                        MaintenanceLeaseModel.owner == self.owner,
+                    )
+                    .values(**values)
+                )
+                db.commit()
+        except Exception as e:
+            logger.error(f'Bail de maintenance du personnage {character_id}: {e}')
+        finally:
+            with self._lock:
+                self._running.discard(character_id)
+
+    def due_characters(self) -> list[int]:
+        """Personnages à traiter, du plus anciennement maintenu au plus récent
+
+        Les dates de fin et les baux viennent de la base : un personnage
+        maintenu ou réservé par un autre processus n'est pas dû.
+        """
+        now = datetime.datetime.now()
+        with self.session_factory() as db:
+            self._ensure_table(db)
+            character_ids = db.execute(select(CharacterModel.id)).scalars().all()
+            leases = {
+                row.character_id: row
+                for row in db.execute(
+                    select(
+                        MaintenanceLeaseModel.character_id,
+                        MaintenanceLeaseModel.owner,
+                        MaintenanceLeaseModel.leased_until,
+                        MaintenanceLeaseModel.finished_at,
+                    )
+                )
+            }
+
+        with self._lock:
+            running = set(self._running)
+        interval = datetime.timedelta(seconds=self.interval)
+        oldest = datetime.datetime.min
+        due = []
+        for character_id in character_ids:
+            lease = leases.get(character_id)
+            if character_id in running or (
+                lease is not None
+                and lease.owner is not None
+                and lease.leased_until >= now
+            ):
+                continue
+            finished = lease.finished_at if lease is not None else None
+            if finished is None or now - finished >= interval:
+                due.append((finished or oldest, character_id))
+        return [character_id for _, character_id in sorted(due)]
+
+    def _work(self, character_id: int):
+        cooldown, finished = 0.0, False
+        try:
+            if self._stopped.is_set() or self.is_busy():
+                return
+            run = self._cycle(character_id)
+            finished = True
+            # Pause proportionnelle au CPU consommé : part de CPU bornée
+            cooldown = run['cpu_seconds'] * (1.0 / self.cpu_share - 1.0)
+        except Exception as e:
+            logger.error(
+                f'Erreur de maintenance pour le personnage {character_id}: {e}'
+            )
+        finally:
+            # Le personnage est rendu avant la pause, qui n'occupe que le worker
+            self._release(character_id, finished)
+        if cooldown > 0:
+            with self._lock:
+                self._cooling += 1
+            try:
+                self._stopped.wait(cooldown)
+            finally:
+                with self._lock:
+                    self._cooling -= 1
+
+    def run_character(self, character_id: int, db: Session | None = None) -> dict:
+        """Exécute un cycle pour un personnage et en conserve les statistiques
+
+        Si un cycle est déjà en cours pour ce personnage (planifié ou
+        demandé, dans ce processus ou un autre), rien n'est exécuté et le
+        résultat vaut `{'busy': True}`.
+        """
+        if not self._claim(character_id):
+            return {'busy': True, 'statistics': {}}
+        finished = False
+        try:
+            run = self._cycle(character_id, db)
+            finished = True
+            return run
+        finally:
+            self._release(character_id, finished)
+
+    def _cycle(self, character_id: int, db: Session | None = None) -> dict:
+        started_at = datetime.datetime.now()
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+
+        if db is None:
+            with self.session_factory() as session:
+                stats = self.manager.maintenance_cycle(
+                    session, character_id, self.time_budget
+                )
+        else:
+            stats = self.manager.maintenance_cycle(db, character_id, self.time_budget)
+
+        run = {
+            'started_at': started_at.isoformat(),
+            'duration': round(time.perf_counter() - wall_start, 3),
+            'cpu_seconds': round(time.thread_time() - cpu_start, 3),
+            'statistics': stats,
+        }
+        with self._lock:
+            self._last_runs[character_id] = run
+        return run
+
+    def status(self) -> dict:
+        """État du planificateur et dernier cycle de chaque personnage"""
+        with self._lock:
+            self._trim_activity(time.monotonic())
+            last_runs = dict(self._last_runs)
+            return {
+                'running': self._coordinator is not None
+                and self._coordinator.is_alive(),
+                'workers': self.workers,
+                'in_progress': sorted(self._running),
+                'chat_messages_last_minute': len(self._activity),
+                'busy': len(self._activity) >= self.busy_messages_per_minute,
+                'skipped_busy': self.skipped_busy,
+                'characters': last_runs,
+            }
+
+
+# Instance globale du planificateur de maintenance
+maintenance_scheduler = MaintenanceScheduler()
@@ -0,0 +1,283 @@
+"""
+Archivage des mémoires froides : table compressée et restauration à la demande
+"""
+
+import datetime
+import json
+import logging
+import time
+import zlib
+from collections import defaultdict
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import Session, undefer
+
+from backend.config import MEMORY_CONFIG
+from backend.models.memory import ArchivedMemoryModel, FactModel, MemoryModel
+from backend.services.access_tracker import access_tracker
+from backend.services.memory_index import memory_index
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryArchiver:
+    """Déplace les mémoires froides hors de la table `memories`
+
+    Une mémoire est froide quand son importance est passée sous le seuil
+    (après dégradation), qu'elle a été peu consultée et qu'elle n'a été ni
+    créée ni consultée depuis `min_age_days` (un accès encore en attente
+    d'écriture compte comme récent). Elle quitte alors la table des
+    mémoires, l'index vectoriel et l'index plein texte ; seule la table de
+    travail est parcourue par les recherches, ce qui la garde assez petite
+    pour rester dans le cache de pages. Les mémoires archivées sont
+    restaurées, avec leur id, dès qu'elles sont demandées.
+
+    Les ids de `memories` pouvant être réattribués par SQLite, les faits
+    d'une mémoire archivée ne pointent plus vers elle : leurs ids sont
+    conservés dans l'archive et ils sont rattachés à la mémoire restaurée.
+    """
+
+    def __init__(
+        self,
+        importance_threshold: float = MEMORY_CONFIG['archive_importance_threshold'],
+        max_access_count: int = MEMORY_CONFIG['archive_max_access_count'],
+        min_age_days: int = MEMORY_CONFIG['archive_min_age_days'],
+        batch_size: int = 500,
+        compression_level: int = 6,
+    ):
+        """Initialise l'archiveur"""
+        self.importance_threshold = importance_threshold
+        self.max_access_count = max_access_count
+        self.min_age_days = min_age_days
+        self.batch_size = batch_size
+        self.compression_level = compression_level
+        self.index = memory_index
+        self.access_tracker = access_tracker
+        self._ready_engines: set = set()
+
+    def _ensure_table(self, db: Session):
+        engine = db.get_bind()
+        if engine not in self._ready_engines:
+            ArchivedMemoryModel.__table__.create(engine, checkfirst=True)
+            self._ready_engines.add(engine)
+
+    def cold_memory_ids(
+        self, db: Session, character_id: int, now: datetime.datetime | None = None
+    ) -> list[int]:
+        """Ids des mémoires d'un personnage à archiver"""
+        now = now or datetime.datetime.now()
+        cutoff = now - datetime.timedelta(days=self.min_age_days)
+        accessed = self.access_tracker.pending_ids(db)
+        candidates: list[int] = list(
+            db.scalars(
+                select(MemoryModel.id)
+                .where(
+                    MemoryModel.character_id == character_id,
+                    MemoryModel.importance < self.importance_threshold,
+                    func.coalesce(MemoryModel.access_count, 0) <= self.max_access_count,
+                    func.coalesce(MemoryModel.last_accessed, MemoryModel.created_at)
+                    < cutoff,
+                )
+                .order_by(MemoryModel.id)
+            )
+        )
+        return [memory_id for memory_id in candidates if memory_id not in accessed]
+
+    def _pack(self, memory: MemoryModel, fact_ids: list[int]) -> bytes:
+        payload = {
+            'content': memory.content,
+            'metadata': memory.memory_metadata,
+            'facts': fact_ids,
+        }
+        return zlib.compress(
+            json.dumps(payload, ensure_ascii=False).encode('utf-8'),
+            self.compression_level,
+        )
+
+    @staticmethod
+    def _unpack(payload: bytes) -> dict:
+        return json.loads(zlib.decompress(payload).decode('utf-8'))
+
+    def archive(
+        self,
+        db: Session,
+        character_id: int,
+        deadline: float | None = None,
+        now: datetime.datetime | None = None,
+    ) -> int:
+        """Archive les mémoires froides d'un personnage ; retourne leur nombre
+
+        Les mémoires sont traitées par lots dans une seule transaction ; si
+        `deadline` (time.monotonic) est dépassée, les lots restants
+        attendent le cycle suivant.
+        """
+        now = now or datetime.datetime.now()
+        self._ensure_table(db)
+        ids = self.cold_memory_ids(db, character_id, now)
+        archived = []
+        try:
+            for start in range(0, len(ids), self.batch_size):
+                if deadline is not None and time.monotonic() > deadline:
+                    break
+                chunk = ids[start : start + self.batch_size]
+                memories = (
+                    db.query(MemoryModel)
+                    .options(undefer(MemoryModel.embedding))
+                    .filter(MemoryModel.id.in_(chunk))
+                    .all()
+                )
+                facts = defaultdict(list)
+                for fact_id, memory_id in db.execute(
+                    select(FactModel.id, FactModel.source_memory_id).where(
+                        FactModel.source_memory_id.in_(chunk)
+                    )
+                ):
+                    facts[memory_id].append(fact_id)
+                db.execute(
+                    insert(ArchivedMemoryModel),
+                    [
+                        {
+                            'id': memory.id,
+                            'character_id': memory.character_id,
+                            'type': memory.type,
+                            'importance': memory.importance,
+                            'access_count': memory.access_count or 0,
+                            'created_at': memory.created_at,
+                            'archived_at': now,
+                            'payload': self._pack(memory, facts[memory.id]),
+                            'embedding': memory.embedding,
+                        }
+                        for memory in memories
+                    ],
+                )
+                db.execute(
+                    update(FactModel)
+                    .where(FactModel.source_memory_id.in_(chunk))
+                    .values(source_memory_id=None)
+                    .execution_options(synchronize_session=False)
+                )
+                db.execute(
+                    delete(MemoryModel)
+                    .where(MemoryModel.id.in_(chunk))
+                    .execution_options(synchronize_session=False)
+                )
+                for memory in memories:
+                    db.expunge(memory)
+                archived.extend(chunk)
+            if archived:
+                db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        if archived:
+            self.index.remove(db, character_id, archived)
+            logger.info(
+                f'{len(archived)} mémoires archivées pour le personnage {character_id}'
+            )
+        return len(archived)
+
+    def restore(
+        self, db: Session, memory_ids: list[int], now: datetime.datetime | None = None
+    ) -> list[MemoryModel]:
+        """Réintègre des mémoires archivées dans la table de travail
+
+        La mémoire reprend son id, sauf s'il a été réattribué entre-temps :
+        elle en reçoit alors un nouveau. Ses faits lui sont rattachés. La date
+        d'accès est mise à jour, ce qui l'écarte du prochain archivage.
+        """
+        now = now or datetime.datetime.now()
+        self._ensure_table(db)
+        archived = (
+            db.query(ArchivedMemoryModel)
+            .options(
+                undefer(ArchivedMemoryModel.payload),
+                undefer(ArchivedMemoryModel.embedding),
+            )
+            .filter(ArchivedMemoryModel.id.in_(memory_ids))
+            .all()
+        )
+        if not archived:
+            return []
+
+        taken = set(
+            db.scalars(
+                select(MemoryModel.id).where(
+                    MemoryModel.id.in_([row.id for row in archived])
+                )
+            )
+        )
+        restored = []
+        try:
+            for row in archived:
+                data = self._unpack(row.payload)
+                memory = MemoryModel(
+                    id=None if row.id in taken else row.id,
+                    character_id=row.character_id,
+                    type=row.type,
+                    content=data['content'],
+                    importance=row.importance,
+                    memory_metadata=data.get('metadata'),
+                    embedding=row.embedding,
+                    created_at=row.created_at,
+                    last_accessed=now,
+                    access_count=row.access_count,
+                )
+                db.add(memory)
+                db.delete(row)
+                restored.append((row.id, data.get('facts'), memory))
+            db.flush()
+            for archived_id, fact_ids, memory in restored:
+                if fact_ids:
+                    linked = FactModel.id.in_(fact_ids)
+                elif fact_ids is None and memory.id != archived_id:
+                    # Archive antérieure : les faits pointent encore vers l'id
+                    linked = FactModel.source_memory_id == archived_id
+                else:
+                    continue
+                db.execute(
+                    update(FactModel).where(linked).values(source_memory_id=memory.id)
+                )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        by_character = defaultdict(list)
+        for _, _, memory in restored:
+            by_character[memory.character_id].append(memory)
+        for character_id, memories in by_character.items():
+            indexed = [memory for memory in memories if memory.embedding is not None]
+            if indexed:
+                self.index.add(
+                    db,
+                    character_id,
+                    [memory.id for memory in indexed],
+                    [memory.embedding for memory in indexed],
+                    created_at=[memory.created_at.timestamp() for memory in indexed],
+                    importance=[memory.importance or 0.0 for memory in indexed],
+                    access_count=[memory.access_count or 0 for memory in indexed],
+                )
+        return [memory for _, _, memory in restored]
+
+    def delete(self, db: Session, memory_ids: list[int]) -> int:
+        """Supprime définitivement des mémoires archivées ; retourne leur nombre"""
+        self._ensure_table(db)
+        result = db.execute(
+            delete(ArchivedMemoryModel).where(ArchivedMemoryModel.id.in_(memory_ids))
+        )
+        db.commit()
+        return result.rowcount
+
+    def count(self, db: Session, character_id: int) -> int:
+        """Nombre de mémoires archivées d'un personnage"""
+        self._ensure_table(db)
+        return (
+            db.query(ArchivedMemoryModel)
+            .filter(ArchivedMemoryModel.character_id == character_id)
+            .count()
+        )
+
+
+# Instance globale de l'archiveur
+memory_archiver = MemoryArchiver()
@@ -0,0 +1,270 @@
+"""
+Consolidation des mémoires quasi identiques : similarité par blocs et union-find
+"""
+
+import datetime
+import logging
+import time
+
+import numpy as np
+from sqlalchemy import bindparam, delete, select, update
+from sqlalchemy.orm import Session
+
+from backend.models.memory import FactModel, MemoryModel
+from backend.services.access_tracker import access_tracker
+from backend.services.memory_index import memory_index
+
+logger = logging.getLogger(__name__)
+
+
+class UnionFind:
+    """Ensembles disjoints sur les entiers 0..n-1 (compression de chemin)"""
+
+    def __init__(self, size: int):
+        self.parent = np.arange(size, dtype=np.int64)
+
+    def find(self, item: int) -> int:
+        parent = self.parent
+        root = item
+        while parent[root] != root:
+            root = parent[root]
+        while parent[item] != root:
+            parent[item], item = root, parent[item]
+        return int(root)
+
+    def union(self, a: int, b: int):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    def groups(self) -> list[np.ndarray]:
+        """Ensembles de plus d'un élément"""
+        roots = np.array([self.find(i) for i in range(len(self.parent))])
+        order = np.argsort(roots, kind='stable')
+        boundaries = np.flatnonzero(np.diff(roots[order])) + 1
+        return [group for group in np.split(order, boundaries) if len(group) > 1]
+
+
+def similar_pairs(
+    vectors: np.ndarray,
+    threshold: float,
+    block_size: int = 1024,
+    deadline: float | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Paires (i, j), i < j, de vecteurs normalisés dont le cosinus dépasse le seuil
+
+    La matrice de similarité n'est jamais matérialisée : elle est parcourue
+    par tuiles de `block_size` × `block_size` (triangle supérieur uniquement),
+    la mémoire de travail reste donc en O(block_size²) quel que soit le nombre
+    de vecteurs. Passé `deadline` (horloge `time.monotonic`), les tuiles
+    restantes sont ignorées.
+    """
+    rows, cols = [], []
+    size = len(vectors)
+    tiles = (
+        (start, col)
+        for start in range(0, size, block_size)
+        for col in range(start, size, block_size)
+    )
+    for start, col in tiles:
+        if deadline is not None and time.monotonic() > deadline:
+            break
+        stop, col_stop = min(start + block_size, size), min(col + block_size, size)
+        similarity = vectors[start:stop] @ vectors[col:col_stop].T
+        if col == start:
+            # Diagonale et triangle inférieur : déjà comptés ou triviaux
+            similarity[np.tril_indices(stop - start)] = -1.0
+        block_rows, block_cols = np.nonzero(similarity > threshold)
+        rows.append(block_rows + start)
+        cols.append(block_cols + col)
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(rows), np.concatenate(cols)
+
+
+class MemoryConsolidator:
+    """Regroupe les mémoires quasi identiques d'un personnage et les fusionne
+
+    Les similarités sont calculées par blocs sur la matrice de l'index
+    vectoriel, séparément pour chaque type de mémoire. Les paires au-dessus du
+    seuil sont regroupées par union-find (la similarité est donc transitive à
+    l'intérieur d'un groupe). Pour chaque groupe, la mémoire la plus
+    importante (puis la plus récente) est conservée, son importance est
+    renforcée de 20 % par mémoire absorbée (plafond 9.0), les faits des
+    mémoires absorbées lui sont rattachés, et les autres sont supprimées, le
+    tout dans une seule transaction. Leurs accès encore en attente d'écriture
+    sont reportés sur la mémoire conservée.
+    """
+
+    def __init__(self, block_size: int = 1024, importance_boost: float = 1.2):
+        """Initialise le moteur de consolidation"""
+        self.block_size = block_size
+        self.importance_boost = importance_boost
+        self.index = memory_index
+        self.access_tracker = access_tracker
+
+    def find_clusters(
+        self,
+        vectors: np.ndarray,
+        types: np.ndarray,
+        threshold: float,
+        deadline: float | None = None,
+    ) -> tuple[list[np.ndarray], int]:
+        """Groupes de positions similaires (même type) et nombre de paires"""
+        union_find = UnionFind(len(vectors))
+        pair_count = 0
+        for memory_type in np.unique(types):
+            positions = np.flatnonzero(types == memory_type)
+            if len(positions) < 2:
+                continue
+            rows, cols = similar_pairs(
+                vectors[positions], threshold, self.block_size, deadline
+            )
+            pair_count += len(rows)
+            for a, b in zip(positions[rows], positions[cols]):
+                union_find.union(int(a), int(b))
+        return union_find.groups(), pair_count
+
+    def consolidate(
+        self,
+        db: Session,
+        character_id: int,
+        similarity_threshold: float = 0.85,
+        deadline: float | None = None,
+    ) -> dict[str, float]:
+        """Consolide tout l'historique d'un personnage ; retourne les statistiques
+
+        Avec `deadline`, la recherche s'arrête à l'échéance et seuls les
+        groupes déjà trouvés sont fusionnés (`complete` vaut alors False).
+        """
+        start = time.perf_counter()
+        index = self.index.get(db, character_id)
+        with index.lock:
+            memory_ids = index.ids.copy()
+            vectors = index.vectors.copy()
+            importance = index.attribute('importance').copy()
+            created_at = index.attribute('created_at').copy()
+
+        types_by_id = dict(
+            db.execute(
+                select(MemoryModel.id, MemoryModel.type).where(
+                    MemoryModel.character_id == character_id
+                )
+            ).all()
+        )
+        types = np.array([types_by_id.get(int(i), '') for i in memory_ids])
+
+        clusters, pair_count = self.find_clusters(
+            vectors, types, similarity_threshold, deadline
+        )
+        complete = deadline is None or time.monotonic() <= deadline
+
+        stats = {
+            'memories': len(memory_ids),
+            'similar_pairs': pair_count,
+            'clusters': len(clusters),
+            'largest_cluster': max((len(c) for c in clusters), default=0),
+            'merged': 0,
+            'complete': complete,
+        }
+        if clusters:
+            stats['merged'] = self._merge(
+                db, character_id, clusters, memory_ids, vectors, importance, created_at
+            )
+        stats['seconds'] = round(time.perf_counter() - start, 3)
+
+        if stats['merged']:
+            logger.info(
+                f'Consolidation terminée: {stats["merged"]} mémoires fusionnées en '
+                f'{stats["clusters"]} groupes pour le personnage {character_id} '
+                f'({stats["seconds"]}s)'
+            )
+        return stats
+
+    def _merge(
+        self,
+        db: Session,
+        character_id: int,
+        clusters: list[np.ndarray],
+        memory_ids: np.ndarray,
+        vectors: np.ndarray,
+        importance: np.ndarray,
+        created_at: np.ndarray,
+    ) -> int:
+        now = datetime.datetime.now().isoformat()
+        merges = {}  # id conservé -> (ids absorbés, similarité minimale)
+        for cluster in clusters:
+            # Plus importante d'abord, puis plus récente
+            keep = cluster[np.lexsort((-created_at[cluster], -importance[cluster]))[0]]
+            others = cluster[cluster != keep]
+            similarity = float((vectors[others] @ vectors[keep]).min())
+            merges[int(memory_ids[keep])] = (memory_ids[others].tolist(), similarity)
+
+        discarded = [i for ids, _ in merges.values() for i in ids]
+        keepers = [
+            memory
+            for chunk in _chunks(list(merges), 500)
+            for memory in db.query(MemoryModel).filter(MemoryModel.id.in_(chunk))
+        ]
+
+        try:
+            for memory in keepers:
+                absorbed, similarity = merges[memory.id]
+                memory.importance = min(
+                    9.0, memory.importance * self.importance_boost ** len(absorbed)
+                )
+                metadata = dict(memory.memory_metadata or {})
+                metadata['consolidated_with'] = absorbed
+                metadata['consolidation_date'] = now
+                metadata['similarity_score'] = similarity
+                memory.memory_metadata = metadata
+            db.flush()
+
+            facts = FactModel.__table__
+            db.execute(
+                update(facts)
+                .where(facts.c.source_memory_id == bindparam('discarded_id'))
+                .values(source_memory_id=bindparam('kept_id')),
+                [
+                    {'discarded_id': discarded_id, 'kept_id': kept_id}
+                    for kept_id, (absorbed, _) in merges.items()
+                    for discarded_id in absorbed
+                ],
+            )
+            for chunk in _chunks(discarded, 500):
+                db.execute(
+                    delete(MemoryModel)
+                    .where(MemoryModel.id.in_(chunk))
+                    .execution_options(synchronize_session=False)
+                )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        self.index.remove(db, character_id, discarded)
+        self.index.update(
+            db,
+            character_id,
+            [memory.id for memory in keepers],
+            importance=[memory.importance for memory in keepers],
+        )
+        self.access_tracker.redirect(
+            db,
+            character_id,
+            {
+                discarded_id: kept_id
+                for kept_id, (absorbed, _) in merges.items()
+                for discarded_id in absorbed
+            },
+        )
+        return len(discarded)
+
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+# Instance globale du moteur de consolidation
+memory_consolidator = MemoryConsolidator()
@@ -0,0 +1,178 @@
+"""
+Score d'importance des mémoires : lexiques dédoublonnés, comptés par str.count
+"""
+
+# Ajustement selon le type de mémoire
+TYPE_WEIGHTS = {
+    'conversation': 1.0,
+    'event': 1.5,  # Les événements sont généralement plus importants
+    'observation': 0.8,  # Les observations sont souvent moins importantes
+    'thought': 0.9,  # Les pensées sont modérément importantes
+    'facts_extraction': 1.2,  # Les faits extraits ont une importance accrue
+    'user_message': 1.3,  # Les messages de l'utilisateur sont plus importants
+    'character_message': 1.0,  # Les réponses du personnage ont une importance standard
+}
+
+# Mots-clés indiquant une information importante
+IMPORTANT_MARKERS = [
+    'important',
+    'crucial',
+    'essentiel',
+    'clé',
+    'vital',
+    'critique',
+    'toujours',
+    'jamais',
+    'adore',
+    'déteste',
+    'aime',
+    'hais',
+    'secret',
+    'confidential',
+    'promesse',
+    'jure',
+    'avoue',
+    'révèle',
+    'découvre',
+    'explique',
+    'comprend',
+    'réalise',
+    'première fois',
+    'dernier',
+    'meilleur',
+    'pire',
+]
+
+# Expressions temporelles dénotant l'importance
+TEMPORAL_MARKERS = [
+    'hier',
+    "aujourd'hui",
+    'demain',
+    'maintenant',
+    'immédiatement',
+    'plus jamais',
+    'toujours',
+    'tous les jours',
+]
+
+# Indicateurs émotionnels forts
+EMOTION_MARKERS = [
+    'heureux',
+    'triste',
+    'furieux',
+    'effrayé',
+    'excité',
+    'nerveux',
+    'angoissé',
+    'terrifié',
+    'ravi',
+    'extatique',
+    'traumatisé',
+    'choqué',
+    'surpris',
+    'ému',
+    'frustré',
+    'énervé',
+    'déçu',
+    'fier',
+    'honteux',
+    'coupable',
+    'embarrassé',
+]
+
+# Informations personnelles ou identitaires
+IDENTITY_MARKERS = [
+    'mon nom',
+    "je m'appelle",
+    'je suis',
+    'ma ville',
+    'mon âge',
+    'mon adresse',
+    'mon travail',
+    'ma famille',
+    'mes enfants',
+    'mon père',
+    'ma mère',
+    'mon frère',
+    'ma sœur',
+    'ma date de naissance',
+]
+
+# Poids de chaque occurrence, par catégorie
+CATEGORY_WEIGHTS = {
+    'important': 0.5,
+    'temporal': 0.3,
+    'emotion': 0.4,
+    'identity': 0.7,
+    'question': 0.4,  # demande d'information importante
+    'exclamation': 0.3,  # émotion forte
+}
+
+
+class ImportanceScorer:
+    """Calcule l'importance d'une mémoire (entre 0.2 et 9.0) d'après son contenu
+
+    Les lexiques, ainsi que les points d'interrogation et d'exclamation,
+    sont réunis une seule fois en une table mot-clé -> catégories : un
+    mot-clé présent dans plusieurs lexiques n'est compté qu'une fois par
+    texte. Le comptage reste `str.count`, en C, plus rapide sur ces
+    lexiques qu'un automate d'Aho–Corasick ou une alternative `re` en
+    Python pur.
+    """
+
+    def __init__(
+        self,
+        lexicons: dict[str, list[str]] | None = None,
+        category_weights: dict[str, float] = CATEGORY_WEIGHTS,
+        type_weights: dict[str, float] = TYPE_WEIGHTS,
+    ):
+        """Réunit les lexiques en table de mots-clés"""
+        if lexicons is None:
+            lexicons = {
+                'important': IMPORTANT_MARKERS,
+                'temporal': TEMPORAL_MARKERS,
+                'emotion': EMOTION_MARKERS,
+                'identity': IDENTITY_MARKERS,
+                'question': ['?'],
+                'exclamation': ['!'],
+            }
+        self.category_weights = category_weights
+        self.type_weights = type_weights
+        # mot-clé -> poids cumulé de ses catégories
+        self.keywords: dict[str, float] = {}
+        for category, markers in lexicons.items():
+            weight = category_weights.get(category, 0.0)
+            for marker in markers:
+                if marker:
+                    keyword = marker.lower()
+                    self.keywords[keyword] = self.keywords.get(keyword, 0.0) + weight
+
+    def score(self, content: str, memory_type: str) -> float:
+        """Importance d'un texte selon son type de mémoire"""
+        content_lower = content.lower()
+        total_score = 1.0  # Importance par défaut
+
+        for keyword, weight in self.keywords.items():
+            occurrences = content_lower.count(keyword)
+            if occurrences:
+                total_score += occurrences * weight
+
+        # Complexité et détail : bonus pour les contenus détaillés mais pas trop longs
+        word_count = len(content_lower.split())
+        total_score += min(1.0, word_count / 100) * 0.5
+
+        total_score *= self.type_weights.get(memory_type, 1.0)
+
+        # Limiter l'importance entre 0.2 et 9.0
+        return min(9.0, max(0.2, total_score))
+
+    def score_many(self, contents: list[str], memory_types: list[str]) -> list[float]:
+        """Importance de plusieurs textes"""
+        return [
+            self.score(content, memory_type)
+            for content, memory_type in zip(contents, memory_types)
+        ]
+
+
+# Instance globale du calcul d'importance
+importance_scorer = ImportanceScorer()
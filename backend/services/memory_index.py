@@ -0,0 +1,565 @@
+"""
+Index vectoriel en mémoire vive des souvenirs de chaque personnage
+"""
+
+import datetime
+import logging
+import threading
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from backend.config import EMBEDDING_CONFIG
+from backend.models.memory import MemoryModel
+from backend.services.ann_index import IVFIndex
+
+logger = logging.getLogger(__name__)
+
+
+# Attributs de score conservés à côté des vecteurs : nom -> (type, défaut)
+ATTRIBUTES = {
+    'created_at': (np.float64, 0.0),  # timestamp POSIX
+    'importance': (np.float64, 1.0),
+    'access_count': (np.int32, 0),
+}
+
+
+# Compteur de version par personnage, incrémenté par des triggers à chaque
+# ligne de `memories` portant un embedding insérée, supprimée ou modifiée,
+# quel que soit le processus ou le chemin d'écriture (consolidation,
+# archivage, import groupé, suppression en cascade).
+VERSION_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS memory_index_versions (
+        character_id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS memory_index_versions_insert
+    AFTER INSERT ON memories WHEN new.embedding IS NOT NULL
+    BEGIN
+        INSERT OR IGNORE INTO memory_index_versions(character_id)
+        VALUES (new.character_id);
+        UPDATE memory_index_versions SET version = version + 1
+        WHERE character_id = new.character_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS memory_index_versions_delete
+    AFTER DELETE ON memories WHEN old.embedding IS NOT NULL
+    BEGIN
+        INSERT OR IGNORE INTO memory_index_versions(character_id)
+        VALUES (old.character_id);
+        UPDATE memory_index_versions SET version = version + 1
+        WHERE character_id = old.character_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS memory_index_versions_update
+    AFTER UPDATE OF embedding, character_id ON memories
+    WHEN old.embedding IS NOT new.embedding
+        OR old.character_id IS NOT new.character_id
+    BEGIN
+        INSERT OR IGNORE INTO memory_index_versions(character_id)
+        VALUES (old.character_id), (new.character_id);
+        UPDATE memory_index_versions SET version = version + 1
+        WHERE character_id IN (old.character_id, new.character_id);
+    END
+    """,
+)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices des k plus grands scores, par score décroissant"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(len(scores))
+    return top[np.argsort(-scores[top])]
+
+
+class CharacterMemoryIndex:
+    """Matrice float32 contiguë des embeddings d'un personnage et de leurs ids
+
+    Les vecteurs sont normalisés à l'insertion : la similarité cosinus avec une
+    requête se réduit à un unique produit matrice-vecteur. Les attributs
+    utilisés par le score de pertinence (date, importance, accès) sont tenus
+    dans des colonnes NumPy alignées sur les lignes de la matrice.
+    """
+
+    def __init__(
+        self,
+        dimensions: int,
+        capacity: int = 64,
+        quantization: str = 'none',
+        rescore: int = 200,
+        block_size: int = 1024,
+    ):
+        """Initialise un index vide
+
+        Avec `quantization='int8'`, chaque vecteur est stocké en int8 avec un
+        facteur d'échelle (quatre fois moins de mémoire) ; le balayage des
+        candidates se fait sur ces codes, par blocs de `block_size` lignes,
+        et les `rescore` meilleures sont rescorées en float32 via
+        `exact_loader` (ids -> {id: embedding}), branché par le registre.
+        """
+        if quantization not in ('none', 'int8'):
+            raise ValueError(f'Quantification inconnue: {quantization}')
+        self.dimensions = dimensions
+        self.quantization = quantization
+        self.rescore = rescore
+        self.block_size = block_size
+        self.exact_loader = None
+        self._size = 0
+        self._ids = np.empty(capacity, dtype=np.int64)
+        self._vectors = np.empty(
+            (capacity, dimensions),
+            dtype=np.int8 if self.quantized else np.float32,
+        )
+        self._scales = np.empty(capacity if self.quantized else 0, dtype=np.float32)
+        self._attributes = {
+            name: np.empty(capacity, dtype=dtype)
+            for name, (dtype, _) in ATTRIBUTES.items()
+        }
+        self._positions: dict[int, int] | None = {}
+        self.ann: IVFIndex | None = None
+        # Version de la base reflétée par l'index (voir MemoryIndexRegistry)
+        self.version = 0
+        self.lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def ids(self) -> np.ndarray:
+        """Ids des mémoires indexées, dans l'ordre des lignes de la matrice"""
+        return self._ids[: self._size]
+
+    @property
+    def quantized(self) -> bool:
+        return self.quantization == 'int8'
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Matrice des embeddings normalisés
+
+        Vue directe en float32 ; copie déquantifiée en mode int8.
+        """
+        if self.quantized:
+            return self._dequantize(slice(0, self._size))
+        return self._vectors[: self._size]
+
+    @property
+    def nbytes(self) -> int:
+        """Mémoire occupée par les lignes indexées (vecteurs, ids, attributs)"""
+        row = self._vectors.itemsize * self.dimensions + self._ids.itemsize
+        row += self._scales.itemsize if self.quantized else 0
+        row += sum(column.itemsize for column in self._attributes.values())
+        return row * self._size
+
+    def attribute(self, name: str) -> np.ndarray:
+        """Vue sur une colonne d'attributs ('created_at', 'importance', ...)"""
+        return self._attributes[name][: self._size]
+
+    @property
+    def max_id(self) -> int:
+        return int(self._ids[: self._size].max()) if self._size else 0
+
+    def _normalize(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimensions)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    @staticmethod
+    def _quantize(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Quantification scalaire symétrique, une échelle par vecteur"""
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def _dequantize(self, rows) -> np.ndarray:
+        return self._vectors[rows].astype(np.float32) * self._scales[rows, None]
+
+    def _dot(self, query: np.ndarray, positions=None) -> np.ndarray:
+        """Produit scalaire avec la requête normalisée (approché en int8)"""
+        if not self.quantized:
+            if positions is None:
+                return self.vectors @ query
+            return self._vectors[positions] @ query
+        if positions is None:
+            positions = slice(0, self._size)
+            count = self._size
+        else:
+            count = len(positions)
+        scores = np.empty(count, dtype=np.float32)
+        # Conversion par blocs : jamais de copie float32 de toute la matrice
+        for start in range(0, count, self.block_size):
+            end = min(count, start + self.block_size)
+            if isinstance(positions, slice):
+                rows = slice(start, end)
+            else:
+                rows = positions[start:end]
+            scores[start:end] = (
+                self._vectors[rows].astype(np.float32) @ query
+            ) * self._scales[rows]
+        return scores
+
+    def _reserve(self, needed: int):
+        """Agrandit les tableaux (doublement) pour accueillir `needed` lignes"""
+        capacity = self._ids.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        ids = np.empty(new_capacity, dtype=np.int64)
+        ids[: self._size] = self._ids[: self._size]
+        vectors = np.empty((new_capacity, self.dimensions), dtype=self._vectors.dtype)
+        vectors[: self._size] = self._vectors[: self._size]
+        self._ids, self._vectors = ids, vectors
+        if self.quantized:
+            scales = np.empty(new_capacity, dtype=np.float32)
+            scales[: self._size] = self._scales[: self._size]
+            self._scales = scales
+        for name, column in self._attributes.items():
+            grown = np.empty(new_capacity, dtype=column.dtype)
+            grown[: self._size] = column[: self._size]
+            self._attributes[name] = grown
+
+    def position(self, memory_id: int) -> int | None:
+        """Retourne la ligne occupée par une mémoire, ou None"""
+        if self._positions is None:
+            self._positions = {
+                int(mid): pos for pos, mid in enumerate(self._ids[: self._size])
+            }
+        return self._positions.get(int(memory_id))
+
+    def add(self, memory_ids, embeddings, **attributes):
+        """Ajoute (ou remplace) des mémoires dans l'index
+
+        Les attributs de score (created_at, importance, access_count) sont
+        passés en mots-clés, scalaires ou tableaux alignés sur `memory_ids`.
+        """
+        memory_ids = np.atleast_1d(np.asarray(memory_ids, dtype=np.int64))
+        if memory_ids.size == 0:
+            return
+        vectors = self._normalize(embeddings)
+        with self.lock:
+            known = [self.position(mid) is not None for mid in memory_ids]
+            if any(known):
+                self.remove(memory_ids[np.array(known)])
+            start = self._size
+            end = start + len(memory_ids)
+            self._reserve(end)
+            self._ids[start:end] = memory_ids
+            if self.quantized:
+                self._vectors[start:end], self._scales[start:end] = self._quantize(
+                    vectors
+                )
+            else:
+                self._vectors[start:end] = vectors
+            for name, (_, default) in ATTRIBUTES.items():
+                self._attributes[name][start:end] = attributes.get(name, default)
+            self._size = end
+            if self.ann is not None:
+                self.ann.append(vectors)
+            if self._positions is not None:
+                for offset, mid in enumerate(memory_ids.tolist()):
+                    self._positions[mid] = start + offset
+
+    def remove(self, memory_ids) -> int:
+        """Retire des mémoires de l'index et compacte la matrice"""
+        with self.lock:
+            if not self._size:
+                return 0
+            keep = ~np.isin(self._ids[: self._size], np.asarray(list(memory_ids)))
+            removed = int(self._size - keep.sum())
+            if removed:
+                kept = int(keep.sum())
+                self._ids[:kept] = self._ids[: self._size][keep]
+                self._vectors[:kept] = self._vectors[: self._size][keep]
+                if self.quantized:
+                    self._scales[:kept] = self._scales[: self._size][keep]
+                for column in self._attributes.values():
+                    column[:kept] = column[: self._size][keep]
+                self._size = kept
+                self._positions = None
+                if self.ann is not None:
+                    self.ann.compact(keep)
+            return removed
+
+    def update(self, memory_ids, **attributes):
+        """Met à jour les attributs de score de mémoires déjà indexées"""
+        memory_ids = np.atleast_1d(np.asarray(memory_ids, dtype=np.int64))
+        with self.lock:
+            positions = [self.position(mid) for mid in memory_ids]
+            found = np.array([pos is not None for pos in positions], dtype=bool)
+            if not found.any():
+                return
+            rows = np.array([pos for pos in positions if pos is not None])
+            for name, values in attributes.items():
+                values = np.broadcast_to(np.asarray(values), memory_ids.shape)
+                self._attributes[name][rows] = values[found]
+
+    def similarities(self, query: np.ndarray, positions=None) -> np.ndarray:
+        """Similarité cosinus de la requête avec les mémoires indexées
+
+        Toutes les lignes par défaut, ou seulement celles de `positions`.
+        """
+        return self._dot(self._normalize(query)[0], positions)
+
+    def exact_similarities(self, query: np.ndarray, memory_ids) -> np.ndarray | None:
+        """Similarité en pleine précision pour des mémoires données (mode int8)
+
+        Les embeddings float32 sont relus via `exact_loader` ; NaN pour les
+        mémoires introuvables. None si aucun chargeur n'est branché.
+        """
+        if self.exact_loader is None:
+            return None
+        memory_ids = [int(memory_id) for memory_id in memory_ids]
+        embeddings = self.exact_loader(memory_ids)
+        query = self._normalize(query)[0]
+        scores = np.full(len(memory_ids), np.nan, dtype=np.float32)
+        found = [
+            row for row, memory_id in enumerate(memory_ids) if memory_id in embeddings
+        ]
+        if found:
+            vectors = self._normalize(
+                np.vstack([embeddings[memory_ids[row]] for row in found])
+            )
+            scores[found] = vectors @ query
+        return scores
+
+    def candidates(self, query: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Positions candidates pour une requête et leur similarité cosinus
+
+        Toutes les lignes en recherche exacte ; seulement celles des listes
+        explorées quand l'index approché est actif.
+        """
+        with self.lock:
+            query = self._normalize(query)[0]
+            if self.ann is not None:
+                if self.ann.needs_training(self._size):
+                    self.ann.train(self.ids, self.vectors)
+                if self.ann.trained and self._size >= self.ann.min_size:
+                    positions = self.ann.probe(query)
+                    return positions, self._dot(query, positions)
+            return np.arange(self._size), self._dot(query)
+
+    def search(self, query: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Retourne les ids et scores des k mémoires les plus proches"""
+        with self.lock:
+            if not self._size or k <= 0:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            positions, scores = self.candidates(query)
+            if self.quantized:
+                pool = top_k(scores, max(k, self.rescore))
+                ids = self._ids[positions[pool]]
+            else:
+                top = top_k(scores, k)
+                return self._ids[positions[top]].copy(), scores[top]
+
+        # Rescoring en pleine précision, hors du verrou (lecture en base)
+        exact = self.exact_similarities(query, ids)
+        scores = scores[pool]
+        if exact is not None:
+            scores = np.where(np.isnan(exact), scores, exact)
+        top = top_k(scores, k)
+        return ids[top], scores[top]
+
+
+class MemoryIndexRegistry:
+    """Registre des index vectoriels par personnage
+
+    Les index sont chargés paresseusement depuis la base puis tenus à jour par
+    le gestionnaire de mémoire via `add`/`remove`. Chaque accès relit, par
+    clé primaire, la version du personnage tenue par les triggers de
+    `VERSION_SCHEMA` : une écriture de ce processus avance d'autant la
+    version de l'index, de sorte que seul un écart (autre processus, chemin
+    d'écriture qui ne passe pas par le registre) provoque un rechargement.
+    """
+
+    def __init__(self, dimensions: int = EMBEDDING_CONFIG['dimensions']):
+        """Initialise un registre vide"""
+        self.dimensions = dimensions
+        self.backend = EMBEDDING_CONFIG.get('index_backend', 'exact')
+        self.quantization = EMBEDDING_CONFIG.get('index_quantization', 'none')
+        self.rescore = EMBEDDING_CONFIG.get('rescore_candidates', 200)
+        self._indexes: dict[tuple[str, int], CharacterMemoryIndex] = {}
+        self._ready: set[str] = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(db: Session, character_id: int) -> tuple[str, int]:
+        # Plusieurs bases peuvent coexister dans un même processus (tests)
+        return str(db.get_bind().url), int(character_id)
+
+    def get(self, db: Session, character_id: int) -> CharacterMemoryIndex:
+        """Retourne l'index à jour d'un personnage, en le chargeant si besoin"""
+        key = self._key(db, character_id)
+        with self._lock:
+            index = self._indexes.get(key)
+        version = self._version(db, character_id)
+        if index is not None and index.version == version:
+            return index
+
+        index = self._load(db, character_id)
+        index.version = version
+        with self._lock:
+            self._indexes[key] = index
+        return index
+
+    def peek(self, db: Session, character_id: int) -> CharacterMemoryIndex | None:
+        """Retourne l'index s'il est déjà chargé, sans accès à la base"""
+        with self._lock:
+            return self._indexes.get(self._key(db, character_id))
+
+    def _ann_path(self, db: Session, character_id: int) -> Path | None:
+        """Fichier de l'index approché, à côté du fichier de la base"""
+        database = db.get_bind().url.database
+        if not database or database == ':memory:':
+            return None
+        return Path(database).parent / 'ann' / f'character_{character_id}.npz'
+
+    def _attach_ann(self, db: Session, character_id: int, index: CharacterMemoryIndex):
+        index.ann = IVFIndex(
+            self.dimensions,
+            nlist=EMBEDDING_CONFIG.get('ivf_nlist', 0),
+            nprobe=EMBEDDING_CONFIG.get('ivf_nprobe', 8),
+            min_size=EMBEDDING_CONFIG.get('ann_min_size', 20000),
+            path=self._ann_path(db, character_id),
+        )
+        if len(index) >= index.ann.min_size:
+            index.ann.load(index.ids, index.vectors)
+
+    @staticmethod
+    def _exact_loader(engine):
+        """Relit en base les embeddings float32 d'un petit nombre de mémoires"""
+
+        def load(memory_ids: list[int]) -> dict[int, np.ndarray]:
+            with engine.connect() as connection:
+                rows = connection.execute(
+                    select(MemoryModel.id, MemoryModel.embedding).where(
+                        MemoryModel.id.in_(memory_ids)
+                    )
+                )
+                return {
+                    row.id: row.embedding for row in rows if row.embedding is not None
+                }
+
+        return load
+
+    def _ensure(self, db: Session):
+        """Crée la table des versions et ses triggers au premier usage"""
+        engine = db.get_bind()
+        key = str(engine.url)
+        if key in self._ready:
+            return
+        with self._lock:
+            if key in self._ready:
+                return
+            with engine.begin() as connection:
+                for statement in VERSION_SCHEMA:
+                    connection.execute(text(statement))
+            self._ready.add(key)
+
+    def _version(self, db: Session, character_id: int) -> int:
+        """Version courante des mémoires indexables d'un personnage"""
+        self._ensure(db)
+        version = db.execute(
+            text(
+                'SELECT version FROM memory_index_versions '
+                'WHERE character_id = :character_id'
+            ),
+            {'character_id': character_id},
+        ).scalar()
+        return version or 0
+
+    def _load(self, db: Session, character_id: int) -> CharacterMemoryIndex:
+        start = datetime.datetime.now()
+        rows = db.execute(
+            select(
+                MemoryModel.id,
+                MemoryModel.embedding,
+                MemoryModel.created_at,
+                MemoryModel.importance,
+                MemoryModel.access_count,
+            )
+            .where(
+                MemoryModel.character_id == character_id,
+                MemoryModel.embedding.is_not(None),
+            )
+            .order_by(MemoryModel.id)
+        ).all()
+
+        rows = [row for row in rows if row.embedding is not None]
+        index = CharacterMemoryIndex(
+            self.dimensions,
+            capacity=max(64, len(rows)),
+            quantization=self.quantization,
+            rescore=self.rescore,
+        )
+        if index.quantized:
+            index.exact_loader = self._exact_loader(db.get_bind())
+        if rows:
+            index.add(
+                [row.id for row in rows],
+                np.vstack([row.embedding for row in rows]),
+                created_at=[row.created_at.timestamp() for row in rows],
+                importance=[row.importance or 0.0 for row in rows],
+                access_count=[row.access_count or 0 for row in rows],
+            )
+        if self.backend == 'ivf':
+            self._attach_ann(db, character_id, index)
+
+        elapsed = (datetime.datetime.now() - start).total_seconds()
+        logger.debug(
+            f'Index vectoriel chargé pour le personnage {character_id}: '
+            f'{len(index)} mémoires en {elapsed:.3f}s'
+        )
+        return index
+
+    def add(self, db: Session, character_id: int, memory_ids, embeddings, **attributes):
+        """Répercute la création de mémoires sur un index déjà chargé
+
+        Chaque ligne insérée a avancé la version d'une unité en base ; l'index
+        avance d'autant pour ne pas se recharger lui-même.
+        """
+        index = self.peek(db, character_id)
+        if index is not None:
+            memory_ids = np.atleast_1d(np.asarray(memory_ids, dtype=np.int64))
+            index.add(memory_ids, embeddings, **attributes)
+            index.version += len(memory_ids)
+
+    def update(self, db: Session, character_id: int, memory_ids, **attributes):
+        """Répercute un changement d'importance ou d'accès sur un index chargé"""
+        index = self.peek(db, character_id)
+        if index is not None:
+            index.update(memory_ids, **attributes)
+
+    def remove(self, db: Session, character_id: int, memory_ids) -> int:
+        """Répercute la suppression de mémoires sur un index déjà chargé"""
+        index = self.peek(db, character_id)
+        if index is None:
+            return 0
+        removed = index.remove(memory_ids)
+        index.version += removed
+        return removed
+
+    def invalidate(self, db: Session, character_id: int | None = None):
+        """Oublie l'index d'un personnage (ou tous ceux de la base)"""
+        url = str(db.get_bind().url)
+        with self._lock:
+            for key in list(self._indexes):
+                if key[0] == url and (character_id is None or key[1] == character_id):
+                    del self._indexes[key]
+
+
+# Instance globale du registre d'index
+memory_index = MemoryIndexRegistry()
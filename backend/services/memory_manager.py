@@ -4,28 +4,38 @@ Gestionnaire de mémoire pour les personnages
 
 import datetime
 import logging
-import re
 import time
 from typing import Optional
 
-import numpy as np
 from sentence_transformers import SentenceTransformer
+from sqlalchemy import Integer, case, cast, func, insert, literal, or_, update
 from sqlalchemy.orm import Session
 
-from backend.config import EMBEDDING_CONFIG
+from backend.config import EMBEDDING_CONFIG, MEMORY_CONFIG
 from backend.models.memory import (
     Fact,
-    FactCreate,
     FactModel,
     Memory,
     MemoryCreate,
     MemoryModel,
     RetrievedMemory,
 )
+from backend.services.access_tracker import access_tracker
+from backend.services.embedding_service import embedding_service
+from backend.services.fact_extraction import fact_extractor
+from backend.services.memory_archive import memory_archiver
+from backend.services.memory_consolidation import memory_consolidator
+from backend.services.memory_importance import importance_scorer
+from backend.services.memory_index import memory_index
+from backend.services.memory_scoring import relevance_scorer
+from backend.services.memory_search import lexical_index
 from backend.utils.embedding_loader import get_embedding_model
 
 logger = logging.getLogger(__name__)
 
+# Types de mémoire dont le contenu est analysé pour en extraire des faits
+FACT_SOURCE_TYPES = ("conversation", "event", "observation")
+
 
 class MemoryManager:
     """Gestionnaire de mémoire pour les personnages"""
@@ -34,10 +44,20 @@ class MemoryManager:
         """Initialise le gestionnaire de mémoire"""
         self.embedding_model = get_embedding_model()
         self.embedding_dimensions = EMBEDDING_CONFIG["dimensions"]
+        self.encoder = embedding_service
+        self.index = memory_index
+        self.scorer = relevance_scorer
+        self.lexical_index = lexical_index
+        self.hybrid_search = MEMORY_CONFIG["hybrid_search"]
+        self.access_tracker = access_tracker
+        self.consolidator = memory_consolidator
+        self.archiver = memory_archiver
+        self.fact_extractor = fact_extractor
+        self.importance_scorer = importance_scorer
 
     def create_memory(self, db: Session, memory: MemoryCreate) -> MemoryModel:
         """Crée une nouvelle mémoire pour un personnage"""
-        memory_dict = memory.model_dump()
+        memory_dict = self._memory_row(memory)
 
         # Calculer l'importance si elle n'est pas explicitement définie
         if memory.importance == 1.0:  # Valeur par défaut
@@ -45,336 +65,149 @@ class MemoryManager:
                 memory.content, memory.memory_type
             )
 
-        # --- Traduction MemoryCreate -> MemoryModel ---
-        # MemoryCreate.memory_type  -> MemoryModel.type  (colonne SQL 'type')
-        # MemoryCreate.metadata     -> MemoryModel.memory_metadata (colonne SQL 'metadata')
-        # MemoryCreate.source       -> pas de colonne ORM, à supprimer
-        # MemoryCreate.timestamp    -> pas de colonne ORM (le modèle utilise created_at), à supprimer
-        memory_dict["type"] = memory_dict.pop("memory_type")
-        # MemoryType est un str-Enum : stocker la valeur brute (str)
-        if hasattr(memory_dict["type"], "value"):
-            memory_dict["type"] = memory_dict["type"].value
-        memory_dict["memory_metadata"] = memory_dict.pop("metadata", None)
-        memory_dict.pop("source", None)
-        memory_dict.pop("timestamp", None)
-        # --- fin de la traduction ---
-
         # Générer l'embedding pour le contenu de la mémoire
+        embedding = None
         if self.embedding_model:
-            embedding = self.embedding_model.encode(memory.content)
-            memory_dict["embedding"] = embedding.tolist()
+            embedding = self.encoder.encode(memory.content)
+            memory_dict["embedding"] = embedding
 
         db_memory = MemoryModel(**memory_dict)
         db.add(db_memory)
         db.commit()
         db.refresh(db_memory)
 
+        if embedding is not None:
+            self.index.add(
+                db,
+                memory.character_id,
+                [db_memory.id],
+                [embedding],
+                created_at=db_memory.created_at.timestamp(),
+                importance=db_memory.importance,
+                access_count=db_memory.access_count or 0,
+            )
+
         # Extraire et stocker les faits si nécessaire
-        if memory.memory_type in ["conversation", "event", "observation"]:
+        if memory.memory_type in FACT_SOURCE_TYPES:
             self._extract_facts(
                 db, int(db_memory.id), memory.character_id, memory.content
             )
 
         return db_memory
 
-    def _calculate_memory_importance(self, content: str, memory_type: str) -> float:
-        """Calcule l'importance d'une mémoire en analysant son contenu
+    def create_memories(self, db: Session, memories: list[MemoryCreate]) -> list[int]:
+        """Crée un lot de mémoires en une seule transaction
 
-        Retourne une valeur entre 0.2 (peu important) et 9.0 (très important)
+        Embeddings encodés par lots, importance calculée en une passe, une
+        seule requête INSERT (executemany) et extraction des faits groupée.
+        Retourne les ids créés, dans l'ordre du lot.
         """
-        content_lower = content.lower()
-        base_importance = 1.0  # Importance par défaut
-
-        # 1. Ajustement selon le type de mémoire
-        type_weights = {
-            "conversation": 1.0,
-            "event": 1.5,  # Les événements sont généralement plus importants
-            "observation": 0.8,  # Les observations sont souvent moins importantes
-            "thought": 0.9,  # Les pensées sont modérément importantes
-            "facts_extraction": 1.2,  # Les faits extraits ont une importance accrue
-            "user_message": 1.3,  # Les messages de l'utilisateur sont plus importants
-            "character_message": 1.0,  # Les réponses du personnage ont une importance standard
-        }
+        if not memories:
+            return []
 
-        importance_multiplier = type_weights.get(memory_type, 1.0)
-
-        # 2. Analyse du contenu pour indicateurs d'importance
-
-        # Mots-clés indiquant une information importante
-        important_markers = [
-            "important",
-            "crucial",
-            "essentiel",
-            "clé",
-            "vital",
-            "critique",
-            "toujours",
-            "jamais",
-            "adore",
-            "déteste",
-            "aime",
-            "hais",
-            "secret",
-            "confidential",
-            "promesse",
-            "jure",
-            "avoue",
-            "révèle",
-            "découvre",
-            "explique",
-            "comprend",
-            "réalise",
-            "première fois",
-            "dernier",
-            "meilleur",
-            "pire",
-        ]
-
-        # Expressions temporelles dénotant l'importance
-        temporal_markers = [
-            "hier",
-            "aujourd'hui",
-            "demain",
-            "maintenant",
-            "immédiatement",
-            "plus jamais",
-            "toujours",
-            "tous les jours",
-        ]
-
-        # Indicateurs émotionnels forts
-        emotion_markers = [
-            "heureux",
-            "triste",
-            "furieux",
-            "effrayé",
-            "excité",
-            "nerveux",
-            "angoissé",
-            "terrifié",
-            "ravi",
-            "extatique",
-            "traumatisé",
-            "choqué",
-            "surpris",
-            "ému",
-            "frustré",
-            "énervé",
-            "déçu",
-            "fier",
-            "honteux",
-            "coupable",
-            "embarrassé",
-        ]
-
-        # Informations personnelles ou identitaires
-        identity_markers = [
-            "mon nom",
-            "je m'appelle",
-            "je suis",
-            "ma ville",
-            "mon âge",
-            "mon adresse",
-            "mon travail",
-            "ma famille",
-            "mes enfants",
-            "mon père",
-            "ma mère",
-            "mon frère",
-            "ma sœur",
-            "ma date de naissance",
-        ]
-
-        # Calculer les scores en fonction du nombre d'occurrences
-        important_score = (
-            sum(content_lower.count(marker) for marker in important_markers) * 0.5
-        )
-        temporal_score = (
-            sum(content_lower.count(marker) for marker in temporal_markers) * 0.3
-        )
-        emotion_score = (
-            sum(content_lower.count(marker) for marker in emotion_markers) * 0.4
-        )
-        identity_score = (
-            sum(content_lower.count(marker) for marker in identity_markers) * 0.7
+        rows = [self._memory_row(memory) for memory in memories]
+        defaults = [i for i, memory in enumerate(memories) if memory.importance == 1.0]
+        scores = self.importance_scorer.score_many(
+            [memories[i].content for i in defaults],
+            [memories[i].memory_type for i in defaults],
         )
+        for i, score in zip(defaults, scores):
+            rows[i]["importance"] = score
 
-        # 3. Analyse des structures grammaticales
-        # Compter les questions (suggérant une demande d'information importante)
-        question_count = content.count("?") * 0.4
+        embeddings = None
+        if self.embedding_model:
+            embeddings = self.encoder.encode_many([m.content for m in memories])
+            for row, embedding in zip(rows, embeddings):
+                row["embedding"] = embedding
+        now = datetime.datetime.now()
+        for row in rows:
+            row.setdefault("created_at", now)
+            row.setdefault("access_count", 0)
 
-        # Compter les exclamations (suggérant une émotion forte)
-        exclamation_count = content.count("!") * 0.3
+        try:
+            inserted = db.execute(
+                insert(MemoryModel).returning(
+                    MemoryModel.id, sort_by_parameter_order=True
+                ),
+                rows,
+            )
+            memory_ids = list(inserted.scalars())
+
+            found = {}
+            for memory, memory_id in zip(memories, memory_ids):
+                if memory.memory_type in FACT_SOURCE_TYPES:
+                    found.setdefault(memory.character_id, []).extend(
+                        (memory_id, fact)
+                        for fact in self.fact_extractor.scan(memory.content)
+                    )
+            for character_id, facts in found.items():
+                self.fact_extractor.store(db, character_id, facts, commit=False)
 
-        # 4. Complexité et détail (longueur et richesse du texte)
-        word_count = len(content_lower.split())
-        # Bonus pour les contenus détaillés mais pas trop longs
-        complexity_score = min(1.0, word_count / 100) * 0.5
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        if embeddings is not None:
+            by_character = {}
+            for position, memory in enumerate(memories):
+                by_character.setdefault(memory.character_id, []).append(position)
+            for character_id, positions in by_character.items():
+                self.index.add(
+                    db,
+                    character_id,
+                    [memory_ids[i] for i in positions],
+                    embeddings[positions],
+                    created_at=[rows[i]["created_at"].timestamp() for i in positions],
+                    importance=[rows[i]["importance"] for i in positions],
+                    access_count=[0] * len(positions),
+                )
 
-        # 5. Calculer l'importance finale
-        total_score = base_importance
-        total_score += important_score
-        total_score += temporal_score
-        total_score += emotion_score
-        total_score += identity_score
-        total_score += question_count
-        total_score += exclamation_count
-        total_score += complexity_score
+        logger.info(f"Import groupé: {len(memory_ids)} mémoires créées")
+        return memory_ids
 
-        # Appliquer le multiplicateur de type
-        total_score *= importance_multiplier
+    @staticmethod
+    def _memory_row(memory: MemoryCreate) -> dict:
+        """Traduit un MemoryCreate en attributs de MemoryModel"""
+        memory_dict = memory.model_dump()
 
-        # Limiter l'importance entre 0.2 et 9.0
-        return min(9.0, max(0.2, total_score))
+        # --- Traduction MemoryCreate -> MemoryModel ---
+        # MemoryCreate.memory_type  -> MemoryModel.type  (colonne SQL 'type')
+        # MemoryCreate.metadata     -> MemoryModel.memory_metadata (colonne SQL 'metadata')
+        # MemoryCreate.source       -> pas de colonne ORM, à supprimer
+        # MemoryCreate.timestamp    -> pas de colonne ORM (le modèle utilise created_at), à supprimer
+        memory_dict["type"] = memory_dict.pop("memory_type")
+        # MemoryType est un str-Enum : stocker la valeur brute (str)
+        if hasattr(memory_dict["type"], "value"):
+            memory_dict["type"] = memory_dict["type"].value
+        memory_dict["memory_metadata"] = memory_dict.pop("metadata", None)
+        memory_dict.pop("source", None)
+        memory_dict.pop("timestamp", None)
+        # --- fin de la traduction ---
+        return memory_dict
+
+    def _calculate_memory_importance(self, content: str, memory_type: str) -> float:
+        """Calcule l'importance d'une mémoire en analysant son contenu
+
+        Retourne une valeur entre 0.2 (peu important) et 9.0 (très important)
+        """
+        return self.importance_scorer.score(content, memory_type)
 
     def _extract_facts(
         self, db: Session, memory_id: int, character_id: int, content: str
     ) -> list[int]:
         """Extrait des faits à partir du contenu d'une mémoire et les stocke"""
-        facts = []
-
         try:
-            # Patterns simples pour extraire des faits de base
-            fact_patterns = [
-                # "Je m'appelle X" -> ("user", "s'appelle", "X")
-                (r"je m'appelle ([A-Z][a-zA-Z\s-]+)", "user", "s'appelle"),
-                # "Mon nom est X" -> ("user", "a pour nom", "X")
-                (r"mon nom est ([A-Z][a-zA-Z\s-]+)", "user", "a pour nom"),
-                # "J'ai X ans" -> ("user", "a pour âge", "X ans")
-                (r"j'ai (\d+) ans?", "user", "a pour âge"),
-                # "Je suis X" -> ("user", "est", "X")
-                (r"je suis (un|une) ([a-zA-Z\s-]+)", "user", "est"),
-                # "J'habite à X" -> ("user", "habite à", "X")
-                (r"j'habite (?:à|en|au|aux) ([a-zA-Z\s-]+)", "user", "habite à"),
-                # "J'aime X" -> ("user", "aime", "X")
-                (r"j'aime (?:le|la|les|l') ([a-zA-Z\s-]+)", "user", "aime"),
-                # "Je déteste X" -> ("user", "déteste", "X")
-                (r"je déteste (?:le|la|les|l') ([a-zA-Z\s-]+)", "user", "déteste"),
-                # "Mon travail est X" -> ("user", "travaille comme", "X")
-                (r"mon travail est ([a-zA-Z\s-]+)", "user", "travaille comme"),
-                # "Je travaille comme X" -> ("user", "travaille comme", "X")
-                (r"je travaille comme ([a-zA-Z\s-]+)", "user", "travaille comme"),
-                # "Ma passion est X" -> ("user", "a pour passion", "X")
-                (r"ma passion est ([a-zA-Z\s-]+)", "user", "a pour passion"),
-                # "Je fais X" -> ("user", "fait", "X")
-                (r"je fais (?:du|de la|de l'|des) ([a-zA-Z\s-]+)", "user", "fait"),
-            ]
-
-            content_lower = content.lower()
-
-            for pattern, subject, predicate in fact_patterns:
-                matches = re.findall(pattern, content_lower, re.IGNORECASE)
-                for match in matches:
-                    if isinstance(match, tuple):
-                        # Pour les patterns avec plusieurs groupes
-                        object_value = " ".join(match).strip()
-                    else:
-                        object_value = match.strip()
-
-                    if object_value and len(object_value) > 1:
-                        # Vérifier si ce fait existe déjà
-                        existing_fact = (
-                            db.query(FactModel)
-                            .filter(
-                                FactModel.character_id == character_id,
-                                FactModel.subject == subject,
-                                FactModel.predicate == predicate,
-                                FactModel.object == object_value,
-                            )
-                            .first()
-                        )
-
-                        if not existing_fact:
-                            # Créer le nouveau fait
-                            fact_data = FactCreate(
-                                character_id=character_id,
-                                subject=subject,
-                                predicate=predicate,
-                                object=object_value,
-                                confidence=0.8,  # Confiance par défaut pour l'extraction automatique
-                                source_memory_id=memory_id,
-                            )
-
-                            db_fact = FactModel(**fact_data.model_dump())
-                            db.add(db_fact)
-                            db.commit()
-                            db.refresh(db_fact)
-                            facts.append(db_fact.id)
-
-                            logger.debug(
-                                f"Fait extrait: {subject} {predicate} {object_value} "
-                                f"(confiance: {fact_data.confidence})"
-                            )
-                        else:
-                            # Mise à jour de la confiance si le fait existe déjà
-                            existing_fact.confidence = min(
-                                1.0, existing_fact.confidence + 0.1
-                            )
-                            existing_fact.last_confirmed = datetime.datetime.now()
-                            db.commit()
-                            facts.append(existing_fact.id)
-
-            # Patterns avancés pour extraire des relations émotionnelles
-            emotion_patterns = [
-                # "X me rend heureux/triste/etc."
-                (
-                    r"([a-zA-Z\s-]+) me rend (heureux|triste|nerveux|calme|fier)",
-                    "emotional_response",
-                ),
-                # "J'ai peur de X"
-                (r"j'ai peur de ([a-zA-Z\s-]+)", "a peur de"),
-            ]
-
-            for pattern, predicate in emotion_patterns:
-                matches = re.findall(pattern, content_lower, re.IGNORECASE)
-                for match in matches:
-                    if isinstance(match, tuple) and len(match) == 2:
-                        subject_value = match[0].strip()
-                        emotion = match[1].strip()
-
-                        if predicate == "emotional_response":
-                            predicate_value = f"rend {emotion}"
-                        else:
-                            predicate_value = predicate
-
-                        if subject_value and len(subject_value) > 1:
-                            existing_fact = (
-                                db.query(FactModel)
-                                .filter(
-                                    FactModel.character_id == character_id,
-                                    FactModel.subject == subject_value,
-                                    FactModel.predicate == predicate_value,
-                                    FactModel.object == "user",
-                                )
-                                .first()
-                            )
-
-                            if not existing_fact:
-                                fact_data = FactCreate(
-                                    character_id=character_id,
-                                    subject=subject_value,
-                                    predicate=predicate_value,
-                                    object="user",
-                                    confidence=0.7,
-                                    source_memory_id=memory_id,
-                                )
-
-                                db_fact = FactModel(**fact_data.model_dump())
-                                db.add(db_fact)
-                                db.commit()
-                                db.refresh(db_fact)
-                                facts.append(db_fact.id)
-
+            facts = self.fact_extractor.extract(db, character_id, memory_id, content)
             if facts:
                 logger.info(
                     f"Extraction de faits terminée: {len(facts)} faits extraits de la mémoire {memory_id}"
                 )
-
+            return facts
         except Exception as e:
             logger.error(f"Erreur lors de l'extraction de faits: {e}")
             # Ne pas faire échouer la création de mémoire si l'extraction de faits échoue
-
-        return facts
+            return []
 
     def get_memories(
         self, db: Session, character_id: int, limit: int = 100
@@ -389,23 +222,23 @@ class MemoryManager:
         )
 
     def get_memory(self, db: Session, memory_id: int) -> Optional[MemoryModel]:
-        """Récupère une mémoire spécifique"""
-        memory = db.query(MemoryModel).filter(MemoryModel.id == memory_id).first()
+        """Récupère une mémoire spécifique et enregistre l'accès"""
+        memory = self._find_or_restore(db, memory_id)
         if memory:
-            # Mettre à jour le compteur d'accès et la date de dernier accès
-            memory.last_accessed = datetime.datetime.now()
-            memory.access_count += 1
-
-            # Ajuster l'importance en fonction du nombre d'accès
-            if memory.access_count > 5:
-                current_importance = memory.importance
-                new_importance = min(
-                    9.0, current_importance * (1 + 0.05 * (memory.access_count // 5))
-                )
-                memory.importance = new_importance
+            # Compteur d'accès, date et bonus d'importance écrits en différé
+            self.access_tracker.record(db, memory.character_id, [memory.id])
+        return memory
 
-            db.commit()
-            db.refresh(memory)
+    def _find_memory(self, db: Session, memory_id: int) -> Optional[MemoryModel]:
+        """Récupère une mémoire sans la compter comme un accès"""
+        return db.query(MemoryModel).filter(MemoryModel.id == memory_id).first()
+
+    def _find_or_restore(self, db: Session, memory_id: int) -> Optional[MemoryModel]:
+        """Récupère une mémoire, réintégrée depuis l'archive si elle y est"""
+        memory = self._find_memory(db, memory_id)
+        if memory is None:
+            restored = self.archiver.restore(db, [memory_id])
+            memory = restored[0] if restored else None
         return memory
 
     def get_relevant_memories(
@@ -424,66 +257,61 @@ class MemoryManager:
             )
             return []
 
-        query_embedding = self.embedding_model.encode(query)
-
-        memories = self.get_memories(db, character_id, limit=100)
+        query_embedding = self.encoder.encode(query)
+
+        # Score combiné calculé sur tout l'historique (index en mémoire vive) ;
+        # seuls les `limit` meilleurs résultats sont chargés depuis la base.
+        index = self.index.get(db, character_id)
+        if self.hybrid_search:
+            # Les noms propres et termes rares, que la similarité sémantique
+            # rate, sont retrouvés par l'index plein texte (BM25)
+            candidates = max(limit, MEMORY_CONFIG["hybrid_candidates"])
+            ranked = self.scorer.rank_hybrid(
+                index,
+                query_embedding,
+                self.lexical_index.search(db, character_id, query, candidates),
+                limit,
+                recency_weight,
+                importance_weight,
+                candidates=candidates,
+                rrf_k=MEMORY_CONFIG["rrf_k"],
+            )
+        else:
+            ranked = self.scorer.rank(
+                index, query_embedding, limit, recency_weight, importance_weight
+            )
 
-        if not memories:
+        if not ranked:
             return []
 
-        results = []
-        now = datetime.datetime.now()
+        memories = {
+            memory.id: memory
+            for memory in db.query(MemoryModel)
+            .filter(MemoryModel.id.in_([scored.memory_id for scored in ranked]))
+            .all()
+        }
 
-        for memory in memories:
-            if not memory.embedding:
+        results = []
+        for scored in ranked:
+            memory = memories.get(scored.memory_id)
+            if memory is None:
                 continue
 
-            similarity = self._cosine_similarity(
-                query_embedding, np.array(memory.embedding)
-            )
-
-            age_in_days = (now - memory.created_at).days
-            max_age = 365
-            recency_score = max(0, 1 - (age_in_days / max_age))
-
-            importance_score = memory.importance / 10.0
-
-            access_factor = min(1.0, memory.access_count / 20.0) * 0.2
-
-            # Le poids de la similarité est calculé pour que tous les poids = 1.0
-            similarity_weight = 1.0 - recency_weight - importance_weight
-
             results.append(
                 RetrievedMemory(
                     memory=Memory.from_orm(memory),
-                    relevance_score=similarity,
-                    similarity_score=similarity,
-                    recency_score=recency_score,
-                    importance_score=importance_score,
+                    relevance_score=scored.relevance,
+                    similarity_score=scored.similarity,
+                    recency_score=scored.recency,
+                    importance_score=scored.importance,
                 )
             )
 
-        results.sort(key=lambda x: x.relevance_score, reverse=True)
-        top_results = results[:limit]
-
-        for result in top_results:
-            self.get_memory(db, result.memory.id)
-
-        return top_results
-
-    def _cosine_similarity(self, a: np.ndarray, b: np.ndarray) -> float:
-        """Calcule la similarité cosinus entre deux vecteurs"""
-        if a is None or b is None:
-            return 0.0
-
-        dot_product = np.dot(a, b)
-        norm_a = np.linalg.norm(a)
-        norm_b = np.linalg.norm(b)
-
-        if norm_a == 0 or norm_b == 0:
-            return 0.0
+        self.access_tracker.record(
+            db, character_id, [result.memory.id for result in results]
+        )
 
-        return dot_product / (norm_a * norm_b)
+        return results
 
     def get_facts(
         self, db: Session, character_id: int, subject: Optional[str] = None
@@ -495,22 +323,31 @@ class MemoryManager:
         return query.order_by(FactModel.created_at.desc()).all()
 
     def delete_memory(self, db: Session, memory_id: int) -> bool:
-        """Supprime une mémoire"""
-        db_memory = self.get_memory(db, memory_id)
-        if db_memory:
-            db.delete(db_memory)
-            db.commit()
-            return True
-        return False
+        """Supprime une mémoire, qu'elle soit active ou archivée"""
+        db_memory = self._find_memory(db, memory_id)
+        if db_memory is None:
+            # Mémoire archivée : supprimée de l'archive sans être réintégrée
+            return self.archiver.delete(db, [memory_id]) > 0
+        character_id = db_memory.character_id
+        db.delete(db_memory)
+        db.commit()
+        self.index.remove(db, character_id, [memory_id])
+        return True
 
     def update_memory_importance(
         self, db: Session, memory_id: int, importance: float
     ) -> bool:
-        """Met à jour l'importance d'une mémoire"""
-        db_memory = self.get_memory(db, memory_id)
+        """Met à jour l'importance d'une mémoire (réintégrée si archivée)"""
+        db_memory = self._find_or_restore(db, memory_id)
         if db_memory:
             db_memory.importance = max(0.0, min(10.0, importance))
             db.commit()
+            self.index.update(
+                db,
+                db_memory.character_id,
+                [db_memory.id],
+                importance=db_memory.importance,
+            )
             return True
         return False
 
@@ -521,41 +358,46 @@ class MemoryManager:
         now = datetime.datetime.now()
         cutoff_date = now - datetime.timedelta(days=days_threshold)
 
-        old_memories = (
-            db.query(MemoryModel)
-            .filter(
+        # Même formule que le calcul ligne à ligne, exprimée en un seul UPDATE
+        now_julian_day = (
+            now - datetime.datetime(1970, 1, 1)
+        ).total_seconds() / 86400.0 + 2440587.5
+        age_in_days = cast(
+            literal(now_julian_day) - func.julianday(MemoryModel.created_at), Integer
+        )
+        decay_factor = (
+            1.0 - func.min(0.5, (age_in_days - days_threshold) / 365.0)
+        ) * case((MemoryModel.access_count == 0, 0.8), else_=1.0)
+        importance_resistance = func.min(0.8, MemoryModel.importance / 10.0)
+        new_importance = func.max(
+            0.1, MemoryModel.importance * (decay_factor + importance_resistance) / 2
+        )
+
+        decayed = db.execute(
+            update(MemoryModel)
+            .where(
                 MemoryModel.character_id == character_id,
                 MemoryModel.created_at < cutoff_date,
-                (MemoryModel.last_accessed is None)
-                | (MemoryModel.last_accessed < cutoff_date),
+                or_(
+                    MemoryModel.last_accessed.is_(None),
+                    MemoryModel.last_accessed < cutoff_date,
+                ),
                 MemoryModel.access_count < 5,
+                MemoryModel.importance <= 7.0,
+                func.abs(new_importance - MemoryModel.importance) > 0.2,
             )
-            .all()
-        )
-
-        updated_count = 0
-        for memory in old_memories:
-            if memory.importance > 7.0:
-                continue
-
-            age_in_days = (now - memory.created_at).days
-            decay_factor = 1.0 - min(0.5, (age_in_days - days_threshold) / 365)
-
-            if memory.access_count == 0:
-                decay_factor *= 0.8
-
-            current_importance = memory.importance
-            importance_resistance = min(0.8, current_importance / 10.0)
-            new_importance = max(
-                0.1, current_importance * (decay_factor + importance_resistance) / 2
-            )
-
-            if abs(new_importance - current_importance) > 0.2:
-                memory.importance = new_importance
-                updated_count += 1
+            .values(importance=new_importance)
+            .returning(MemoryModel.id, MemoryModel.importance)
+            .execution_options(synchronize_session=False)
+        ).all()
 
+        updated_count = len(decayed)
         if updated_count > 0:
             db.commit()
+            memory_ids, importances = zip(*decayed)
+            self.index.update(
+                db, character_id, list(memory_ids), importance=list(importances)
+            )
             logger.info(
                 f"Dégradation de {updated_count} mémoires anciennes pour le personnage {character_id}"
             )
@@ -572,77 +414,40 @@ class MemoryManager:
             )
             return 0
 
-        memories = self.get_memories(db, character_id, limit=500)
-
-        if len(memories) < 5:
-            return 0
+        stats = self.consolidator.consolidate(db, character_id, similarity_threshold)
+        return stats["merged"]
 
-        consolidated_count = 0
-        processed_ids = set()
+    def maintenance_cycle(
+        self, db: Session, character_id: int, time_budget: Optional[float] = None
+    ) -> dict[str, int]:
+        """Exécute un cycle complet de maintenance sur les mémoires d'un personnage
 
-        for i, memory1 in enumerate(memories):
-            if memory1.id in processed_ids:
-                continue
-
-            for j in range(i + 1, len(memories)):
-                memory2 = memories[j]
-
-                if memory2.id in processed_ids:
-                    continue
-
-                if memory1.type != memory2.type:
-                    continue
-
-                if memory1.embedding and memory2.embedding:
-                    similarity = self._cosine_similarity(
-                        np.array(memory1.embedding), np.array(memory2.embedding)
-                    )
-
-                    if similarity > similarity_threshold:
-                        keep_memory, discard_memory = (
-                            (memory1, memory2)
-                            if memory1.importance > memory2.importance
-                            or (
-                                memory1.importance == memory2.importance
-                                and memory1.created_at > memory2.created_at
-                            )
-                            else (memory2, memory1)
-                        )
-
-                        keep_memory.importance = min(9.0, keep_memory.importance * 1.2)
-
-                        if keep_memory.memory_metadata is None:
-                            keep_memory.memory_metadata = {}
-                        keep_memory.memory_metadata["consolidated_with"] = (
-                            discard_memory.id
-                        )
-                        keep_memory.memory_metadata["consolidation_date"] = (
-                            datetime.datetime.now().isoformat()
-                        )
-                        keep_memory.memory_metadata["similarity_score"] = similarity
-
-                        db.delete(discard_memory)
-                        processed_ids.add(discard_memory.id)
-                        consolidated_count += 1
-
-        if consolidated_count > 0:
-            db.commit()
-            logger.info(
-                f"Consolidation terminée: {consolidated_count} mémoires fusionnées pour le personnage {character_id}"
-            )
-
-        return consolidated_count
-
-    def maintenance_cycle(self, db: Session, character_id: int) -> dict[str, int]:
-        """Exécute un cycle complet de maintenance sur les mémoires d'un personnage"""
+        `time_budget` (secondes) borne la recherche de doublons. À
+        l'échéance, seuls les groupes déjà trouvés sont fusionnés
+        (`consolidation_complete` vaut False) ; aucun curseur n'est
+        conservé, le cycle suivant recommence la recherche depuis le début,
+        sur des mémoires déjà en partie dédoublonnées.
+        """
         stats = {}
+        deadline = time.monotonic() + time_budget if time_budget else None
 
         try:
             decay_count = self.decay_old_memories(db, character_id)
             stats["decayed_memories"] = decay_count
 
-            consolidation_count = self.consolidate_memories(db, character_id)
+            consolidation = self.consolidator.consolidate(
+                db, character_id, deadline=deadline
+            )
+            consolidation_count = consolidation["merged"]
             stats["consolidated_memories"] = consolidation_count
+            stats["consolidation_clusters"] = consolidation["clusters"]
+            stats["largest_cluster"] = consolidation["largest_cluster"]
+            stats["consolidation_complete"] = consolidation["complete"]
+
+            archived_count = self.archiver.archive(
+                db, character_id, deadline=deadline
+            )
+            stats["archived_memories"] = archived_count
 
             low_importance = (
                 db.query(MemoryModel)
@@ -657,6 +462,7 @@ class MemoryManager:
             logger.info(
                 f"Cycle de maintenance terminé pour le personnage {character_id}: "
                 f"{decay_count} dégradées, {consolidation_count} consolidées, "
+                f"{archived_count} archivées, "
                 f"{low_importance} de faible importance"
             )
 
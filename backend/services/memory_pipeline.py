@@ -0,0 +1,430 @@
+"""
+Traitement différé des échanges de chat : embed -> importance -> faits -> traits
+"""
+
+import datetime
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+
+from sqlalchemy import delete, inspect, or_, text, update
+from sqlalchemy.orm import Session
+
+from backend.config import MEMORY_CONFIG
+from backend.database import SessionLocal
+from backend.models.memory import MemoryJobModel, MemoryModel
+from backend.services.character_manager import character_manager
+from backend.services.llm_scheduler import Priority
+from backend.services.memory_manager import FACT_SOURCE_TYPES, memory_manager
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('embed', 'importance', 'facts', 'traits')
+MEMORY_TYPE = 'conversation'
+
+
+class _Job:
+    """État en mémoire d'un job pendant sa traversée du pipeline"""
+
+    __slots__ = (
+        'id',
+        'session_factory',
+        'character_id',
+        'content',
+        'interaction_text',
+        'memory_id',
+        'attempts',
+        'embedding',
+        'importance',
+    )
+
+    def __init__(
+        self, job_id, session_factory, character_id, content, interaction_text
+    ):
+        self.id = job_id
+        self.session_factory = session_factory
+        self.character_id = character_id
+        self.content = content
+        self.interaction_text = interaction_text
+        self.memory_id = None
+        self.attempts = 0
+        self.embedding = None
+        self.importance = None
+
+
+class MemoryPipeline:
+    """Pipeline de mémorisation exécuté après l'envoi de la réponse
+
+    Chaque étape possède sa file et `workers` threads : un échange passe
+    d'une file à la suivante sans jamais bloquer l'appelant. La progression
+    est enregistrée dans la table `memory_jobs` au début de chaque étape,
+    dans la même transaction que ses écritures : une étape qui valide
+    elle-même sa transaction (les traits) valide aussi sa progression et
+    n'est jamais rejouée. La ligne est supprimée avec la dernière étape
+    (seuls les jobs abandonnés y restent, avec leur erreur). Après un
+    échec, l'étape est rejouée avec un délai exponentiel (jusqu'à
+    `max_attempts` essais).
+
+    Un job en cours est 'running' et attribué à un processus (`owner`),
+    bail renouvelé à chaque étape. Au démarrage, `recover` réclame un à un,
+    par un UPDATE conditionnel, les jobs en attente et ceux dont le bail a
+    expiré (processus arrêté) : avec plusieurs workers uvicorn, chaque job
+    n'est repris que par un seul. `drain` attend la fin des jobs en cours
+    (utilisé à l'arrêt de l'application).
+    """
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        manager=memory_manager,
+        traits=character_manager,
+        workers: int = MEMORY_CONFIG['pipeline_workers'],
+        max_attempts: int = MEMORY_CONFIG['pipeline_max_attempts'],
+        retry_delay: float = MEMORY_CONFIG['pipeline_retry_delay'],
+        lease: float = MEMORY_CONFIG['pipeline_lease'],
+    ):
+        """Initialise le pipeline (les threads démarrent au premier job)"""
+        self.session_factory = session_factory
+        self.manager = manager
+        self.traits = traits
+        self.workers = max(1, workers)
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lease = lease
+        self.owner = f'{socket.gethostname()}:{os.getpid()}'
+        self._queues = {stage: queue.Queue() for stage in STAGES}
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._in_flight = 0
+        self._ready_engines: set = set()
+        self.stats = {'submitted': 0, 'completed': 0, 'retried': 0, 'failed': 0}
+
+    # --- Soumission ---
+
+    def submit(
+        self,
+        character_id: int,
+        content: str,
+        interaction_text: str | None = None,
+        session_factory=None,
+    ) -> int:
+        """Enregistre un échange à mémoriser ; retourne l'id du job"""
+        session_factory = session_factory or self.session_factory
+        with session_factory() as db:
+            self._ensure_table(db)
+            row = MemoryJobModel(
+                character_id=character_id,
+                content=content,
+                interaction_text=interaction_text,
+                status='running',
+                owner=self.owner,
+                leased_at=datetime.datetime.now(),
+            )
+            db.add(row)
+            db.commit()
+            job_id = row.id
+
+        job = _Job(job_id, session_factory, character_id, content, interaction_text)
+        with self._lock:
+            self._in_flight += 1
+            self.stats['submitted'] += 1
+        self._ensure_workers()
+        self._queues[STAGES[0]].put(job)
+        return job_id
+
+    def recover(self, session_factory=None) -> int:
+        """Réclame et remet en file les jobs inachevés (après un redémarrage)"""
+        session_factory = session_factory or self.session_factory
+        jobs = []
+        with session_factory() as db:
+            self._ensure_table(db)
+            # Jobs terminés gardés par les versions précédentes du pipeline
+            db.execute(delete(MemoryJobModel).where(MemoryJobModel.status == 'done'))
+            db.commit()
+            now = datetime.datetime.now()
+            claimable = or_(
+                MemoryJobModel.status == 'pending',
+                (MemoryJobModel.status == 'running')
+                & (
+                    MemoryJobModel.leased_at.is_(None)
+                    | (
+                        MemoryJobModel.leased_at
+                        < now - datetime.timedelta(seconds=self.lease)
+                    )
+                ),
+            )
+            candidates = (
+                db.query(MemoryJobModel.id)
+                .filter(claimable)
+                .order_by(MemoryJobModel.id)
+                .all()
+            )
+            for (job_id,) in candidates:
+                # Un autre processus a pu réclamer le job entre-temps
+                claimed = db.execute(
+                    update(MemoryJobModel)
+                    .where(MemoryJobModel.id == job_id, claimable)
+                    .values(status='running', owner=self.owner, leased_at=now)
+                )
+                db.commit()
+                if claimed.rowcount != 1:
+                    continue
+                row = db.get(MemoryJobModel, job_id)
+                job = _Job(
+                    row.id,
+                    session_factory,
+                    row.character_id,
+                    row.content,
+                    row.interaction_text,
+                )
+                job.memory_id = row.memory_id
+                job.attempts = row.attempts
+                jobs.append((row.stage, job))
+
+        if jobs:
+            with self._lock:
+                self._in_flight += len(jobs)
+            self._ensure_workers()
+            for stage, job in jobs:
+                self._queues[stage if stage in STAGES else STAGES[0]].put(job)
+            logger.info(f'Pipeline mémoire: {len(jobs)} jobs repris')
+        return len(jobs)
+
+    def _ensure_table(self, db: Session):
+        engine = db.get_bind()
+        if engine in self._ready_engines:
+            return
+        table = MemoryJobModel.__table__
+        table.create(engine, checkfirst=True)
+        # Colonnes ajoutées depuis la création de la table (bail des jobs)
+        existing = {
+            column['name'] for column in inspect(engine).get_columns(table.name)
+        }
+        with engine.begin() as connection:
+            for column in table.columns:
+                if column.name not in existing:
+                    connection.execute(
+                        text(
+                            f'ALTER TABLE {table.name} ADD COLUMN {column.name} '
+                            f'{column.type.compile(engine.dialect)}'
+                        )
+                    )
+        self._ready_engines.add(engine)
+
+    # --- Étapes ---
+
+    def _stage_embed(self, db: Session, job: _Job):
+        job.embedding = self.manager.encoder.encode(job.content, Priority.BACKGROUND)
+
+    def _stage_importance(self, db: Session, job: _Job):
+        """Calcule l'importance et enregistre la mémoire"""
+        if job.embedding is None:  # job repris après un redémarrage
+            job.embedding = self.manager.encoder.encode(
+                job.content, Priority.BACKGROUND
+            )
+        job.importance = self.manager.importance_scorer.score(job.content, MEMORY_TYPE)
+        memory = MemoryModel(
+            character_id=job.character_id,
+            type=MEMORY_TYPE,
+            content=job.content,
+            importance=job.importance,
+            embedding=job.embedding,
+            access_count=0,
+        )
+        db.add(memory)
+        db.flush()
+        job.memory_id = memory.id
+        created_at = memory.created_at.timestamp()
+
+        def index_memory():
+            self.manager.index.add(
+                db,
+                job.character_id,
+                [job.memory_id],
+                [job.embedding],
+                created_at=created_at,
+                importance=job.importance,
+                access_count=0,
+            )
+
+        return index_memory
+
+    def _stage_facts(self, db: Session, job: _Job):
+        if job.memory_id is not None and MEMORY_TYPE in FACT_SOURCE_TYPES:
+            extractor = self.manager.fact_extractor
+            extractor.store(
+                db,
+                job.character_id,
+                ((job.memory_id, fact) for fact in extractor.scan(job.content)),
+                commit=False,
+            )
+
+    def _stage_traits(self, db: Session, job: _Job):
+        if job.interaction_text:
+            self.traits.update_traits_from_interaction(
+                db, job.character_id, job.interaction_text, intensity=1.0
+            )
+
+    # --- Exécution ---
+
+    def _ensure_workers(self):
+        with self._lock:
+            if self._threads:
+                return
+            for stage in STAGES:
+                for number in range(self.workers):
+                    thread = threading.Thread(
+                        target=self._work,
+                        args=(stage,),
+                        name=f'memory-pipeline-{stage}-{number}',
+                        daemon=True,
+                    )
+                    thread.start()
+                    self._threads.append(thread)
+
+    def _work(self, stage: str):
+        stage_queue = self._queues[stage]
+        while True:
+            job = stage_queue.get()
+            if job is None:
+                return
+            self._process(stage, job)
+
+    def _process(self, stage: str, job: _Job):
+        following = STAGES.index(stage) + 1
+        next_stage = STAGES[following] if following < len(STAGES) else None
+        try:
+            with job.session_factory() as db:
+                # Progression écrite avant l'étape : elle est validée avec
+                # ses écritures, même si l'étape valide elle-même (traits)
+                self._advance(db, job, next_stage)
+                memory_id = job.memory_id
+                after_commit = getattr(self, f'_stage_{stage}')(db, job)
+                if next_stage and job.memory_id != memory_id:
+                    db.execute(
+                        update(MemoryJobModel)
+                        .where(MemoryJobModel.id == job.id)
+                        .values(memory_id=job.memory_id)
+                    )
+                db.commit()
+                if after_commit is not None:
+                    after_commit()
+        except Exception as e:
+            self._retry(stage, job, next_stage, e)
+            return
+        self._advanced(job, next_stage)
+
+    def _advanced(self, job: _Job, next_stage: str | None):
+        if next_stage:
+            job.attempts = 0
+            self._queues[next_stage].put(job)
+        else:
+            self._finish(job, 'completed')
+
+    def _advance(self, db: Session, job: _Job, next_stage: str | None):
+        if next_stage is None:
+            # Job terminé : rien à reprendre, la ligne n'a plus d'usage
+            db.execute(delete(MemoryJobModel).where(MemoryJobModel.id == job.id))
+            return
+        db.execute(
+            update(MemoryJobModel)
+            .where(MemoryJobModel.id == job.id)
+            .values(
+                stage=next_stage,
+                attempts=0,
+                last_error=None,
+                leased_at=datetime.datetime.now(),
+            )
+        )
+
+    def _retry(self, stage: str, job: _Job, next_stage: str | None, error: Exception):
+        job.attempts += 1
+        failed = job.attempts >= self.max_attempts
+        logger.error(
+            f"Pipeline mémoire: échec de l'étape {stage} du job {job.id} "
+            f'(essai {job.attempts}/{self.max_attempts}): {error}'
+        )
+        try:
+            with job.session_factory() as db:
+                # Le job reste attribué à ce processus pendant le délai ;
+                # s'il n'est plus à cette étape, l'étape a validé sa
+                # progression avant d'échouer et ne doit pas être rejouée
+                retried = db.execute(
+                    update(MemoryJobModel)
+                    .where(MemoryJobModel.id == job.id, MemoryJobModel.stage == stage)
+                    .values(
+                        attempts=job.attempts,
+                        last_error=str(error),
+                        status='failed' if failed else 'running',
+                        leased_at=datetime.datetime.now(),
+                    )
+                )
+                db.commit()
+            if retried.rowcount == 0:
+                logger.warning(
+                    f'Pipeline mémoire: étape {stage} du job {job.id} déjà validée'
+                )
+                self._advanced(job, next_stage)
+                return
+        except Exception as e:
+            logger.error(f'Pipeline mémoire: job {job.id} non mis à jour: {e}')
+
+        if failed:
+            self._finish(job, 'failed')
+            return
+        with self._lock:
+            self.stats['retried'] += 1
+        delay = self.retry_delay * 2 ** (job.attempts - 1)
+        timer = threading.Timer(delay, self._queues[stage].put, args=(job,))
+        timer.daemon = True
+        timer.start()
+
+    def _finish(self, job: _Job, outcome: str):
+        with self._idle:
+            self.stats[outcome] += 1
+            self._in_flight -= 1
+            self._idle.notify_all()
+
+    # --- Arrêt ---
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._in_flight
+
+    def drain(self, timeout: float | None = None) -> bool:
+        """Attend la fin des jobs en cours ; False si le délai est dépassé"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._in_flight == 0, timeout)
+
+    def stop(self, timeout: float | None = 30.0) -> bool:
+        """Vide le pipeline puis arrête les threads
+
+        Les jobs encore inachevés restent en base et seront repris par
+        `recover` au prochain démarrage.
+        """
+        start = time.monotonic()
+        drained = self.drain(timeout)
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            self._queues[thread.name.split('-')[2]].put(None)
+        for thread in threads:
+            remaining = (
+                None
+                if timeout is None
+                else max(0.0, timeout - (time.monotonic() - start))
+            )
+            thread.join(remaining)
+        if not drained:
+            logger.warning(
+                f'Pipeline mémoire arrêté avec {self.pending_count()} jobs en attente'
+            )
+        return drained
+
+
+# Instance globale du pipeline de mémorisation
+memory_pipeline = MemoryPipeline()
@@ -0,0 +1,246 @@
+"""
+Score de pertinence multi-critères des mémoires, calculé sur tableaux NumPy
+"""
+
+import datetime
+from typing import NamedTuple
+
+import numpy as np
+
+from backend.services.memory_index import CharacterMemoryIndex, top_k
+
+
+class ScoredMemory(NamedTuple):
+    """Mémoire retenue et détail de son score"""
+
+    memory_id: int
+    relevance: float
+    similarity: float
+    recency: float
+    importance: float
+
+
+class RelevanceScorer:
+    """Combine similarité, récence, importance et fréquence d'accès
+
+    relevance = s * similarité + r * récence + i * importance / 10 + bonus_accès
+
+    avec s = 1 - r - i (borné à 0). Le score est calculé en une passe sur
+    toutes les candidates ; seuls les `limit` meilleurs résultats sont
+    matérialisés.
+    """
+
+    def __init__(
+        self,
+        max_age_days: float = 365,
+        access_saturation: float = 20,
+        access_bonus: float = 0.2,
+    ):
+        """Initialise le scoreur"""
+        self.max_age_days = max_age_days
+        self.access_saturation = access_saturation
+        self.access_bonus = access_bonus
+
+    def rank(
+        self,
+        index: CharacterMemoryIndex,
+        query: np.ndarray,
+        limit: int,
+        recency_weight: float = 0.3,
+        importance_weight: float = 0.4,
+        now: datetime.datetime | None = None,
+    ) -> list[ScoredMemory]:
+        """Retourne les `limit` mémoires de meilleur score, par score décroissant"""
+        now = now or datetime.datetime.now()
+        with index.lock:
+            if not len(index) or limit <= 0:
+                return []
+            positions, similarity = index.candidates(query)
+            created_at = index.attribute('created_at')[positions]
+            importance = index.attribute('importance')[positions]
+            access_count = index.attribute('access_count')[positions]
+            memory_ids = index.ids[positions]
+
+        relevance, recency, importance_score = self._combine(
+            similarity,
+            created_at,
+            importance,
+            access_count,
+            recency_weight,
+            importance_weight,
+            now,
+        )
+
+        if index.quantized:
+            # Similarité approchée (int8) : les `index.rescore` meilleures
+            # candidates sont rescorées en pleine précision avant le tri final
+            pool = top_k(relevance, max(limit, index.rescore))
+            exact = index.exact_similarities(query, memory_ids[pool])
+            if exact is not None:
+                memory_ids, created_at, importance, access_count = (
+                    memory_ids[pool],
+                    created_at[pool],
+                    importance[pool],
+                    access_count[pool],
+                )
+                similarity = np.where(np.isnan(exact), similarity[pool], exact)
+                relevance, recency, importance_score = self._combine(
+                    similarity,
+                    created_at,
+                    importance,
+                    access_count,
+                    recency_weight,
+                    importance_weight,
+                    now,
+                )
+
+        top = top_k(relevance, limit)
+        return [
+            ScoredMemory(
+                int(memory_ids[i]),
+                float(relevance[i]),
+                float(similarity[i]),
+                float(recency[i]),
+                float(importance_score[i]),
+            )
+            for i in top
+        ]
+
+    def _combine(
+        self,
+        similarity: np.ndarray,
+        created_at: np.ndarray,
+        importance: np.ndarray,
+        access_count: np.ndarray,
+        recency_weight: float,
+        importance_weight: float,
+        now: datetime.datetime | None,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Score combiné, récence et importance normalisée"""
+        now = now or datetime.datetime.now()
+        age_in_days = np.floor((now.timestamp() - created_at) / 86400.0)
+        recency = np.maximum(0.0, 1.0 - age_in_days / self.max_age_days)
+        importance_score = importance / 10.0
+        access_factor = (
+            np.minimum(1.0, access_count / self.access_saturation) * self.access_bonus
+        )
+
+        similarity_weight = max(0.0, 1.0 - recency_weight - importance_weight)
+        relevance = (
+            similarity_weight * similarity
+            + recency_weight * recency
+            + importance_weight * importance_score
+            + access_factor
+        )
+        return relevance, recency, importance_score
+
+    def score(
+        self,
+        index: CharacterMemoryIndex,
+        query: np.ndarray,
+        memory_ids: list[int],
+        recency_weight: float = 0.3,
+        importance_weight: float = 0.4,
+        now: datetime.datetime | None = None,
+    ) -> list[ScoredMemory]:
+        """Score des mémoires données (celles absentes de l'index sont ignorées)"""
+        with index.lock:
+            positions = [index.position(memory_id) for memory_id in memory_ids]
+            positions = np.array(
+                [p for p in positions if p is not None], dtype=np.int64
+            )
+            if not len(positions):
+                return []
+            similarity = index.similarities(query, positions)
+            created_at = index.attribute('created_at')[positions]
+            importance = index.attribute('importance')[positions]
+            access_count = index.attribute('access_count')[positions]
+            found_ids = index.ids[positions]
+
+        if index.quantized:
+            exact = index.exact_similarities(query, found_ids)
+            if exact is not None:
+                similarity = np.where(np.isnan(exact), similarity, exact)
+
+        relevance, recency, importance_score = self._combine(
+            similarity,
+            created_at,
+            importance,
+            access_count,
+            recency_weight,
+            importance_weight,
+            now,
+        )
+        return [
+            ScoredMemory(
+                int(found_ids[i]),
+                float(relevance[i]),
+                float(similarity[i]),
+                float(recency[i]),
+                float(importance_score[i]),
+            )
+            for i in range(len(found_ids))
+        ]
+
+    def rank_hybrid(
+        self,
+        index: CharacterMemoryIndex,
+        query: np.ndarray,
+        lexical_ids: list[int],
+        limit: int,
+        recency_weight: float = 0.3,
+        importance_weight: float = 0.4,
+        candidates: int = 50,
+        rrf_k: int = 60,
+        now: datetime.datetime | None = None,
+    ) -> list[ScoredMemory]:
+        """Fusionne le classement vectoriel et un classement lexical (BM25)
+
+        Les `candidates` meilleures mémoires au score combiné et les
+        résultats lexicaux sont fusionnés par rang réciproque. `relevance`
+        est le score fusionné, qui donne l'ordre des résultats ; le détail
+        (similarité, récence, importance) reste celui du scoreur
+        multi-critères.
+        """
+        now = now or datetime.datetime.now()
+        vector = self.rank(
+            index, query, max(limit, candidates), recency_weight, importance_weight, now
+        )
+        scored = {memory.memory_id: memory for memory in vector}
+        missing = [memory_id for memory_id in lexical_ids if memory_id not in scored]
+        for memory in self.score(
+            index, query, missing, recency_weight, importance_weight, now
+        ):
+            scored[memory.memory_id] = memory
+
+        fused = reciprocal_rank_fusion(
+            [
+                [memory.memory_id for memory in vector],
+                [memory_id for memory_id in lexical_ids if memory_id in scored],
+            ],
+            rrf_k,
+        )
+        return [
+            scored[memory_id]._replace(relevance=score)
+            for memory_id, score in fused[:limit]
+        ]
+
+
+def reciprocal_rank_fusion(
+    rankings: list[list[int]], k: int = 60
+) -> list[tuple[int, float]]:
+    """Fusion par rang réciproque : somme de 1 / (k + rang) sur les classements
+
+    Les scores bruts (cosinus, BM25) ne sont pas comparables entre eux :
+    seuls les rangs comptent. Retourne les couples (id, score) par score
+    décroissant, à égalité dans l'ordre de première apparition.
+    """
+    scores: dict[int, float] = {}
+    for ranking in rankings:
+        for rank, memory_id in enumerate(ranking, 1):
+            scores[memory_id] = scores.get(memory_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+# Instance globale du scoreur de pertinence
+relevance_scorer = RelevanceScorer()
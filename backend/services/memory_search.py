@@ -0,0 +1,134 @@
+"""
+Recherche plein texte des mémoires (SQLite FTS5, classement BM25)
+"""
+
+import logging
+import re
+import threading
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Table FTS5 à contenu externe : le texte n'est pas dupliqué, seul l'index
+# inversé est stocké ; les triggers la tiennent à jour à chaque écriture
+# sur `memories`, y compris les suppressions groupées de la consolidation.
+FTS_SCHEMA = (
+    """
+    CREATE VIRTUAL TABLE memories_fts USING fts5(
+        content,
+        character_id UNINDEXED,
+        content='memories',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS memories_fts_insert AFTER INSERT ON memories
+    BEGIN
+        INSERT INTO memories_fts(rowid, content, character_id)
+        VALUES (new.id, new.content, new.character_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS memories_fts_delete AFTER DELETE ON memories
+    BEGIN
+        INSERT INTO memories_fts(memories_fts, rowid, content, character_id)
+        VALUES ('delete', old.id, old.content, old.character_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS memories_fts_update
+    AFTER UPDATE OF content, character_id ON memories
+    BEGIN
+        INSERT INTO memories_fts(memories_fts, rowid, content, character_id)
+        VALUES ('delete', old.id, old.content, old.character_id);
+        INSERT INTO memories_fts(rowid, content, character_id)
+        VALUES (new.id, new.content, new.character_id);
+    END
+    """,
+)
+
+WORD_PATTERN = re.compile(r'\w+')
+
+
+class LexicalMemoryIndex:
+    """Index plein texte des mémoires, toutes périodes confondues
+
+    La table FTS5 et ses triggers sont créés au premier usage sur chaque
+    base ; les mémoires déjà présentes sont alors indexées en une fois. Si
+    SQLite a été compilé sans FTS5, la recherche lexicale est désactivée et
+    renvoie une liste vide.
+    """
+
+    def __init__(self, max_terms: int = 32):
+        """Initialise l'index"""
+        self.max_terms = max_terms
+        self._ready: dict[str, bool] = {}
+        self._lock = threading.Lock()
+
+    def ensure(self, db: Session) -> bool:
+        """Crée la table FTS5 si besoin ; False si FTS5 est indisponible"""
+        engine = db.get_bind()
+        key = str(engine.url)
+        ready = self._ready.get(key)
+        if ready is not None:
+            return ready
+
+        with self._lock:
+            if key in self._ready:
+                return self._ready[key]
+            try:
+                with engine.begin() as connection:
+                    exists = connection.execute(
+                        text(
+                            'SELECT 1 FROM sqlite_master '
+                            "WHERE type = 'table' AND name = 'memories_fts'"
+                        )
+                    ).first()
+                    if not exists:
+                        for statement in FTS_SCHEMA:
+                            connection.execute(text(statement))
+                        connection.execute(
+                            text(
+                                'INSERT INTO memories_fts(memories_fts) '
+                                "VALUES ('rebuild')"
+                            )
+                        )
+                        logger.info('Index plein texte des mémoires créé')
+                self._ready[key] = True
+            except OperationalError as e:
+                logger.warning(f'Recherche plein texte indisponible: {e}')
+                self._ready[key] = False
+        return self._ready[key]
+
+    def match_expression(self, query: str) -> str | None:
+        """Requête FTS5 : chaque mot de la requête, entre guillemets, en OU"""
+        terms = list(dict.fromkeys(WORD_PATTERN.findall(query.lower())))
+        if not terms:
+            return None
+        return ' OR '.join(f'"{term}"' for term in terms[: self.max_terms])
+
+    def search(
+        self, db: Session, character_id: int, query: str, limit: int
+    ) -> list[int]:
+        """Ids des mémoires d'un personnage, par score BM25 décroissant"""
+        expression = self.match_expression(query)
+        if expression is None or limit <= 0 or not self.ensure(db):
+            return []
+        rows = db.execute(
+            text(
+                'SELECT rowid FROM memories_fts '
+                'WHERE memories_fts MATCH :expression '
+                'AND character_id = :character_id '
+                'ORDER BY rank LIMIT :limit'
+            ),
+            {'expression': expression, 'character_id': character_id, 'limit': limit},
+        )
+        return [row[0] for row in rows]
+
+
+# Instance globale de l'index plein texte
+lexical_index = LexicalMemoryIndex()
@@ -0,0 +1,175 @@
+"""
+Registre des modèles Ollama : disponibilité en cache et préchargement
+"""
+
+import logging
+import threading
+import time
+from collections.abc import Callable
+from datetime import datetime
+
+from backend.utils.http_client import HttpClient
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """Liste des modèles installés, vérifiée en arrière-plan et mise en cache
+
+    `/api/tags` n'est interrogé que si la dernière réponse a plus de `ttl`
+    secondes ; les vérifications concurrentes attendent la même requête au
+    lieu d'en lancer chacune une. Le registre suit aussi l'état de
+    préparation du modèle par défaut, exposé par /health :
+
+    - `checking` : première vérification en cours
+    - `unavailable` : Ollama injoignable ou modèle absent (mode mock)
+    - `available` : modèle installé mais pas (ou plus) chargé en mémoire
+    - `warming` : modèle en cours de chargement dans la mémoire d'Ollama
+    - `ready` : modèle chargé, le premier tour ne paie pas le chargement
+    - `mock` : mode mock demandé par la configuration
+    """
+
+    def __init__(
+        self,
+        http: HttpClient,
+        api_url: str,
+        ttl: float = 60.0,
+        keep_alive: str = '30m',
+    ):
+        """Initialise le registre (aucun appel réseau)"""
+        self.http = http
+        self.api_url = api_url
+        self.ttl = ttl
+        self.keep_alive = keep_alive
+        self.state = 'checking'
+        self.model: str | None = None
+        self._models: list[str] | None = None
+        self._checked_at = 0.0
+        self._checked_wall: datetime | None = None
+        self._last_error: str | None = None
+        self._warm_up_seconds: float | None = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def models(self, max_age: float | None = None) -> list[str] | None:
+        """Modèles installés sur Ollama, ou None si Ollama est injoignable
+
+        Args:
+            max_age: Âge maximal (s) accepté pour la réponse en cache ;
+                `ttl` par défaut, 0 pour forcer une nouvelle requête
+        """
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            if self._checked_at and time.monotonic() - self._checked_at <= max_age:
+                return self._models
+            try:
+                response = self.http.get(f'{self.api_url}/tags', retries=0)
+                if response.status_code == 200:
+                    self._models = [
+                        model.get('name') for model in response.json().get('models', [])
+                    ]
+                    self._last_error = None
+                else:
+                    self._models = None
+                    self._last_error = f'HTTP {response.status_code}'
+            except Exception as e:
+                self._models = None
+                self._last_error = str(e)
+            self._checked_at = time.monotonic()
+            self._checked_wall = datetime.now()
+            return self._models
+
+    @staticmethod
+    def resolve(model: str, available: list[str]) -> str | None:
+        """Nom installé correspondant à `model`
+
+        Correspondance exacte, sinon tolérante par préfixe (ex. 'llama3' ->
+        'llama3.1:latest') pour éviter une bascule mock surprise quand seul
+        un tag versionné est installé.
+        """
+        if model in available:
+            return model
+        return next((m for m in available if m.startswith(model)), None)
+
+    def loaded_models(self) -> list[str] | None:
+        """Modèles actuellement chargés en mémoire par Ollama (/api/ps)"""
+        try:
+            response = self.http.get(f'{self.api_url}/ps', retries=0)
+            if response.status_code == 200:
+                return [
+                    model.get('name') for model in response.json().get('models', [])
+                ]
+        except Exception as e:
+            logger.debug(f'Liste des modèles chargés indisponible: {e}')
+        return None
+
+    def warm_up(self, model: str) -> bool:
+        """Charge le modèle dans la mémoire d'Ollama sans rien générer
+
+        Une génération sans prompt ne fait que charger le modèle, qui reste
+        ensuite en mémoire pendant `keep_alive`.
+        """
+        self.state = 'warming'
+        start = time.perf_counter()
+        try:
+            response = self.http.post(
+                f'{self.api_url}/generate',
+                json={'model': model, 'keep_alive': self.keep_alive},
+            )
+            if response.status_code != 200:
+                raise RuntimeError(f'HTTP {response.status_code} - {response.text}')
+        except Exception as e:
+            logger.warning(f'Préchargement du modèle {model} impossible: {e}')
+            self._last_error = str(e)
+            self.state = 'unavailable'
+            return False
+        self._warm_up_seconds = time.perf_counter() - start
+        self.state = 'ready'
+        logger.info(f'Modèle {model} chargé en {self._warm_up_seconds:.1f}s')
+        return True
+
+    def start(self, refresh: Callable[[], None]):
+        """Appelle `refresh` tout de suite puis toutes les `ttl` secondes"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(refresh,), name='llm-model-registry', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Arrête les vérifications périodiques"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self, refresh: Callable[[], None]):
+        while not self._stopped.is_set():
+            try:
+                refresh()
+            except Exception as e:
+                logger.error(f'Erreur de vérification du modèle LLM: {e}')
+            self._stopped.wait(self.ttl)
+
+    def status(self) -> dict:
+        """État de préparation du modèle, pour /health"""
+        age = time.monotonic() - self._checked_at if self._checked_at else None
+        return {
+            'state': self.state,
+            'ready': self.state == 'ready',
+            'model': self.model,
+            'available_models': self._models,
+            'checked_at': (
+                self._checked_wall.isoformat() if self._checked_wall else None
+            ),
+            'check_age_s': round(age, 1) if age is not None else None,
+            'warm_up_s': (
+                round(self._warm_up_seconds, 2)
+                if self._warm_up_seconds is not None
+                else None
+            ),
+            'last_error': self._last_error,
+        }
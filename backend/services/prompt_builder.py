@@ -0,0 +1,277 @@
+"""
+Assemblage du prompt de conversation sous un budget de jetons
+"""
+
+import functools
+import logging
+import re
+from collections.abc import Iterable
+from typing import NamedTuple
+
+from backend.config import LLM_CONFIG, PROMPT_CONFIG, SYSTEM_LIMITS
+
+logger = logging.getLogger(__name__)
+
+# Mots et signes de ponctuation : les unités que découpe un tokenizer BPE
+_PIECES = re.compile(r'\w+|[^\w\s]')
+
+
+def _piece_cost(piece: str) -> int:
+    # Un mot court tient en un jeton ; au-delà, environ un jeton par
+    # tranche de quatre caractères (estimation prudente, plutôt haute)
+    return 1 + (len(piece) - 1) // 4
+
+
+@functools.lru_cache(maxsize=8192)
+def count_tokens(text: str) -> int:
+    """Nombre approximatif de jetons d'un texte, mis en cache
+
+    Les messages d'historique, faits et mémoires reviennent d'un tour à
+    l'autre : le cache évite de les redécouper à chaque prompt.
+    """
+    return sum(_piece_cost(piece) for piece in _PIECES.findall(text))
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """Plus long préfixe de `text` dont l'estimation tient dans `budget`"""
+    if count_tokens(text) <= budget:
+        return text
+    used = 0
+    for match in _PIECES.finditer(text):
+        used += _piece_cost(match.group())
+        if used > budget:
+            return text[: match.start()].rstrip()
+    return text
+
+
+_HEADERS = {
+    'profile': '# CHARACTER PROFILE:\n',
+    'facts': '# KNOWN FACTS:\n',
+    'memories': '# RELEVANT MEMORIES:\n',
+    'history': '# CONVERSATION:\n',
+}
+
+
+def format_turn(user_input: str) -> str:
+    """Tour de l'utilisateur tel qu'il termine chaque prompt"""
+    return f'User: {user_input}\nAssistant: '
+
+
+class AssembledPrompt(NamedTuple):
+    """Prompt assemblé et jetons (estimés) occupés par chaque section
+
+    `kept` liste, pour les faits et les mémoires, les éléments (tels que
+    fournis) entrés dans le prompt.
+    """
+
+    text: str
+    tokens: int
+    sections: dict[str, int]
+    kept: dict[str, list[str]]
+
+
+class PromptAssembler:
+    """Construit le prompt de conversation sans dépasser la fenêtre du modèle
+
+    Le budget est `max_context_length`, moins les jetons réservés à la
+    réponse (`reply_tokens`), une marge pour l'écart de l'estimation, la
+    consigne système et le tour de l'utilisateur, toujours inclus. Les
+    sections sont remplies dans l'ordre de `shares` (profil, faits,
+    mémoires, historique), chacune plafonnée à sa part du budget ; ce
+    qu'une section n'utilise pas reste disponible pour les suivantes et la
+    dernière prend tout le reste. Dans une section, les éléments sont pris
+    dans l'ordre fourni (le plus utile d'abord) jusqu'au premier qui ne
+    tient plus. Le profil, d'un seul bloc, est tronqué à son plafond.
+    """
+
+    def __init__(
+        self,
+        max_context_length: int = SYSTEM_LIMITS['max_context_length'],
+        reply_tokens: int = LLM_CONFIG.get('max_tokens', 1024),
+        shares: dict[str, float] = PROMPT_CONFIG['section_shares'],
+        safety_margin: int = PROMPT_CONFIG['safety_margin'],
+    ):
+        """Initialise l'assembleur"""
+        self.max_context_length = max_context_length
+        self.reply_tokens = reply_tokens
+        self.shares = shares
+        self.safety_margin = safety_margin
+
+    def assemble(
+        self,
+        user_input: str,
+        system_prompt: str = '',
+        profile: str = '',
+        facts: Iterable[str] = (),
+        memories: Iterable[str] = (),
+        history: Iterable[tuple[str, str]] = (),
+    ) -> AssembledPrompt:
+        """Assemble le prompt
+
+        Args:
+            user_input: Message de l'utilisateur pour ce tour
+            system_prompt: Consigne système, envoyée à part mais comptée
+            profile: Profil du personnage
+            facts: Faits connus, du plus sûr au moins sûr
+            memories: Mémoires retrouvées, de la plus pertinente à la moins
+            history: Messages (expéditeur, contenu), du plus récent au plus
+                ancien
+
+        Returns:
+            Le prompt et les jetons occupés par section
+        """
+        turn = format_turn(user_input)
+        fixed = (
+            count_tokens(system_prompt)
+            + count_tokens(turn)
+            + sum(count_tokens(header) for header in _HEADERS.values())
+        )
+        facts, memories = list(facts), list(memories)
+        candidates = {
+            'profile': [profile] if profile else [],
+            'facts': [f'- {fact}' for fact in facts],
+            'memories': [f'- {memory}' for memory in memories],
+            'history': [
+                f'{"User" if sender == "user" else "Assistant"}: {content}'
+                for sender, content in history
+            ],
+        }
+        lines, used = self._fill_sections(
+            candidates, list(self.shares), self._available(fixed)
+        )
+
+        history_lines = lines.get('history', [])[::-1]  # ordre chronologique
+        parts = [_HEADERS['profile'] + '\n'.join(lines.get('profile', []))]
+        for name in ('facts', 'memories'):
+            if lines.get(name):
+                parts.append(_HEADERS[name] + '\n'.join(lines[name]))
+        conversation = ''.join(f'{line}\n' for line in history_lines)
+        parts.append(_HEADERS['history'] + conversation + turn)
+        return self._result(
+            '\n\n'.join(parts), fixed, candidates, lines, used, facts, memories
+        )
+
+    def assemble_turn(
+        self,
+        user_input: str,
+        context_tokens: int,
+        facts: Iterable[str] = (),
+        memories: Iterable[str] = (),
+    ) -> AssembledPrompt:
+        """Assemble le tour suivant d'une session dont le contexte KV est réutilisé
+
+        Le contexte contient déjà la consigne, le profil et l'historique :
+        seuls le tour de l'utilisateur et les faits et mémoires qui ne
+        figurent pas encore dans le contexte sont envoyés, dans ce que la
+        fenêtre laisse après les `context_tokens` du contexte.
+
+        Args:
+            user_input: Message de l'utilisateur pour ce tour
+            context_tokens: Taille du contexte réutilisé
+            facts: Nouveaux faits, du plus sûr au moins sûr
+            memories: Nouvelles mémoires, de la plus pertinente à la moins
+        """
+        turn = format_turn(user_input)
+        facts, memories = list(facts), list(memories)
+        candidates = {
+            'facts': [f'- {fact}' for fact in facts],
+            'memories': [f'- {memory}' for memory in memories],
+        }
+        fixed = count_tokens(turn) + sum(
+            count_tokens(_HEADERS[name]) for name in candidates if candidates[name]
+        )
+        lines, used = self._fill_sections(
+            candidates, list(candidates), self._available(fixed + context_tokens)
+        )
+
+        parts = [
+            _HEADERS[name] + '\n'.join(lines[name]) for name in lines if lines[name]
+        ]
+        parts.append(turn)
+        return self._result(
+            '\n\n'.join(parts), fixed, candidates, lines, used, facts, memories
+        )
+
+    def turn_room(self, user_input: str, context_tokens: int) -> int:
+        """Jetons que `assemble_turn` pourrait donner à de nouvelles mémoires"""
+        fixed = count_tokens(format_turn(user_input)) + count_tokens(
+            _HEADERS['memories']
+        )
+        return self._available(fixed + context_tokens)
+
+    def _available(self, fixed: int) -> int:
+        """Jetons laissés aux sections une fois `fixed` et la réponse réservés"""
+        available = (
+            self.max_context_length - self.reply_tokens - self.safety_margin - fixed
+        )
+        if available <= 0:
+            logger.warning(
+                f'Aucun budget de prompt hors tour utilisateur ({available} jetons)'
+            )
+            return 0
+        return available
+
+    def _fill_sections(
+        self, candidates: dict[str, list[str]], names: list[str], available: int
+    ) -> tuple[dict[str, list[str]], dict[str, int]]:
+        """Remplit les sections `names` dans l'ordre, chacune sous son plafond"""
+        lines: dict[str, list[str]] = {}
+        used: dict[str, int] = {}
+        remaining = available
+        for position, name in enumerate(names):
+            cap = remaining
+            if position < len(names) - 1:
+                cap = min(remaining, int(self.shares.get(name, 1.0) * available))
+            lines[name], used[name] = self._fill(name, candidates.get(name, []), cap)
+            remaining -= used[name]
+        return lines, used
+
+    @staticmethod
+    def _result(
+        text: str,
+        fixed: int,
+        candidates: dict[str, list[str]],
+        lines: dict[str, list[str]],
+        used: dict[str, int],
+        facts: list[str],
+        memories: list[str],
+    ) -> AssembledPrompt:
+        tokens = fixed + sum(used.values())
+        dropped = {
+            name: len(candidates[name]) - len(lines[name])
+            for name in candidates
+            if name in lines and len(lines[name]) < len(candidates[name])
+        }
+        if dropped:
+            logger.debug(
+                f'Prompt limité à {tokens} jetons, éléments écartés: {dropped}'
+            )
+        # Une section est remplie par préfixe : ses n premiers éléments
+        kept = {
+            'facts': facts[: len(lines.get('facts', []))],
+            'memories': memories[: len(lines.get('memories', []))],
+        }
+        return AssembledPrompt(text, tokens, used, kept)
+
+    @staticmethod
+    def _fill(name: str, lines: list[str], cap: int) -> tuple[list[str], int]:
+        """Éléments de la section qui tiennent dans `cap`, et leur coût"""
+        kept: list[str] = []
+        spent = 0
+        for line in lines:
+            # +1 pour le saut de ligne qui sépare les éléments
+            cost = count_tokens(line) + 1
+            if spent + cost > cap:
+                if name == 'profile' and not kept:
+                    line = truncate_to_tokens(line, cap - 1)
+                    if line:
+                        kept.append(line)
+                        spent += count_tokens(line) + 1
+                break
+            kept.append(line)
+            spent += cost
+        return kept, spent
+
+
+# Instance globale utilisée par le service de chat
+prompt_assembler = PromptAssembler()
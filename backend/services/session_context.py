@@ -0,0 +1,126 @@
+"""
+Contextes KV d'Ollama conservés par session de chat
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable
+from typing import NamedTuple
+
+from backend.config import LLM_CONFIG, PROMPT_CONFIG, SYSTEM_LIMITS
+
+logger = logging.getLogger(__name__)
+
+
+class SessionContext(NamedTuple):
+    """Contexte KV d'une session et faits/mémoires qu'il contient déjà"""
+
+    tokens: list[int]
+    sent: frozenset[str]
+
+
+class SessionContextCache:
+    """Tableau `context` renvoyé par /api/generate, par session de chat
+
+    Renvoyer ce tableau avec le tour suivant permet à Ollama de réutiliser
+    le préfixe déjà évalué (profil, historique) et de n'évaluer que le
+    nouveau message : le temps d'évaluation du prompt reste stable au lieu
+    de croître avec la conversation.
+
+    Un contexte n'est valable que pour l'empreinte (modèle, consigne
+    système, profil du personnage) sous laquelle il a été produit ; si elle
+    change, ou si le contexte ne laisse plus la place du nouveau message et
+    de la réponse (`headroom`, marge d'estimation comprise) dans
+    `max_tokens`, il est abandonné et l'appelant renvoie le prompt
+    complet. Chaque entrée garde aussi les faits et mémoires déjà envoyés
+    dans ce contexte, pour n'envoyer aux tours suivants que les nouveaux.
+    Le cache est un LRU borné en nombre de sessions ; il est
+    perdu au redémarrage, ce qui coûte seulement un prompt complet.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = LLM_CONFIG.get('context_sessions', 256),
+        max_tokens: int = SYSTEM_LIMITS['max_context_length'],
+        headroom: int = (
+            LLM_CONFIG.get('max_tokens', 1024) + PROMPT_CONFIG['safety_margin']
+        ),
+    ):
+        """Initialise le cache"""
+        self.max_sessions = max_sessions
+        self.max_tokens = max_tokens
+        self.headroom = headroom
+        self._entries: OrderedDict[str, tuple[str, SessionContext]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    @staticmethod
+    def fingerprint(*parts) -> str:
+        """Empreinte de ce qui détermine le préfixe du contexte"""
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(str(part or '').encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def lookup(
+        self, session_id: str, fingerprint: str, turn_tokens: int = 0
+    ) -> SessionContext | None:
+        """Contexte réutilisable de la session, ou None s'il faut tout renvoyer
+
+        Args:
+            session_id: Session de chat
+            fingerprint: Empreinte du tour à venir (voir `fingerprint`)
+            turn_tokens: Jetons du nouveau message, qui doit tenir avec le
+                contexte et la réponse
+        """
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            stored_fingerprint, context = entry
+            size = len(context.tokens)
+            if stored_fingerprint != fingerprint:
+                reason = 'empreinte modifiée'
+            elif size + turn_tokens + self.headroom > self.max_tokens:
+                reason = f'{size} + {turn_tokens} jetons, fenêtre pleine'
+            else:
+                self._entries.move_to_end(session_id)
+                self.stats['hits'] += 1
+                return context
+            del self._entries[session_id]
+            self.stats['invalidations'] += 1
+            self.stats['misses'] += 1
+        logger.debug(f'Contexte de la session {session_id} abandonné ({reason})')
+        return None
+
+    def store(
+        self,
+        session_id: str,
+        fingerprint: str,
+        tokens: list[int],
+        sent: Iterable[str] = (),
+    ):
+        """Enregistre le contexte renvoyé par Ollama à la fin d'un tour
+
+        `sent` : faits et mémoires que ce contexte contient.
+        """
+        context = SessionContext(list(tokens), frozenset(sent))
+        with self._lock:
+            self._entries[session_id] = (fingerprint, context)
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, session_id: str):
+        """Oublie le contexte d'une session (échec de génération, suppression)"""
+        with self._lock:
+            if self._entries.pop(session_id, None) is not None:
+                self.stats['invalidations'] += 1
+
+
+# Instance globale partagée par le service de chat
+session_contexts = SessionContextCache()
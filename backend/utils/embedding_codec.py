@@ -0,0 +1,135 @@
+"""
+Format binaire compact des embeddings stockés en base
+
+Un embedding est stocké en BLOB : un en-tête de 4 octets (b'EV', version,
+code du type) suivi des composantes brutes en float32 (ou float16). La
+lecture se fait sans copie via np.frombuffer. Les anciennes lignes au format
+JSON restent lisibles tant que la migration n'a pas été exécutée.
+"""
+
+import json
+import logging
+import time
+
+import numpy as np
+from sqlalchemy import LargeBinary, bindparam, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.types import TypeDecorator
+
+from backend.config import EMBEDDING_CONFIG
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b'EV'
+_VERSION = 1
+HEADER_SIZE = 4
+
+_DTYPE_CODES = {'float32': 1, 'float16': 2}
+_CODE_DTYPES = {1: np.dtype('<f4'), 2: np.dtype('<f2')}
+
+
+def encode_embedding(vector, dtype: str | None = None) -> bytes:
+    """Sérialise un vecteur en BLOB (en-tête + composantes little-endian)"""
+    dtype = dtype or EMBEDDING_CONFIG.get('storage_dtype', 'float32')
+    if dtype not in _DTYPE_CODES:
+        raise ValueError(f"Type de stockage d'embedding inconnu: {dtype}")
+    code = _DTYPE_CODES[dtype]
+    array = np.asarray(vector, dtype=_CODE_DTYPES[code]).ravel()
+    return _MAGIC + bytes((_VERSION, code)) + array.tobytes()
+
+
+def decode_embedding(value) -> np.ndarray | None:
+    """Désérialise un embedding stocké (BLOB binaire ou ancien texte JSON)
+
+    Pour le format binaire, le tableau retourné est une vue en lecture seule
+    sur le buffer de la ligne (aucune copie).
+    """
+    if value is None:
+        return None
+    if isinstance(value, np.ndarray):
+        return value
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        raw = bytes(value) if isinstance(value, memoryview) else value
+        if raw[:2] == _MAGIC:
+            dtype = _CODE_DTYPES.get(raw[3])
+            if dtype is None:
+                raise ValueError(f"Code de type d'embedding inconnu: {raw[3]}")
+            return np.frombuffer(raw, dtype=dtype, offset=HEADER_SIZE)
+        value = raw.decode('utf-8')
+    if isinstance(value, str):
+        value = json.loads(value)
+    if value is None:
+        return None
+    return np.asarray(value, dtype=np.float32)
+
+
+class EmbeddingType(TypeDecorator):
+    """Colonne SQLAlchemy stockant un embedding au format binaire compact"""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, bytes):
+            return value
+        return encode_embedding(value)
+
+    def process_result_value(self, value, dialect):
+        return decode_embedding(value)
+
+
+def migrate_json_embeddings(
+    engine: Engine, batch_size: int = 500, dtype: str | None = None
+) -> int:
+    """Convertit les embeddings JSON de la table memories au format binaire
+
+    Les lignes sont traitées par lots successifs (pagination sur l'id), chaque
+    lot dans sa propre transaction : la migration peut être interrompue et
+    relancée sans risque.
+
+    Returns:
+        Nombre de lignes converties
+    """
+    select_batch = text(
+        'SELECT id, embedding FROM memories '
+        "WHERE id > :last_id AND typeof(embedding) = 'text' "
+        'ORDER BY id LIMIT :batch_size'
+    )
+    update_batch = text(
+        'UPDATE memories SET embedding = :embedding WHERE id = :id'
+    ).bindparams(bindparam('embedding', type_=LargeBinary))
+
+    converted = 0
+    last_id = 0
+    start_time = time.time()
+
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(
+                select_batch, {'last_id': last_id, 'batch_size': batch_size}
+            ).all()
+            if not rows:
+                break
+
+            params = []
+            for row in rows:
+                vector = decode_embedding(row.embedding)
+                params.append(
+                    {
+                        'id': row.id,
+                        'embedding': None
+                        if vector is None
+                        else encode_embedding(vector, dtype),
+                    }
+                )
+            connection.execute(update_batch, params)
+
+        converted += len(rows)
+        last_id = rows[-1].id
+        logger.info(f'Migration des embeddings: {converted} lignes converties')
+
+    logger.info(
+        f'Migration des embeddings terminée: {converted} lignes '
+        f'en {time.time() - start_time:.2f} secondes'
+    )
+    return converted
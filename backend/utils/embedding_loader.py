@@ -1,14 +1,23 @@
+import hashlib
 import logging
+import sqlite3
+import threading
 import time
+from collections import OrderedDict
+from pathlib import Path
 
 import numpy as np
 from sentence_transformers import SentenceTransformer
 
 from backend.config import EMBEDDING_CONFIG
+from backend.utils.embedding_codec import decode_embedding, encode_embedding
+from backend.utils.mock_embeddings import mock_embeddings
 
 logger = logging.getLogger(__name__)
 
 _embedding_model = None
+_embedding_model_name = None
+_embedding_cache = None
 
 
 class MockEmbeddingModel:
@@ -18,18 +27,220 @@ class MockEmbeddingModel:
         """Initialise le modèle factice"""
         self.dimensions = dimensions
 
-    def encode(self, text: str) -> np.ndarray:
-        """Génère un embedding aléatoire pour le texte"""
-        np.random.seed(hash(text) % 2**32)
-        embedding = np.random.normal(0, 1, self.dimensions)
-        norm = np.linalg.norm(embedding)
-        if norm > 0:
-            embedding = embedding / norm
-        return embedding
+    def encode(self, text, **kwargs) -> np.ndarray:
+        """Génère un embedding factice normalisé pour le texte (ou une liste)"""
+        texts = [text] if isinstance(text, str) else list(text)
+        embeddings = mock_embeddings(texts, self.dimensions)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.where(norms > 0, norms, 1)
+        return embeddings[0] if isinstance(text, str) else embeddings
+
+
+class OllamaEmbeddingModel:
+    """Embeddings calculés par Ollama, par lots, via LLMService.get_embeddings"""
+
+    def __init__(self, service, model: str):
+        """Initialise l'adaptateur (aucun appel réseau)"""
+        self.service = service
+        self.model = model
+
+    def encode(self, text, **kwargs) -> np.ndarray:
+        """Encode un texte (ou une liste de textes) ; lève en cas d'échec
+
+        Pas de repli sur des vecteurs factices : ils seraient mis en cache
+        sous le nom du modèle réel.
+        """
+        if isinstance(text, str):
+            return self.service.get_embeddings([text], self.model, fallback=False)[0]
+        return self.service.get_embeddings(list(text), self.model, fallback=False)
+
+    def slot(self, priority):
+        """Créneau de l'ordonnanceur LLM pour un lot (tâches de fond)"""
+        return self.service.scheduler.slot(None, priority)
+
+
+class EmbeddingCache:
+    """Cache d'embeddings à deux niveaux indexé par (modèle, hash du texte)
+
+    Niveau 1 : LRU en mémoire borné en octets. Niveau 2 : base SQLite sous
+    EMBEDDING_CONFIG["cache_dir"], partagée entre processus et redémarrages.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        max_bytes: int = EMBEDDING_CONFIG.get('cache_max_bytes', 64 * 1024 * 1024),
+        path: Path | None = None,
+    ):
+        """Initialise le cache (le fichier disque est ouvert à la demande)"""
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.path = path
+        self._entries: OrderedDict[bytes, np.ndarray] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # La connexion SQLite est protégée à part, hors du verrou du LRU
+        self._disk_lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+    @staticmethod
+    def key(text: str) -> bytes:
+        return hashlib.sha256(text.encode('utf-8')).digest()
+
+    def _disk(self) -> sqlite3.Connection | None:
+        if self.path is None:
+            return None
+        if self._connection is None:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._connection = sqlite3.connect(
+                    str(self.path), check_same_thread=False, timeout=5
+                )
+                self._connection.execute('PRAGMA journal_mode=WAL')
+                self._connection.execute(
+                    'CREATE TABLE IF NOT EXISTS embeddings ('
+                    'model TEXT NOT NULL, hash BLOB NOT NULL, vector BLOB NOT NULL, '
+                    'PRIMARY KEY (model, hash)) WITHOUT ROWID'
+                )
+            except sqlite3.Error as e:
+                logger.warning(f"Cache d'embeddings disque indisponible: {e}")
+                self.path = None
+                return None
+        return self._connection
+
+    def _remember(self, key: bytes, vector: np.ndarray):
+        """Insère dans le LRU mémoire en respectant le budget d'octets"""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+        vector.flags.writeable = False
+        self._entries[key] = vector
+        self._bytes += vector.nbytes + len(key)
+        while self._bytes > self.max_bytes and self._entries:
+            old_key, old_vector = self._entries.popitem(last=False)
+            self._bytes -= old_vector.nbytes + len(old_key)
+
+    def get_many(self, texts: list[str]) -> list[np.ndarray | None]:
+        """Retourne les vecteurs en cache (None pour les absents)
+
+        Le disque est lu hors du verrou du LRU : une lecture SQLite lente ne
+        bloque pas les appels servis depuis la mémoire.
+        """
+        keys = [self.key(text) for text in texts]
+        results: list[np.ndarray | None] = [None] * len(texts)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    results[i] = vector
+                    self.stats['memory_hits'] += 1
+                else:
+                    missing.append(i)
+
+        found: dict[int, np.ndarray] = {}
+        if missing:
+            stored = self._read_disk([keys[i] for i in missing])
+            found = {
+                i: decode_embedding(stored[keys[i]])
+                for i in missing
+                if keys[i] in stored
+            }
+            for i, vector in found.items():
+                results[i] = vector
+
+        with self._lock:
+            for i, vector in found.items():
+                self._remember(keys[i], vector)
+            self.stats['disk_hits'] += len(found)
+            self.stats['misses'] += len(missing) - len(found)
+        return results
+
+    def _read_disk(self, keys: list[bytes]) -> dict[bytes, bytes]:
+        """Vecteurs encodés présents sur disque, indexés par hash"""
+        stored: dict[bytes, bytes] = {}
+        with self._disk_lock:
+            connection = self._disk()
+            if connection is None:
+                return stored
+            try:
+                for start in range(0, len(keys), 500):
+                    chunk = keys[start : start + 500]
+                    placeholders = ','.join('?' * len(chunk))
+                    stored.update(
+                        connection.execute(
+                            'SELECT hash, vector FROM embeddings '
+                            f'WHERE model = ? AND hash IN ({placeholders})',
+                            (self.model_name, *chunk),
+                        ).fetchall()
+                    )
+            except sqlite3.Error as e:
+                logger.warning(f"Lecture du cache d'embeddings impossible: {e}")
+                return {}
+        return stored
+
+    def put_many(self, texts: list[str], vectors: np.ndarray):
+        """Ajoute des vecteurs au cache mémoire et au cache disque"""
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = self.key(text)
+                vector = np.array(vector, dtype=np.float32)
+                self._remember(key, vector)
+                rows.append((self.model_name, key, encode_embedding(vector, 'float32')))
+
+        with self._disk_lock:
+            connection = self._disk()
+            if connection is not None:
+                try:
+                    with connection:
+                        connection.executemany(
+                            'INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)', rows
+                        )
+                except sqlite3.Error as e:
+                    logger.warning(f"Écriture du cache d'embeddings impossible: {e}")
+
+    def info(self) -> dict:
+        """Compteurs de succès/échecs et occupation du cache mémoire"""
+        with self._lock:
+            return {
+                **self.stats,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'model': self.model_name,
+            }
+
+
+def get_embedding_model_name() -> str:
+    """Identité du modèle chargé (clé du cache ; distingue le modèle factice)"""
+    get_embedding_model()
+    return _embedding_model_name
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Retourne le cache d'embeddings du modèle chargé"""
+    global _embedding_cache
+    if _embedding_cache is None:
+        path = None
+        if EMBEDDING_CONFIG.get('cache_persist', True):
+            path = Path(EMBEDDING_CONFIG['cache_dir']) / 'embedding_cache.sqlite'
+        _embedding_cache = EmbeddingCache(get_embedding_model_name(), path=path)
+    return _embedding_cache
 
 
 def get_embedding_model():
-    global _embedding_model
+    global _embedding_model, _embedding_model_name
+    if _embedding_model is None and EMBEDDING_CONFIG.get('backend') == 'ollama':
+        # Import tardif : le package des services importe ce module
+        from backend.services.llm_service import llm_service
+
+        _embedding_model = OllamaEmbeddingModel(
+            llm_service, llm_service.embedding_model
+        )
+        _embedding_model_name = f'ollama:{llm_service.embedding_model}'
+        logger.info(f"Embeddings calculés par Ollama ({_embedding_model_name})")
     if _embedding_model is None:
         try:
             model_name = EMBEDDING_CONFIG["model_name"]
@@ -44,6 +255,7 @@ def get_embedding_model():
                 cache_folder=str(cache_dir),
                 device="cuda" if use_gpu else "cpu",
             )
+            _embedding_model_name = model_name
 
             logger.info(
                 f"Modèle d'embeddings chargé en {time.time() - start_time:.2f} secondes"
@@ -52,5 +264,8 @@ def get_embedding_model():
             logger.error(f"Erreur lors du chargement du modèle d'embeddings: {e}")
             # Création d'un modèle factice pour les tests
             _embedding_model = MockEmbeddingModel(EMBEDDING_CONFIG["dimensions"])
+            # Clé de cache propre au générateur : d'anciens vecteurs factices
+            # (autre générateur) ne sont jamais relus
+            _embedding_model_name = f'mock-shake-{EMBEDDING_CONFIG["dimensions"]}'
             logger.warning("Utilisation d'un modèle d'embeddings factice")
     return _embedding_model
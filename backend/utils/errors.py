@@ -72,6 +72,17 @@ class LLMServiceException(AleziaBaseException):
         )
 
 
+class LLMOverloadedException(LLMServiceException):
+    """Exception levée quand le service LLM refuse une demande par surcharge"""
+
+    def __init__(
+        self, message='Service LLM surchargé', status_code=503, retry_after=1
+    ):
+        super().__init__(message, details={'retry_after': retry_after})
+        self.status_code = status_code  # 429 (utilisateur) ou 503 (service)
+        self.headers = {'Retry-After': str(retry_after)}
+
+
 # Gestionnaires d'exceptions pour FastAPI
 def configure_exception_handlers(app: FastAPI):
     """Configure les gestionnaires d'exceptions pour l'application FastAPI"""
@@ -83,6 +94,7 @@ def configure_exception_handlers(app: FastAPI):
         return JSONResponse(
             status_code=exc.status_code,
             content={'success': False, 'error': exc.message, 'details': exc.details},
+            headers=getattr(exc, 'headers', None),
         )
 
     @app.exception_handler(RequestValidationError)
@@ -0,0 +1,267 @@
+"""
+Client HTTP partagé : pool de connexions keep-alive, délais, relances, latences
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import httpx
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Réponses indiquant un serveur momentanément indisponible
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Attente avant la relance `attempt` : exponentielle, tirée au hasard"""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class LatencyRecorder:
+    """Latences récentes et compteurs d'appels, par route « MÉTHODE /chemin »"""
+
+    def __init__(self, window: int = 256):
+        self._window = window
+        self._latencies: dict[str, deque] = {}
+        self._counters: dict[str, dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def _route(self, route: str) -> dict[str, int]:
+        if route not in self._latencies:
+            self._latencies[route] = deque(maxlen=self._window)
+            self._counters[route] = {'calls': 0, 'errors': 0, 'retries': 0}
+        return self._counters[route]
+
+    def record(self, route: str, seconds: float, error: bool = False):
+        with self._lock:
+            counters = self._route(route)
+            self._latencies[route].append(seconds)
+            counters['calls'] += 1
+            counters['errors'] += int(error)
+
+    def retried(
+        self, route: str, reason: str, attempt: int, max_retries: int, delay: float
+    ):
+        logger.warning(
+            f'{route}: {reason}, nouvelle tentative {attempt}/{max_retries} '
+            f'dans {delay:.2f}s'
+        )
+        with self._lock:
+            self._route(route)['retries'] += 1
+
+    def stats(self) -> dict[str, dict]:
+        """Appels, erreurs, relances et latences (ms) récentes par route
+
+        Pour une réponse en flux, la latence mesurée est celle des en-têtes
+        (le temps d'attente du premier octet), pas celle du flux complet.
+        """
+        with self._lock:
+            snapshot = {
+                route: (np.array(latencies), dict(self._counters[route]))
+                for route, latencies in self._latencies.items()
+                if latencies
+            }
+        return {
+            route: {
+                **counters,
+                'p50_ms': round(float(np.percentile(latencies, 50)) * 1000, 2),
+                'p95_ms': round(float(np.percentile(latencies, 95)) * 1000, 2),
+                'max_ms': round(float(latencies.max()) * 1000, 2),
+            }
+            for route, (latencies, counters) in snapshot.items()
+        }
+
+
+class HttpClient:
+    """Session `requests` partagée, à connexions persistantes
+
+    Chaque appel porte un délai de connexion et un délai de lecture : un
+    serveur bloqué ne retient plus un worker indéfiniment. Les échecs de
+    connexion et les réponses 429/502/503/504 sont relancés au plus
+    `max_retries` fois, après une attente exponentielle tirée au hasard
+    (« full jitter »). Un délai de lecture dépassé n'est pas relancé : la
+    requête a pu être traitée, et la relancer doublerait la charge d'une
+    génération déjà trop lente. La latence de chaque appel est enregistrée
+    par route.
+    """
+
+    def __init__(
+        self,
+        connect_timeout: float = 3.0,
+        read_timeout: float = 120.0,
+        max_retries: int = 2,
+        retry_backoff: float = 0.5,
+        max_backoff: float = 8.0,
+        pool_size: int = 10,
+        latencies: LatencyRecorder | None = None,
+    ):
+        """Initialise la session et son pool de connexions"""
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.latencies = latencies or LatencyRecorder()
+
+    def request(
+        self, method: str, url: str, retries: int | None = None, **kwargs
+    ) -> requests.Response:
+        """Envoie une requête avec délais et relances ; lève l'erreur finale
+
+        `retries` remplace `max_retries` pour cet appel (0 : échec immédiat).
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        max_retries = self.max_retries if retries is None else retries
+        route = f'{method.upper()} {urlsplit(url).path}'
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.ConnectionError as e:  # ConnectTimeout compris
+                self.latencies.record(route, time.perf_counter() - start, error=True)
+                if attempt >= max_retries:
+                    raise
+                reason = type(e).__name__
+            except requests.RequestException:
+                self.latencies.record(route, time.perf_counter() - start, error=True)
+                raise
+            else:
+                self.latencies.record(
+                    route,
+                    time.perf_counter() - start,
+                    error=response.status_code >= 500,
+                )
+                if response.status_code not in RETRY_STATUSES or attempt >= max_retries:
+                    return response
+                reason = f'HTTP {response.status_code}'
+                response.close()
+
+            attempt += 1
+            delay = backoff_delay(attempt, self.retry_backoff, self.max_backoff)
+            self.latencies.retried(route, reason, attempt, max_retries, delay)
+            time.sleep(delay)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def stats(self) -> dict[str, dict]:
+        return self.latencies.stats()
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncHttpClient:
+    """Équivalent asynchrone de `HttpClient`, sur `httpx.AsyncClient`
+
+    Mêmes délais, mêmes relances et mêmes statistiques (un `LatencyRecorder`
+    peut être partagé avec le client synchrone), mais l'attente d'une réponse
+    ne bloque pas la boucle d'événements. Un client httpx est lié à la boucle
+    qui l'utilise : il est créé au premier appel et recréé si la boucle change
+    (tests, scripts successifs).
+    """
+
+    def __init__(
+        self,
+        connect_timeout: float = 3.0,
+        read_timeout: float = 120.0,
+        max_retries: int = 2,
+        retry_backoff: float = 0.5,
+        max_backoff: float = 8.0,
+        pool_size: int = 10,
+        latencies: LatencyRecorder | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        """Initialise la configuration ; le client httpx est créé à la demande"""
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=pool_size, max_keepalive_connections=pool_size
+        )
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self.latencies = latencies or LatencyRecorder()
+        self.transport = transport
+        self._client: httpx.AsyncClient | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop or self._client.is_closed:
+            # L'ancien client appartient à une boucle terminée : il est abandonné
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout, limits=self.limits, transport=self.transport
+            )
+            self._loop = loop
+        return self._client
+
+    async def request(
+        self, method: str, url: str, retries: int | None = None, **kwargs
+    ) -> httpx.Response:
+        """Envoie une requête avec délais et relances ; lève l'erreur finale
+
+        Seuls les échecs de connexion et les statuts 429/502/503/504 sont
+        relancés, comme pour `HttpClient`.
+        """
+        max_retries = self.max_retries if retries is None else retries
+        route = f'{method.upper()} {urlsplit(url).path}'
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                self.latencies.record(route, time.perf_counter() - start, error=True)
+                if attempt >= max_retries:
+                    raise
+                reason = type(e).__name__
+            except httpx.HTTPError:
+                self.latencies.record(route, time.perf_counter() - start, error=True)
+                raise
+            else:
+                self.latencies.record(
+                    route,
+                    time.perf_counter() - start,
+                    error=response.status_code >= 500,
+                )
+                if response.status_code not in RETRY_STATUSES or attempt >= max_retries:
+                    return response
+                reason = f'HTTP {response.status_code}'
+
+            attempt += 1
+            delay = backoff_delay(attempt, self.retry_backoff, self.max_backoff)
+            self.latencies.retried(route, reason, attempt, max_retries, delay)
+            await asyncio.sleep(delay)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request('POST', url, **kwargs)
+
+    def stats(self) -> dict[str, dict]:
+        return self.latencies.stats()
+
+    async def aclose(self):
+        if self._client is not None and self._loop is asyncio.get_running_loop():
+            await self._client.aclose()
+        self._client = None
@@ -0,0 +1,21 @@
+"""
+Vecteurs factices déterministes, partagés par les replis sans modèle réel
+"""
+
+import hashlib
+
+import numpy as np
+
+
+def mock_embeddings(texts: list[str], dimensions: int) -> np.ndarray:
+    """Vecteurs factices dans [-1, 1], identiques d'un processus à l'autre
+
+    Chaque texte est étendu en 2 octets par dimension par SHAKE-256 ; le lot
+    entier est ensuite converti en une seule opération NumPy. Retourne une
+    matrice float32 (len(texts), dimensions).
+    """
+    raw = b''.join(
+        hashlib.shake_256(text.encode('utf-8')).digest(2 * dimensions) for text in texts
+    )
+    values = np.frombuffer(raw, dtype='<u2').reshape(len(texts), dimensions)
+    return values.astype(np.float32) / np.float32(32767.5) - np.float32(1.0)
@@ -0,0 +1,75 @@
+"""
+Benchmark rappel / latence de l'index approché (IVF) face à la recherche exacte
+
+Usage : python benchmarks/bench_ann.py [--sizes 10000 50000 100000]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from backend.services.ann_index import IVFIndex  # noqa: E402
+from backend.services.memory_index import CharacterMemoryIndex  # noqa: E402
+
+
+def synthetic_memories(n, dimensions, seed=0):
+    """Embeddings regroupés en thèmes, comme un historique de conversations"""
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(max(8, n // 500), dimensions))
+    labels = rng.integers(0, len(topics), n)
+    noise = rng.normal(scale=0.6, size=(n, dimensions))
+    return (topics[labels] + noise).astype(np.float32)
+
+
+def timed_search(index, queries, k):
+    results, start = [], time.perf_counter()
+    for query in queries:
+        results.append(set(index.search(query, k)[0].tolist()))
+    return results, (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000, 100000])
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[4, 8, 16, 32])
+    parser.add_argument('--dimensions', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('-k', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f'{"taille":>8} {"mode":>12} {"ms/requête":>11} {"rappel@k":>9}')
+    for size in args.sizes:
+        vectors = synthetic_memories(size, args.dimensions)
+        rng = np.random.default_rng(1)
+        queries = vectors[rng.choice(size, args.queries)] + rng.normal(
+            scale=0.3, size=(args.queries, args.dimensions)
+        ).astype(np.float32)
+
+        exact = CharacterMemoryIndex(args.dimensions)
+        exact.add(np.arange(size), vectors)
+        truth, exact_ms = timed_search(exact, queries, args.k)
+        print(f'{size:>8} {"exact":>12} {exact_ms:>11.3f} {1.0:>9.3f}')
+
+        approx = CharacterMemoryIndex(args.dimensions)
+        approx.ann = IVFIndex(args.dimensions, min_size=0)
+        approx.add(np.arange(size), vectors)
+        start = time.perf_counter()
+        approx.ann.train(approx.ids, approx.vectors)
+        train_s = time.perf_counter() - start
+
+        for nprobe in args.nprobe:
+            approx.ann.nprobe = nprobe
+            found, approx_ms = timed_search(approx, queries, args.k)
+            recall = np.mean([len(f & t) / args.k for f, t in zip(found, truth)])
+            label = f'ivf/{nprobe}'
+            print(f'{size:>8} {label:>12} {approx_ms:>11.3f} {recall:>9.3f}')
+        print(f'{"":>8} entraînement IVF : {train_s:.2f} s')
+
+
+if __name__ == '__main__':
+    main()
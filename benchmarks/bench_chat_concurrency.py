@@ -0,0 +1,143 @@
+"""
+Benchmark de concurrence du chat : appel bloquant dans la boucle face au chemin async
+
+Un faux serveur Ollama répond après `--delay` secondes. Pour chaque niveau de
+concurrence, N messages sont envoyés en parallèle depuis une même boucle
+d'événements, d'abord par l'ancien chemin (send_message appelé directement
+dans une coroutine, comme le faisait la route), puis par asend_message. Un
+battement de 10 ms mesure la réactivité de la boucle pendant ce temps : c'est
+le délai que subirait une requête /health servie par le même worker.
+
+Usage : python benchmarks/bench_chat_concurrency.py [--concurrency 1 8 32]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import backend.services.chat_service as cs  # noqa: E402
+from backend import models  # noqa: E402, F401
+from backend.database import Base  # noqa: E402
+from backend.models.character import CharacterModel  # noqa: E402
+from backend.services.llm_service import llm_service  # noqa: E402
+from backend.services.memory_pipeline import memory_pipeline  # noqa: E402
+
+
+def fake_ollama(delay):
+    """Serveur HTTP répondant à /api/generate après `delay` secondes"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(delay)
+            body = json.dumps({'response': 'Bonjour, voyageur.'}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def temporary_database(directory):
+    engine = create_engine(
+        f'sqlite:///{Path(directory) / "bench.db"}',
+        connect_args={'check_same_thread': False},
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    db = factory()
+    db.add(
+        CharacterModel(
+            id=1,
+            name='Testeur',
+            description='Un personnage de banc d’essai.',
+            personality='Calme et curieux.',
+        )
+    )
+    db.commit()
+    db.close()
+    return factory
+
+
+async def run(send, session_ids):
+    """Envoie un message par session en parallèle ; durée totale et retards"""
+    lags = []
+
+    async def heartbeat():
+        while True:
+            tick = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lags.append(time.perf_counter() - tick - 0.01)
+
+    beat = asyncio.create_task(heartbeat())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await asyncio.gather(*(send(sid) for sid in session_ids))
+    elapsed = time.perf_counter() - start
+    # Laisser le battement en attente se réveiller : son retard est mesuré
+    await asyncio.sleep(0.02)
+    beat.cancel()
+    return elapsed, np.array(lags or [0.0]) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--delay', type=float, default=0.5)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    server = fake_ollama(args.delay)
+    llm_service.api_url = f'http://127.0.0.1:{server.server_port}/api'
+    llm_service.mock_mode = False
+
+    async def blocking(session_id):
+        return cs.chat_service.send_message(session_id, 'Bonjour')
+
+    async def non_blocking(session_id):
+        return await cs.chat_service.asend_message(session_id, 'Bonjour')
+
+    with tempfile.TemporaryDirectory() as directory:
+        cs.SessionLocal = temporary_database(directory)
+        print(
+            f'{"N":>4} {"chemin":>10} {"total s":>8} {"msg/s":>7} '
+            f'{"retard p50 ms":>14} {"retard max ms":>14}'
+        )
+        for n in args.concurrency:
+            for label, send in (('bloquant', blocking), ('async', non_blocking)):
+                session_ids = [
+                    cs.chat_service.create_session('bench', 1)['id'] for _ in range(n)
+                ]
+                elapsed, lags = asyncio.run(run(send, session_ids))
+                print(
+                    f'{n:>4} {label:>10} {elapsed:>8.2f} {n / elapsed:>7.1f} '
+                    f'{np.percentile(lags, 50):>14.1f} {lags.max():>14.1f}'
+                )
+                memory_pipeline.drain(timeout=120)
+        memory_pipeline.stop()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
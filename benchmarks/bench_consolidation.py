@@ -0,0 +1,57 @@
+"""
+Benchmark de la recherche de groupes de mémoires quasi identiques
+
+Usage : python benchmarks/bench_consolidation.py [--sizes 10000 50000 100000]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from backend.services.memory_consolidation import MemoryConsolidator  # noqa: E402
+
+MEMORY_TYPES = ['conversation', 'observation', 'reflection', 'fact']
+
+
+def synthetic_history(n, dimensions, duplicate_rate, seed=0):
+    """Historique aléatoire dont une fraction est reformulée (quasi-doublons)"""
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dimensions)).astype(np.float32)
+    duplicates = rng.choice(n, int(n * duplicate_rate), replace=False)
+    sources = rng.integers(0, n, len(duplicates))
+    vectors[duplicates] = vectors[sources] + rng.normal(
+        scale=0.05, size=(len(duplicates), dimensions)
+    )
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    types = rng.choice(MEMORY_TYPES, n)
+    types[duplicates] = types[sources]
+    return vectors, types
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000, 100000])
+    parser.add_argument('--dimensions', type=int, default=384)
+    parser.add_argument('--duplicates', type=float, default=0.05)
+    parser.add_argument('--threshold', type=float, default=0.85)
+    parser.add_argument('--block-size', type=int, default=1024)
+    args = parser.parse_args()
+
+    consolidator = MemoryConsolidator(block_size=args.block_size)
+    print(f'{"taille":>8} {"paires":>8} {"groupes":>8} {"max":>5} {"secondes":>9}')
+    for size in args.sizes:
+        vectors, types = synthetic_history(size, args.dimensions, args.duplicates)
+        start = time.perf_counter()
+        clusters, pairs = consolidator.find_clusters(vectors, types, args.threshold)
+        elapsed = time.perf_counter() - start
+        largest = max((len(c) for c in clusters), default=0)
+        print(f'{size:>8} {pairs:>8} {len(clusters):>8} {largest:>5} {elapsed:>9.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark de l'extraction de faits sur un corpus de conversation synthétique
+
+Compare l'ancien balayage (un `re.findall` par motif) au balayage combiné,
+vérifie qu'ils trouvent les mêmes faits, puis mesure le stockage groupé.
+
+Usage : python benchmarks/bench_fact_extraction.py [--messages 20000]
+"""
+
+import argparse
+import random
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from backend import models  # noqa: E402, F401
+from backend.database import Base  # noqa: E402
+from backend.models.character import CharacterModel  # noqa: E402
+from backend.services.fact_extraction import FACT_RULES, FactExtractor  # noqa: E402
+
+FIRST_NAMES = ['Marie', 'Louis', 'Camille', 'Hugo', 'Chloé', 'Jules', 'Emma']
+PLACES = ['Lyon', 'Paris', 'Marseille', 'Nantes', 'Bordeaux', 'Lille']
+THINGS = ['chocolat', 'jazz', 'cinema', 'montagne', 'lecture', 'pluie', 'mer']
+JOBS = ['boulanger', 'infirmier', 'professeur', 'pilote', 'developpeur']
+FILLER = [
+    'Tu sais, la journée a été longue.',
+    "Qu'est-ce que tu en penses ?",
+    'Je ne sais pas trop quoi répondre.',
+    'Raconte-moi encore une histoire.',
+    "C'était vraiment une belle soirée hier soir.",
+    'On pourrait se promener demain matin.',
+]
+
+
+def synthetic_message(rng):
+    """Message d'utilisateur mêlant phrases banales et informations personnelles"""
+    sentences = rng.sample(FILLER, 2)
+    templates = [
+        lambda: f"Je m'appelle {rng.choice(FIRST_NAMES)}.",
+        lambda: f"J'ai {rng.randint(18, 80)} ans.",
+        lambda: f'Je suis un {rng.choice(JOBS)}.',
+        lambda: f"J'habite à {rng.choice(PLACES)}.",
+        lambda: f"J'aime le {rng.choice(THINGS)}.",
+        lambda: f'Je déteste la {rng.choice(THINGS)}.',
+        lambda: f'Je travaille comme {rng.choice(JOBS)}.',
+        lambda: f'Ma passion est la {rng.choice(THINGS)}.',
+        lambda: f'Le {rng.choice(THINGS)} me rend heureux.',
+    ]
+    sentences += [template() for template in rng.sample(templates, 2)]
+    rng.shuffle(sentences)
+    return ' '.join(sentences)
+
+
+def legacy_scan(content):
+    """Ancienne boucle : un findall par motif sur le texte complet"""
+    found = set()
+    content = content.lower()
+    for rule in FACT_RULES:
+        pattern = re.sub(r'\(\?P<\w+>', '(', rule.pattern)
+        for match in re.findall(pattern, content, re.IGNORECASE):
+            values = match if isinstance(match, tuple) else (match,)
+            names = re.findall(r'\(\?P<(\w+)>', rule.pattern)
+            groups = dict(zip(names, (v.strip() for v in values)))
+            templates = (rule.subject, rule.predicate, rule.object)
+            fact = tuple(t.format(**groups).strip() for t in templates)
+            if not any('{' in t and len(v) <= 1 for t, v in zip(templates, fact)):
+                found.add(fact)
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    corpus = [synthetic_message(rng) for _ in range(args.messages)]
+    extractor = FactExtractor()
+
+    start = time.perf_counter()
+    legacy = [legacy_scan(message) for message in corpus]
+    legacy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    combined = [extractor.scan(message) for message in corpus]
+    combined_s = time.perf_counter() - start
+
+    mismatches = sum(
+        {fact[:3] for fact in facts} != expected
+        for facts, expected in zip(combined, legacy)
+    )
+    print(f'{"balayage":>12} {"messages/s":>11}')
+    print(f'{"findall x13":>12} {args.messages / legacy_s:>11.0f}')
+    print(f'{"combiné":>12} {args.messages / combined_s:>11.0f}')
+    print(f'écarts de résultats : {mismatches}')
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f'sqlite:///{Path(directory) / "bench.db"}')
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        db.add(CharacterModel(id=1, name='Banc', description='', personality=''))
+        db.commit()
+
+        start = time.perf_counter()
+        for memory_id, facts in enumerate(combined, start=1):
+            extractor.store(db, 1, ((memory_id, fact) for fact in facts))
+        store_s = time.perf_counter() - start
+        db.close()
+    print(
+        f'stockage (une transaction par message) : {args.messages / store_s:.0f} messages/s'
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark mémoire / latence / classement de l'index int8 face à l'index float32
+
+Usage : python benchmarks/bench_quantization.py [--sizes 10000 50000 100000]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from backend.services.memory_index import CharacterMemoryIndex  # noqa: E402
+from backend.services.memory_scoring import RelevanceScorer  # noqa: E402
+
+
+def synthetic_memories(n, dimensions, seed=0):
+    """Embeddings regroupés en thèmes, comme un historique de conversations"""
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(max(8, n // 500), dimensions))
+    labels = rng.integers(0, len(topics), n)
+    noise = rng.normal(scale=0.6, size=(n, dimensions))
+    return (topics[labels] + noise).astype(np.float32)
+
+
+def build(vectors, created_at, importance, **options):
+    index = CharacterMemoryIndex(vectors.shape[1], capacity=len(vectors), **options)
+    index.add(
+        np.arange(len(vectors)), vectors, created_at=created_at, importance=importance
+    )
+    return index
+
+
+def timed_rank(index, queries, k):
+    scorer = RelevanceScorer()
+    results, start = [], time.perf_counter()
+    for query in queries:
+        results.append([m.memory_id for m in scorer.rank(index, query, k)])
+    return results, (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000, 100000])
+    parser.add_argument('--rescore', type=int, nargs='+', default=[0, 50, 200, 500])
+    parser.add_argument('--dimensions', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('-k', type=int, default=10)
+    args = parser.parse_args()
+
+    print(
+        f'{"taille":>8} {"mode":>12} {"Mo":>8} {"ms/requête":>11} '
+        f'{"rappel@k":>9} {"ordre exact":>12}'
+    )
+    for size in args.sizes:
+        vectors = synthetic_memories(size, args.dimensions)
+        rng = np.random.default_rng(1)
+        queries = vectors[rng.choice(size, args.queries)] + rng.normal(
+            scale=0.3, size=(args.queries, args.dimensions)
+        ).astype(np.float32)
+        # Récence et importance variées : le classement ne dépend pas que du cosinus
+        created_at = time.time() - rng.uniform(0, 365 * 86400, size)
+        importance = rng.uniform(0.5, 9, size)
+
+        exact = build(vectors, created_at, importance)
+        truth, exact_ms = timed_rank(exact, queries, args.k)
+        print(
+            f'{size:>8} {"float32":>12} {exact.nbytes / 2**20:>8.1f} '
+            f'{exact_ms:>11.3f} {1.0:>9.3f} {1.0:>12.3f}'
+        )
+
+        # Rescoring sur les vecteurs float32 (en production : relus en base)
+        by_id = dict(enumerate(vectors))
+        for rescore in args.rescore:
+            quantized = build(
+                vectors, created_at, importance, quantization='int8', rescore=rescore
+            )
+            if rescore:
+                quantized.exact_loader = lambda ids: {i: by_id[i] for i in ids}
+            found, ms = timed_rank(quantized, queries, args.k)
+            recall = np.mean(
+                [len(set(f) & set(t)) / args.k for f, t in zip(found, truth)]
+            )
+            same_order = np.mean([f == t for f, t in zip(found, truth)])
+            label = f'int8/{rescore}' if rescore else 'int8 seul'
+            print(
+                f'{size:>8} {label:>12} {quantized.nbytes / 2**20:>8.1f} '
+                f'{ms:>11.3f} {recall:>9.3f} {same_order:>12.3f}'
+            )
+
+
+if __name__ == '__main__':
+    main()
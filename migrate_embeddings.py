@@ -0,0 +1,24 @@
+"""
+Migration des embeddings de la table memories : texte JSON -> BLOB binaire.
+Idempotente : seules les lignes encore au format JSON sont converties.
+"""
+
+import argparse
+
+from backend.database import engine
+from backend.utils.embedding_codec import migrate_json_embeddings
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('--batch-size', type=int, default=500)
+parser.add_argument('--dtype', choices=['float32', 'float16'], default=None)
+args = parser.parse_args()
+
+print('Migration des embeddings vers le format binaire...')
+count = migrate_json_embeddings(engine, batch_size=args.batch_size, dtype=args.dtype)
+print(f'{count} embeddings convertis.')
+
+if count:
+    # Récupérer l'espace libéré par l'ancien format texte
+    with engine.connect() as connection:
+        connection.exec_driver_sql('VACUUM')
+    print('Base compactée (VACUUM).')
@@ -0,0 +1,167 @@
+"""Tests du tampon d'accès aux mémoires (écriture différée)."""
+
+import time
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base
+from backend.models.character import CharacterModel
+from backend.models.memory import MemoryModel
+from backend.services.access_tracker import AccessTracker
+
+
+@pytest.fixture
+def session(tmp_path):
+    from backend import models  # noqa: F401  (enregistre les tables)
+
+    engine = create_engine(
+        f'sqlite:///{tmp_path / "test.db"}', connect_args={'check_same_thread': False}
+    )
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add(
+        CharacterModel(
+            id=1,
+            name='Testeur',
+            description='Un personnage de test pour les tests unitaires.',
+            personality='Calme et curieux.',
+        )
+    )
+    for memory_id, access_count in ((1, 0), (2, 4)):
+        db.add(
+            MemoryModel(
+                id=memory_id,
+                character_id=1,
+                type='conversation',
+                content=f'Mémoire {memory_id}',
+                importance=2.0,
+                access_count=access_count,
+                embedding=np.ones(4, dtype=np.float32),
+            )
+        )
+    db.commit()
+    yield db
+    db.close()
+
+
+def test_accesses_are_buffered_then_flushed_in_bulk(session):
+    tracker = AccessTracker(flush_interval=3600, max_pending=1000)
+
+    tracker.record(session, 1, [1, 2])
+    tracker.record(session, 1, [2, 2])
+
+    # Rien n'est écrit avant le vidage
+    session.expire_all()
+    assert session.get(MemoryModel, 2).access_count == 4
+    assert tracker.pending_count() == 2
+
+    assert tracker.flush() == 2
+    session.expire_all()
+    first, second = session.get(MemoryModel, 1), session.get(MemoryModel, 2)
+    assert first.access_count == 1 and first.last_accessed is not None
+    assert first.importance == 2.0
+    # Les 6e et 7e accès ajoutent chacun un bonus de 5 % d'importance
+    assert second.access_count == 7
+    assert second.importance == pytest.approx(2.0 * 1.05**2)
+    assert tracker.pending_count() == 0
+    tracker.close()
+
+
+def test_size_threshold_triggers_background_flush(session):
+    tracker = AccessTracker(flush_interval=3600, max_pending=2)
+
+    tracker.record(session, 1, [1, 2])
+    deadline = time.monotonic() + 2
+    while tracker.stats['rows_written'] < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert tracker.stats['rows_written'] == 2
+    session.expire_all()
+    assert session.get(MemoryModel, 1).access_count == 1
+    tracker.close()
+
+
+def test_index_and_database_apply_the_same_importance_boost(session):
+    from backend.services.memory_index import CharacterMemoryIndex
+
+    index = CharacterMemoryIndex(dimensions=4)
+    index.add([2], np.ones((1, 4)), importance=2.0, access_count=4)
+
+    class _Registry:
+        def peek(self, db, character_id):
+            return index
+
+    tracker = AccessTracker(flush_interval=3600, max_pending=1000)
+    tracker.index = _Registry()
+    for _ in range(7):
+        tracker.record(session, 1, [2])
+    tracker.record(session, 1, [2, 2])
+
+    tracker.flush()
+    session.expire_all()
+    memory = session.get(MemoryModel, 2)
+    row = index.position(2)
+    assert memory.access_count == index.attribute('access_count')[row] == 13
+    # Accès 6 à 9 : +5 % chacun ; accès 10 à 13 : +10 % chacun
+    assert memory.importance == pytest.approx(2.0 * 1.05**4 * 1.10**4)
+    assert index.attribute('importance')[row] == pytest.approx(memory.importance)
+    tracker.close()
+
+
+def test_failed_flush_is_retried_with_later_accesses(session, monkeypatch):
+    tracker = AccessTracker(flush_interval=3600, max_pending=1000)
+    tracker.record(session, 1, [1, 2])
+
+    statement = tracker._statement
+    monkeypatch.setattr(tracker, '_statement', 'UPDATE table_absente SET x = 1')
+    assert tracker.flush() == 0
+    assert tracker.pending_count() == 2
+
+    tracker.record(session, 1, [2])
+    monkeypatch.setattr(tracker, '_statement', statement)
+    assert tracker.flush() == 2
+    session.expire_all()
+    assert session.get(MemoryModel, 1).access_count == 1
+    assert session.get(MemoryModel, 2).access_count == 6
+    tracker.close()
+
+
+def test_boost_does_not_depend_on_flush_frequency(session):
+    tracker = AccessTracker(flush_interval=3600, max_pending=1000)
+    for _ in range(9):
+        tracker.record(session, 1, [2])
+        tracker.flush()
+    session.expire_all()
+    flushed_each_time = session.get(MemoryModel, 2).importance
+
+    session.get(MemoryModel, 1).access_count = 4
+    session.commit()
+    tracker.record(session, 1, [1] * 9)
+    tracker.flush()
+    session.expire_all()
+    assert session.get(MemoryModel, 1).importance == pytest.approx(flushed_each_time)
+    assert flushed_each_time == pytest.approx(2.0 * 1.05**4 * 1.10**4)
+    tracker.close()
+
+
+def test_pending_accesses_follow_consolidation_and_block_archiving(session):
+    from backend.services.memory_archive import MemoryArchiver
+
+    tracker = AccessTracker(flush_interval=3600, max_pending=1000)
+    tracker.record(session, 1, [1, 1, 2])
+    archiver = MemoryArchiver(importance_threshold=10.0, min_age_days=0)
+    archiver.access_tracker = tracker
+    assert archiver.cold_memory_ids(session, 1) == []
+
+    # La mémoire 1 est absorbée par la 2 : ses accès lui sont reportés
+    session.query(MemoryModel).filter_by(id=1).delete()
+    session.commit()
+    tracker.redirect(session, 1, {1: 2})
+    assert tracker.pending_ids(session) == {2}
+    assert tracker.flush() == 1
+    session.expire_all()
+    assert session.get(MemoryModel, 2).access_count == 7
+    tracker.close()
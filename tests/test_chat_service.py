@@ -1,7 +1,12 @@
 """Round-trip du service de chat sur une base temporaire isolée."""
 
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
 from backend.database import Base
@@ -37,7 +42,12 @@ def chat_service_isolated(tmp_path, monkeypatch):
 
     # Router toutes les sessions de chat_service vers la base temporaire.
     monkeypatch.setattr(cs, "SessionLocal", test_sessionmaker)
-    return cs.chat_service, test_sessionmaker
+    yield cs.chat_service, test_sessionmaker
+
+    # Laisser le pipeline de mémorisation finir avant la suppression de la base
+    from backend.services.memory_pipeline import memory_pipeline
+
+    memory_pipeline.drain(timeout=30)
 
 
 def test_create_session_and_send_message_roundtrip(chat_service_isolated):
@@ -57,9 +67,217 @@ def test_create_session_and_send_message_roundtrip(chat_service_isolated):
     assert "user" in senders and "assistant" in senders
 
     # Vérifier qu'une mémoire a bien été persistée pour ce personnage
+    # (la mémorisation se fait en arrière-plan après la réponse)
+    from backend.services.memory_pipeline import memory_pipeline
+
+    assert memory_pipeline.drain(timeout=30)
     session_db = test_sessionmaker()
     try:
         count = session_db.query(MemoryModel).filter_by(character_id=999).count()
         assert count >= 1, f"Aucune mémoire persistée pour character_id=999 (count={count})"
     finally:
         session_db.close()
+
+
+def test_async_send_message_keeps_event_loop_responsive(chat_service_isolated):
+    chat, _ = chat_service_isolated
+    session = chat.create_session(user_id="u1", character_id=999, context=None)
+
+    async def scenario():
+        # Un « battement » toutes les 10 ms : un appel bloquant le ferait
+        # attendre toute la durée de la génération simulée (0,5 s)
+        lags = []
+
+        async def heartbeat():
+            while True:
+                tick = time.perf_counter()
+                await asyncio.sleep(0.01)
+                lags.append(time.perf_counter() - tick - 0.01)
+
+        beat = asyncio.create_task(heartbeat())
+        try:
+            response = await chat.asend_message(session["id"], "Bonjour")
+        finally:
+            beat.cancel()
+        return response, lags
+
+    response, lags = asyncio.run(scenario())
+    assert response["sender"] == "assistant" and response["content"]
+    assert len(lags) > 10 and max(lags) < 0.25
+
+    messages = chat.get_session_messages(session["id"])
+    assert [m["sender"] for m in messages] == ["user", "assistant"]
+
+    with pytest.raises(ValueError):
+        asyncio.run(chat.asend_message("inconnue", "Bonjour"))
+
+
+def test_async_send_message_runs_no_sql_on_the_event_loop(
+    chat_service_isolated, monkeypatch
+):
+    import backend.services.chat_service as cs
+
+    chat, sessionmaker_ = chat_service_isolated
+    session = chat.create_session(user_id="u1", character_id=999, context=None)
+    threads = []
+
+    def record_thread(*args):
+        threads.append(threading.get_ident())
+
+    async def fake_agenerate_text(prompt, on_done=None, **kwargs):
+        on_done({"context": [1, 2, 3], "prompt_eval_count": 5})
+        return "Réponse"
+
+    monkeypatch.setattr(cs.llm_service, "agenerate_text", fake_agenerate_text)
+    engine = sessionmaker_.kw["bind"]
+    event.listen(engine, "before_cursor_execute", record_thread)
+    try:
+        response = asyncio.run(chat.asend_message(session["id"], "Bonjour"))
+    finally:
+        event.remove(engine, "before_cursor_execute", record_thread)
+
+    assert response["metadata"]["context_reused"] is False
+    # asyncio.run tourne dans ce thread : aucune requête SQL n'y a eu lieu
+    assert threads and threading.get_ident() not in threads
+
+
+def test_stream_message_persists_reply_when_done(chat_service_isolated):
+    chat, _ = chat_service_isolated
+    session = chat.create_session(user_id="u1", character_id=999, context=None)
+
+    events = list(chat.stream_message(session["id"], "Bonjour"))
+    tokens = [e["data"]["content"] for e in events if e["event"] == "token"]
+    assert events[-1]["event"] == "done"
+    done = events[-1]["data"]
+    assert tokens and "".join(tokens) == done["content"]
+    assert done["metadata"]["time_to_first_token"] is not None
+
+    messages = chat.get_session_messages(session["id"])
+    assert [m["sender"] for m in messages] == ["user", "assistant"]
+    assert messages[-1]["content"] == done["content"]
+
+
+def test_stream_message_unknown_session_raises(chat_service_isolated):
+    chat, _ = chat_service_isolated
+    with pytest.raises(ValueError):
+        chat.stream_message("inconnue", "Bonjour")
+
+
+def test_stream_route_sends_server_sent_events(chat_service_isolated):
+    from fastapi.testclient import TestClient
+
+    from backend.app import app
+
+    chat, _ = chat_service_isolated
+    session = chat.create_session(user_id="u1", character_id=999, context=None)
+    client = TestClient(app)
+
+    response = client.post(
+        "/api/chat/message/stream",
+        json={"session_id": session["id"], "content": "Bonjour"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [
+        block.split("\n")[0].removeprefix("event: ")
+        for block in response.text.strip().split("\n\n")
+    ]
+    assert events[0] == "token" and events[-1] == "done"
+
+    missing = client.post(
+        "/api/chat/message/stream", json={"session_id": "inconnue", "content": "x"}
+    )
+    assert missing.status_code == 404
+
+
+def test_second_turn_sends_only_the_new_message_with_context(
+    chat_service_isolated, monkeypatch
+):
+    import backend.services.chat_service as cs
+
+    chat, _ = chat_service_isolated
+    session = chat.create_session(user_id="u1", character_id=999, context=None)
+    calls = []
+    retrieved = [["Alice aime le thé", "Alice habite Lyon"]]
+    facts = [
+        SimpleNamespace(subject="Alice", predicate="a", object="un chat", confidence=0.9)
+    ]
+
+    def fake_generate_text(prompt, on_done=None, **kwargs):
+        calls.append({"prompt": prompt, **kwargs})
+        turn = len(calls)
+        on_done({"context": list(range(turn * 10)), "prompt_eval_count": 5})
+        return f"Réponse {turn}"
+
+    def fake_relevant(db, character_id, query, **kwargs):
+        return [
+            SimpleNamespace(memory=SimpleNamespace(content=content))
+            for content in retrieved[-1]
+        ]
+
+    monkeypatch.setattr(cs.llm_service, "generate_text", fake_generate_text)
+    monkeypatch.setattr(chat.memory_manager, "get_relevant_memories", fake_relevant)
+    monkeypatch.setattr(chat.memory_manager, "get_facts", lambda db, cid: facts)
+
+    first = chat.send_message(session["id"], "Bonjour")
+    retrieved.append(["Alice habite Lyon", "Alice part en vacances demain"])
+    second = chat.send_message(session["id"], "Et toi ?")
+
+    assert "context" not in calls[0] and calls[0]["system_prompt"]
+    assert "- Alice aime le thé\n- Alice habite Lyon" in calls[0]["prompt"]
+    assert "- Alice a un chat" in calls[0]["prompt"]
+    # Tour 2 : seule la mémoire absente du contexte accompagne le message
+    assert calls[1]["context"] == list(range(10))
+    assert calls[1]["prompt"] == (
+        "# RELEVANT MEMORIES:\n- Alice part en vacances demain\n\n"
+        "User: Et toi ?\nAssistant: "
+    )
+    assert "system_prompt" not in calls[1]
+    assert first["metadata"]["context_reused"] is False
+    assert second["metadata"]["context_reused"] is True
+
+    # Rien de nouveau : le tour part seul
+    chat.send_message(session["id"], "Vraiment ?")
+    assert calls[2]["prompt"] == "User: Vraiment ?\nAssistant: "
+
+    # Une génération sans réponse du modèle abandonne le contexte
+    monkeypatch.setattr(
+        cs.llm_service, "generate_text", lambda prompt, **kwargs: "Repli"
+    )
+    chat.send_message(session["id"], "Encore ?")
+    monkeypatch.setattr(cs.llm_service, "generate_text", fake_generate_text)
+    chat.send_message(session["id"], "Tu es là ?")
+    assert "context" not in calls[-1]
+
+
+def test_full_reused_context_skips_memory_retrieval(
+    chat_service_isolated, monkeypatch
+):
+    import backend.services.chat_service as cs
+    from backend.services.prompt_builder import count_tokens, format_turn
+
+    chat, _ = chat_service_isolated
+    session = chat.create_session(user_id="u1", character_id=999, context=None)
+    calls, searches = [], []
+    # Contexte qui remplit la fenêtre : seuls le tour et la réponse y tiennent
+    cache = cs.session_contexts
+    full = cache.max_tokens - cache.headroom - count_tokens(format_turn("Et toi ?"))
+
+    def fake_generate_text(prompt, on_done=None, **kwargs):
+        calls.append({"prompt": prompt, **kwargs})
+        on_done({"context": list(range(full)), "prompt_eval_count": 5})
+        return "Réponse"
+
+    def fake_relevant(db, character_id, query, **kwargs):
+        searches.append(query)
+        return []
+
+    monkeypatch.setattr(cs.llm_service, "generate_text", fake_generate_text)
+    monkeypatch.setattr(chat.memory_manager, "get_relevant_memories", fake_relevant)
+
+    chat.send_message(session["id"], "Bonjour")
+    second = chat.send_message(session["id"], "Et toi ?")
+
+    assert second["metadata"]["context_reused"] is True
+    assert calls[1]["prompt"] == "User: Et toi ?\nAssistant: "
+    assert searches == ["Bonjour"]
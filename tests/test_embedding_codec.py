@@ -0,0 +1,75 @@
+"""Tests du format binaire des embeddings et de la migration depuis JSON."""
+
+import json
+
+import numpy as np
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base
+from backend.models.character import CharacterModel
+from backend.models.memory import MemoryModel
+from backend.utils.embedding_codec import (
+    decode_embedding,
+    encode_embedding,
+    migrate_json_embeddings,
+)
+
+
+def test_roundtrip_float32_is_zero_copy():
+    vector = np.linspace(-1, 1, 384).astype(np.float32)
+    blob = encode_embedding(vector, 'float32')
+
+    assert len(blob) == 4 + 384 * 4
+    decoded = decode_embedding(blob)
+    assert decoded.dtype == np.float32
+    assert not decoded.flags.owndata  # vue sur le buffer, pas de copie
+    assert np.array_equal(decoded, vector)
+
+
+def test_roundtrip_float16_halves_size():
+    vector = np.linspace(-1, 1, 384)
+    decoded = decode_embedding(encode_embedding(vector, 'float16'))
+
+    assert decoded.dtype == np.float16
+    assert np.allclose(decoded, vector, atol=1e-3)
+
+
+def test_legacy_json_is_still_readable():
+    assert np.allclose(decode_embedding('[0.5, -0.25]'), [0.5, -0.25])
+    assert decode_embedding('null') is None
+    assert decode_embedding(None) is None
+
+
+def test_migration_converts_json_rows(tmp_path):
+    from backend import models  # noqa: F401  (enregistre toutes les tables)
+
+    engine = create_engine(f'sqlite:///{tmp_path / "t.db"}')
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add(CharacterModel(id=1, name='Perso', description='d', personality='p'))
+    db.commit()
+
+    legacy = [[float(i), 1.0, -1.0] for i in range(7)]
+    with engine.begin() as connection:
+        for i, vector in enumerate(legacy, start=1):
+            connection.execute(
+                text(
+                    'INSERT INTO memories (id, character_id, type, content, '
+                    "embedding, created_at) VALUES (:id, 1, 'event', 'x', :e, "
+                    "'2024-01-01 00:00:00')"
+                ),
+                {'id': i, 'e': json.dumps(vector)},
+            )
+
+    assert migrate_json_embeddings(engine, batch_size=3) == 7
+    assert migrate_json_embeddings(engine, batch_size=3) == 0  # idempotente
+
+    with engine.connect() as connection:
+        kinds = connection.execute(
+            text('SELECT DISTINCT typeof(embedding) FROM memories')
+        ).scalars()
+        assert list(kinds) == ['blob']
+
+    memory = db.get(MemoryModel, 4)
+    assert np.allclose(memory.embedding, legacy[3])
@@ -0,0 +1,151 @@
+"""Tests du regroupement en micro-lots des encodages d'embeddings."""
+
+import threading
+import time
+
+import numpy as np
+
+from backend.services.embedding_service import EmbeddingService
+from backend.services.llm_scheduler import LLMScheduler, Priority
+from backend.utils.embedding_loader import EmbeddingCache
+
+
+class _SlowModel:
+    """Modèle factice : un vecteur par texte, avec un coût fixe par appel."""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, **kwargs):
+        self.calls.append(list(texts))
+        time.sleep(0.02)
+        return np.array([[float(len(t)), 1.0] for t in texts])
+
+
+def test_concurrent_callers_share_batches():
+    model = _SlowModel()
+    service = EmbeddingService(model=model, max_batch_size=64, max_wait_ms=50)
+    texts = [f'texte {"x" * i}' for i in range(16)]
+    results = {}
+    barrier = threading.Barrier(len(texts))
+
+    def worker(text):
+        barrier.wait()
+        results[text] = service.encode(text)
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in texts]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(model.calls) < len(texts)
+    for text in texts:
+        assert results[text][0] == len(text)
+
+
+def test_single_caller_is_not_delayed():
+    model = _SlowModel()
+    service = EmbeddingService(model=model, max_batch_size=64, max_wait_ms=1000)
+
+    start = time.monotonic()
+    vector = service.encode('bonjour')
+    assert time.monotonic() - start < 0.5
+    assert vector.tolist() == [7.0, 1.0]
+
+
+def test_encode_many_returns_matrix_in_order():
+    model = _SlowModel()
+    service = EmbeddingService(model=model, max_batch_size=2)
+
+    matrix = service.encode_many(['a', 'bbb', 'cc'])
+    assert matrix.shape == (3, 2)
+    assert matrix[:, 0].tolist() == [1.0, 3.0, 2.0]
+
+
+class _ScheduledModel(_SlowModel):
+    """Modèle servi par le backend LLM : expose un créneau de l'ordonnanceur."""
+
+    def __init__(self):
+        super().__init__()
+        self.scheduler = LLMScheduler(max_in_flight=2)
+        self.slots = []
+
+    def slot(self, priority):
+        self.slots.append(priority)
+        return self.scheduler.slot(None, priority)
+
+
+def test_background_batches_take_a_scheduler_slot():
+    model = _ScheduledModel()
+    service = EmbeddingService(model=model)
+
+    service.encode('conversation', Priority.BACKGROUND)
+    service.encode('requête')
+
+    # Seul le lot de fond passe par l'ordonnanceur
+    assert model.slots == [Priority.BACKGROUND]
+    assert len(model.calls) == 2
+    assert model.scheduler.stats()['in_flight']['background'] == 0
+
+
+def test_cache_hits_skip_the_model(tmp_path):
+    model = _SlowModel()
+    cache = EmbeddingCache('fake', path=tmp_path / 'cache.sqlite')
+    service = EmbeddingService(model=model, cache=cache)
+
+    first = service.encode_many(['a', 'bb'])
+    second = service.encode_many(['bb', 'a', 'ccc'])
+
+    assert model.calls == [['a', 'bb'], ['ccc']]
+    assert np.array_equal(second[:2], first[::-1])
+    assert cache.info()['memory_hits'] == 2 and cache.info()['misses'] == 3
+
+
+def test_cache_persists_on_disk_per_model(tmp_path):
+    path = tmp_path / 'cache.sqlite'
+    EmbeddingCache('fake', path=path).put_many(['bonjour'], np.ones((1, 4)))
+
+    reopened = EmbeddingCache('fake', path=path)
+    assert np.array_equal(reopened.get_many(['bonjour'])[0], np.ones(4))
+    assert reopened.info()['disk_hits'] == 1
+    # Même texte, autre modèle : pas de collision
+    assert EmbeddingCache('other', path=path).get_many(['bonjour']) == [None]
+
+
+def test_memory_hits_do_not_wait_on_disk_reads(tmp_path):
+    cache = EmbeddingCache('fake', path=tmp_path / 'cache.sqlite')
+    cache.put_many(['chaud'], np.ones((1, 4)))
+    results = []
+
+    # Une lecture disque en cours (verrou SQLite tenu) ne bloque pas le LRU
+    with cache._disk_lock:
+        reader = threading.Thread(
+            target=lambda: results.extend(cache.get_many(['chaud']))
+        )
+        reader.start()
+        reader.join(timeout=2)
+        assert not reader.is_alive()
+    assert np.array_equal(results[0], np.ones(4))
+
+
+def test_cache_respects_byte_budget():
+    vector_bytes = 4 * 4 + 32  # float32 x4 + clé sha256
+    cache = EmbeddingCache('fake', max_bytes=3 * vector_bytes)
+    cache.put_many([f't{i}' for i in range(5)], np.ones((5, 4)))
+
+    assert cache.info()['entries'] == 3
+    oldest, newest = cache.get_many(['t0', 't4'])
+    assert oldest is None and newest is not None
+
+
+def test_mock_model_is_deterministic_normalized_and_batchable():
+    from backend.utils.embedding_loader import MockEmbeddingModel
+
+    model = MockEmbeddingModel(dimensions=16)
+    single = model.encode('Bonjour')
+    batch = model.encode(['Bonjour', 'Salut'])
+    assert single.shape == (16,) and batch.shape == (2, 16)
+    assert np.allclose(batch[0], single)
+    assert np.isclose(np.linalg.norm(single), 1.0)
+    assert not np.allclose(batch[0], batch[1])
@@ -0,0 +1,87 @@
+"""Extraction de faits en un balayage et stockage groupé."""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base
+from backend.models.character import CharacterModel
+from backend.models.memory import FactModel
+from backend.services.fact_extraction import FactExtractor
+
+
+def test_scan_finds_every_rule_in_one_pass():
+    text = (
+        "Bonjour ! Je m'appelle Marie. J'ai 32 ans et je suis une pilote. "
+        "J'habite à Lyon. J'aime le chocolat. Le jazz me rend heureux. "
+        "J'aime le chocolat."
+    )
+    facts = {(f.subject, f.predicate, f.object): f for f in FactExtractor().scan(text)}
+
+    assert set(facts) == {
+        ('user', "s'appelle", 'marie'),
+        ('user', 'a pour âge', '32'),
+        ('user', 'est', 'une pilote'),
+        ('user', 'habite à', 'lyon'),
+        ('user', 'aime', 'chocolat'),
+        ('le jazz', 'rend heureux', 'user'),
+    }
+    assert facts[('user', 'aime', 'chocolat')].occurrences == 2
+    assert facts[('le jazz', 'rend heureux', 'user')].confidence == 0.7
+
+
+def test_scan_records_fears_about_the_user():
+    # L'ancienne extraction ignorait cette règle (un seul groupe capturé)
+    (fact,) = FactExtractor().scan("J'ai peur de la nuit.")
+    assert fact[:3] == ('user', 'a peur de', 'la nuit')
+    assert (fact.confidence, fact.confirm) == (0.7, False)
+
+
+def test_scan_ignores_trivial_values():
+    assert FactExtractor().scan("j'aime le x. j'ai peur de l'orage") == []
+
+
+@pytest.fixture
+def session(tmp_path):
+    from backend import models  # noqa: F401  (enregistre les tables)
+
+    engine = create_engine(
+        f'sqlite:///{tmp_path / "test.db"}', connect_args={'check_same_thread': False}
+    )
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add(
+        CharacterModel(
+            id=1,
+            name='Testeur',
+            description='Un personnage de test pour les tests unitaires.',
+            personality='Calme et curieux.',
+        )
+    )
+    db.commit()
+    yield db
+    db.close()
+
+
+def test_extract_inserts_then_confirms_known_facts(session):
+    extractor = FactExtractor()
+
+    first = extractor.extract(
+        session, 1, None, "J'aime le jazz. Le jazz me rend calme. J'aime le jazz."
+    )
+    assert len(first) == 2
+    facts = {f.predicate: f for f in session.query(FactModel).all()}
+    # Deux occurrences dans la même mémoire : une confirmation immédiate
+    assert facts['aime'].confidence == pytest.approx(0.9)
+    assert facts['rend calme'].confidence == pytest.approx(0.7)
+
+    second = extractor.extract(
+        session, 1, None, "J'aime le jazz. Le jazz me rend calme."
+    )
+    assert sorted(second) == sorted(first)
+    session.expire_all()
+    facts = {f.predicate: f for f in session.query(FactModel).all()}
+    assert len(facts) == 2
+    assert facts['aime'].confidence == pytest.approx(1.0)
+    # Les relations émotionnelles ne sont pas renforcées
+    assert facts['rend calme'].confidence == pytest.approx(0.7)
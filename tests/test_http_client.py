@@ -0,0 +1,116 @@
+"""Client HTTP partagé : relances avec attente aléatoire et latences par route."""
+
+import asyncio
+
+import httpx
+import pytest
+import requests
+
+from backend.utils import http_client
+from backend.utils.http_client import AsyncHttpClient, HttpClient, LatencyRecorder
+
+
+class _Resp:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def client(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(http_client.time, 'sleep', sleeps.append)
+    client = HttpClient(max_retries=2, retry_backoff=1.0)
+    client.sleeps = sleeps
+    return client
+
+
+def _script(client, monkeypatch, outcomes):
+    calls = []
+
+    def fake_request(method, url, **kwargs):
+        calls.append(kwargs)
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return _Resp(outcome)
+
+    monkeypatch.setattr(client.session, 'request', fake_request)
+    return calls
+
+
+def test_retries_transient_failures_with_jitter(client, monkeypatch):
+    calls = _script(client, monkeypatch, [requests.ConnectionError(), 503, 200])
+
+    response = client.post('http://ollama:11434/api/generate', json={})
+    assert response.status_code == 200
+    assert len(calls) == 3
+    assert all(call['timeout'] == (3.0, 120.0) for call in calls)
+    assert 0 <= client.sleeps[0] <= 1.0 and 0 <= client.sleeps[1] <= 2.0
+
+    stats = client.stats()['POST /api/generate']
+    assert stats['calls'] == 3 and stats['retries'] == 2 and stats['errors'] == 2
+    assert stats['p95_ms'] >= stats['p50_ms'] >= 0
+
+
+def test_gives_up_after_max_retries(client, monkeypatch):
+    _script(client, monkeypatch, [502, 502, 502])
+    assert client.get('http://ollama/api/tags').status_code == 502
+
+    _script(client, monkeypatch, [requests.ConnectionError()] * 3)
+    with pytest.raises(requests.ConnectionError):
+        client.get('http://ollama/api/tags')
+
+
+def test_read_timeout_and_client_errors_are_not_retried(client, monkeypatch):
+    calls = _script(client, monkeypatch, [requests.ReadTimeout()])
+    with pytest.raises(requests.ReadTimeout):
+        client.post('http://ollama/api/generate')
+    assert len(calls) == 1
+
+    calls = _script(client, monkeypatch, [404, requests.ConnectionError()])
+    assert client.get('http://ollama/api/tags').status_code == 404
+    with pytest.raises(requests.ConnectionError):
+        client.get('http://ollama/api/tags', retries=0)
+    assert len(calls) == 2
+    assert client.sleeps == []
+
+
+def test_async_client_retries_and_shares_statistics(monkeypatch):
+    outcomes = [httpx.ConnectError('refusé'), 503, 200, httpx.ReadTimeout('lent')]
+    requests_seen = []
+
+    def handler(request):
+        requests_seen.append(request)
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(outcome, json={'response': 'ok'})
+
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+
+    monkeypatch.setattr(http_client.asyncio, 'sleep', fake_sleep)
+    latencies = LatencyRecorder()
+    client = AsyncHttpClient(
+        retry_backoff=1.0, latencies=latencies, transport=httpx.MockTransport(handler)
+    )
+
+    async def scenario():
+        response = await client.post('http://ollama/api/generate', json={})
+        assert response.json() == {'response': 'ok'}
+        with pytest.raises(httpx.ReadTimeout):
+            await client.post('http://ollama/api/generate', json={})
+        await client.aclose()
+
+    asyncio.run(scenario())
+    assert len(requests_seen) == 4
+    assert 0 <= sleeps[0] <= 1.0 and 0 <= sleeps[1] <= 2.0 and len(sleeps) == 2
+
+    stats = HttpClient(latencies=latencies).stats()['POST /api/generate']
+    assert stats['calls'] == 4 and stats['retries'] == 2 and stats['errors'] == 3
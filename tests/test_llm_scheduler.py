@@ -0,0 +1,146 @@
+"""Ordonnanceur des générations LLM : concurrence, équité, admission."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backend.services.llm_scheduler import LLMScheduler, Priority
+from backend.utils.errors import LLMOverloadedException
+
+
+def _hold(scheduler, order, name, user, release, priority=Priority.INTERACTIVE):
+    """Thread qui prend un créneau, note son passage et attend `release`."""
+
+    def run():
+        with scheduler.slot(user, priority):
+            order.append(name)
+            release.wait(5)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_slots_are_served_round_robin_between_users():
+    scheduler = LLMScheduler(max_in_flight=1)
+    order, gate, done = [], threading.Event(), threading.Event()
+    done.set()
+    threads = [_hold(scheduler, order, 'a0', 'alice', gate)]
+    assert _wait_for(lambda: order == ['a0'])
+
+    # Alice empile deux demandes avant que Bob n'en envoie une
+    for queued, (name, user) in enumerate(
+        [('a1', 'alice'), ('a2', 'alice'), ('b1', 'bob')], start=1
+    ):
+        threads.append(_hold(scheduler, order, name, user, done))
+        assert _wait_for(
+            lambda n=queued: scheduler.stats()['queued']['interactive'] == n
+        )
+
+    gate.set()
+    for thread in threads:
+        thread.join()
+    assert order == ['a0', 'a1', 'b1', 'a2']
+
+
+def test_background_never_takes_the_last_slot():
+    scheduler = LLMScheduler(max_in_flight=2, background_slots=1)
+    with scheduler.slot('job', Priority.BACKGROUND):
+        with pytest.raises(LLMOverloadedException) as exc:
+            with scheduler.slot('job', Priority.BACKGROUND, timeout=0.05):
+                pass
+        assert exc.value.status_code == 503
+        # Un tour interactif passe malgré la tâche de fond en cours
+        with scheduler.slot('alice', timeout=0.05):
+            assert scheduler.stats()['in_flight'] == {
+                'interactive': 1,
+                'background': 1,
+            }
+
+
+def test_user_with_too_many_queued_requests_gets_429():
+    scheduler = LLMScheduler(max_in_flight=1, max_queue_per_user=1)
+    gate = threading.Event()
+    holder = _hold(scheduler, [], 'x', 'bob', gate)
+    assert _wait_for(lambda: scheduler.stats()['in_flight']['interactive'] == 1)
+    done = threading.Event()
+    done.set()
+    waiter = _hold(scheduler, [], 'y', 'alice', done)
+    assert _wait_for(lambda: scheduler.stats()['queued']['interactive'] == 1)
+
+    with pytest.raises(LLMOverloadedException) as exc:
+        with scheduler.slot('alice'):
+            pass
+    assert exc.value.status_code == 429
+    assert int(exc.value.headers['Retry-After']) >= 1
+    assert scheduler.stats()['rejected_user'] == 1
+
+    gate.set()
+    holder.join()
+    waiter.join()
+
+
+def test_full_queue_is_rejected_with_503():
+    scheduler = LLMScheduler(max_in_flight=1, max_queue=0)
+    with scheduler.slot('alice'):
+        with pytest.raises(LLMOverloadedException) as exc:
+            with scheduler.slot('bob'):
+                pass
+    assert exc.value.status_code == 503
+    assert scheduler.stats()['rejected_full'] == 1
+
+
+def test_async_slot_waits_without_blocking_and_records_waits():
+    scheduler = LLMScheduler(max_in_flight=1)
+    order = []
+
+    async def turn(name, hold):
+        async with scheduler.aslot(name):
+            order.append(name)
+            await asyncio.sleep(hold)
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        tick = asyncio.create_task(ticker())
+        await asyncio.gather(turn('alice', 0.1), turn('bob', 0))
+        tick.cancel()
+        return ticks
+
+    ticks = asyncio.run(main())
+    assert order == ['alice', 'bob']
+    assert ticks > 5  # la boucle a continué de tourner pendant l'attente
+    stats = scheduler.stats()
+    assert stats['completed'] == 2
+    assert stats['wait_ms']['interactive']['max'] >= 50
+
+
+def test_async_timeout_withdraws_the_ticket():
+    scheduler = LLMScheduler(max_in_flight=1)
+
+    async def main():
+        async with scheduler.aslot('alice'):
+            with pytest.raises(LLMOverloadedException):
+                async with scheduler.aslot('bob', timeout=0.05):
+                    pass
+            assert scheduler.stats()['queued']['interactive'] == 0
+
+    asyncio.run(main())
+    assert scheduler.stats()['timeouts'] == 1
@@ -1,5 +1,8 @@
 """Tests du matching de modèle de LLMService (résolution tolérante par préfixe)."""
 
+import numpy as np
+import pytest
+
 from backend.services.llm_service import LLMService
 
 
@@ -16,12 +19,14 @@ class _FakeResp:
 def _service(monkeypatch, default_model, available):
     # importlib.import_module renvoie le vrai module (services/__init__ masque
     # le sous-module 'llm_service' par l'instance, donc `import ... as mod` ou
-    # une cible string échouent). On patche requests.get AVANT de construire :
-    # __init__ appelle check_model_availability() quand mock_mode défaut=False.
+    # une cible string échouent). On patche le client HTTP avant de construire
+    # le service, que check_model_availability() interroge via le registre.
     import importlib
 
     mod = importlib.import_module("backend.services.llm_service")
-    monkeypatch.setattr(mod.requests, "get", lambda *a, **k: _FakeResp(available))
+    monkeypatch.setattr(
+        mod.HttpClient, "get", lambda self, *a, **k: _FakeResp(available)
+    )
     svc = LLMService()
     svc.default_model = default_model
     svc.mock_mode = True
@@ -47,3 +52,195 @@ def test_no_match_falls_back_to_mock(monkeypatch):
     svc = _service(monkeypatch, "mistral", ["gemma:2b", "llama3.1:latest"])
     assert svc.check_model_availability() is False
     assert svc.mock_mode is True
+
+
+class _FakeStream:
+    status_code = 200
+
+    def __init__(self, lines):
+        self._lines = lines
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+    def iter_lines(self):
+        yield from self._lines
+
+
+def test_generate_stream_yields_ndjson_fragments(monkeypatch):
+    svc = _service(monkeypatch, "gemma:2b", ["gemma:2b"])
+    svc.mock_mode = False
+    sent = {}
+    stream_response = _FakeStream(
+        [
+            b'{"response": "Bon", "done": false}',
+            b"",
+            b'{"response": "jour", "done": false}',
+            b'{"response": "", "done": true, "eval_count": 2}',
+            b'{"response": "ignored"}',
+        ]
+    )
+
+    def fake_post(url, json=None, stream=False, **kwargs):
+        sent.update(url=url, payload=json, stream=stream)
+        return stream_response
+
+    monkeypatch.setattr(svc.http, "post", fake_post)
+
+    assert list(svc.generate_stream("Salut", temperature=0.2, max_tokens=64)) == [
+        "Bon",
+        "jour",
+    ]
+    assert stream_response.closed
+    assert sent["stream"] is True
+    assert sent["payload"]["stream"] is True
+    assert sent["payload"]["options"] == {
+        "temperature": 0.2,
+        "num_predict": 64,
+        "num_ctx": svc.num_ctx,
+    }
+    assert "temperature" not in sent["payload"]
+
+
+def test_generate_stream_is_admitted_before_first_fragment(monkeypatch):
+    from backend.services.llm_scheduler import LLMScheduler
+    from backend.utils.errors import LLMOverloadedException
+
+    svc = _service(monkeypatch, "gemma:2b", ["gemma:2b"])
+    svc.scheduler = LLMScheduler(max_in_flight=1, max_queue=0)
+
+    fragments = svc.generate_stream("Salut")  # créneau obtenu dès l'appel
+    assert svc.scheduler.stats()["in_flight"]["interactive"] == 1
+    with pytest.raises(LLMOverloadedException) as exc:
+        svc.generate_stream("Salut")
+    assert exc.value.status_code == 503
+
+    fragments.close()
+    assert svc.scheduler.stats()["in_flight"]["interactive"] == 0
+
+
+def test_model_list_is_cached_for_the_registry_ttl(monkeypatch):
+    svc = _service(monkeypatch, "gemma:2b", ["gemma:2b"])
+    calls = []
+    monkeypatch.setattr(
+        svc.http, "get", lambda url, **k: calls.append(url) or _FakeResp(["gemma:2b"])
+    )
+
+    assert svc.check_model_availability() is True
+    assert svc.check_model_availability() is True
+    assert len(calls) == 1
+    assert svc.check_model_availability(max_age=0) is True
+    assert len(calls) == 2
+
+
+def test_refresh_model_warms_up_once_and_reports_ready(monkeypatch):
+    svc = _service(monkeypatch, "gemma:2b", ["gemma:2b"])
+    posted = []
+
+    class _Ok:
+        status_code = 200
+
+    monkeypatch.setattr(
+        svc.http, "post", lambda url, json=None, **k: posted.append(json) or _Ok()
+    )
+    assert svc.registry.status()["state"] == "checking"
+
+    svc.refresh_model()
+    assert posted == [{"model": "gemma:2b", "keep_alive": svc.keep_alive}]
+    status = svc.registry.status()
+    assert status["ready"] and status["model"] == "gemma:2b"
+
+    # Modèle déchargé par Ollama depuis : disponible, mais plus prêt
+    monkeypatch.setattr(
+        svc.http,
+        "get",
+        lambda url, **k: _FakeResp([] if url.endswith("/ps") else ["gemma:2b"]),
+    )
+    svc.refresh_model()
+    assert len(posted) == 1
+    assert svc.registry.status()["state"] == "available"
+
+
+def test_unreachable_ollama_switches_to_mock(monkeypatch):
+    svc = _service(monkeypatch, "gemma:2b", ["gemma:2b"])
+    svc.mock_mode = False
+
+    def refuse(url, **kwargs):
+        raise ConnectionError("refused")
+
+    monkeypatch.setattr(svc.http, "get", refuse)
+    svc.refresh_model()
+    status = svc.registry.status()
+    assert svc.mock_mode is True
+    assert status["state"] == "unavailable" and "refused" in status["last_error"]
+
+
+def test_get_embeddings_sends_one_request_per_batch(monkeypatch):
+    svc = _service(monkeypatch, "gemma:2b", ["gemma:2b"])
+    svc.mock_mode = False
+    svc.embedding_batch_size = 256
+    batches = []
+
+    class _Embed:
+        status_code = 200
+
+        def __init__(self, n):
+            self._n = n
+
+        def json(self):
+            return {"embeddings": [[float(i), 1.0, 0.0] for i in range(self._n)]}
+
+    def fake_post(url, json=None, **kwargs):
+        batches.append((url, len(json["input"])))
+        return _Embed(len(json["input"]))
+
+    monkeypatch.setattr(svc.http, "post", fake_post)
+    texts = [f"texte {i}" for i in range(600)]
+    embeddings = svc.get_embeddings(texts)
+
+    assert [n for _, n in batches] == [256, 256, 88]
+    assert all(url.endswith("/embed") for url, _ in batches)
+    assert embeddings.shape == (600, 3) and embeddings.dtype == np.float32
+    assert svc.get_embedding("seul") == [0.0, 1.0, 0.0]
+
+
+def test_mock_embeddings_are_deterministic_and_bounded(monkeypatch):
+    svc = _service(monkeypatch, "gemma:2b", ["gemma:2b"])
+    svc.mock_mode = True
+
+    first = svc.get_embeddings(["a", "b", "a"])
+    assert first.shape == (3, svc.embedding_dimensions)
+    assert np.array_equal(first[0], first[2])
+    assert not np.array_equal(first[0], first[1])
+    assert np.array_equal(svc.get_embeddings(["b"])[0], first[1])
+    assert first.min() >= -1.0 and first.max() <= 1.0
+
+
+def test_strict_embeddings_raise_instead_of_mocking(monkeypatch):
+    from backend.utils.errors import LLMServiceException
+
+    svc = _service(monkeypatch, "gemma:2b", ["gemma:2b"])
+    svc.mock_mode = True  # ignoré : le mode strict interroge toujours Ollama
+
+    def refuse(url, **kwargs):
+        raise ConnectionError("refused")
+
+    monkeypatch.setattr(svc.http, "post", refuse)
+    with pytest.raises(LLMServiceException):
+        svc.get_embeddings(["texte"], fallback=False)
+    assert svc.get_embeddings(["texte"]).shape == (1, svc.embedding_dimensions)
+
+
+def test_start_follows_the_instance_mock_mode(monkeypatch):
+    svc = _service(monkeypatch, "gemma:2b", ["gemma:2b"])
+    started = []
+    monkeypatch.setattr(svc.registry, "start", lambda refresh: started.append(refresh))
+
+    svc.start()
+    svc.mock_mode = False
+    svc.start()
+    assert started == [svc.refresh_model]
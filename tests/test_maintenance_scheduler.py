@@ -0,0 +1,173 @@
+"""Planificateur de maintenance des mémoires en arrière-plan."""
+
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base
+from backend.models.character import CharacterModel
+from backend.services.maintenance_scheduler import MaintenanceScheduler
+
+
+class _FakeManager:
+    """Enregistre les cycles demandés au lieu de toucher aux mémoires."""
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def maintenance_cycle(self, db, character_id, time_budget=None):
+        with self.lock:
+            self.calls.append((character_id, time_budget))
+        return {'decayed_memories': 0, 'consolidated_memories': character_id}
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    from backend import models  # noqa: F401  (enregistre les tables)
+
+    engine = create_engine(
+        f'sqlite:///{tmp_path / "test.db"}', connect_args={'check_same_thread': False}
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        for character_id in (1, 2, 3):
+            db.add(
+                CharacterModel(
+                    id=character_id,
+                    name=f'Personnage {character_id}',
+                    description='Un personnage de test pour les tests unitaires.',
+                    personality='Calme et curieux.',
+                )
+            )
+        db.commit()
+    return factory
+
+
+def _wait_for(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_rotates_over_every_character_once_per_interval(session_factory):
+    manager = _FakeManager()
+    scheduler = MaintenanceScheduler(
+        session_factory,
+        manager,
+        workers=2,
+        interval=3600,
+        poll_interval=0.01,
+        time_budget=5,
+        cpu_share=1.0,
+    )
+    scheduler.start()
+    try:
+        assert _wait_for(lambda: len(scheduler.status()['characters']) == 3)
+        time.sleep(0.1)
+    finally:
+        scheduler.stop()
+
+    # Un seul cycle par personnage tant que l'intervalle n'est pas écoulé
+    assert sorted(manager.calls) == [(1, 5), (2, 5), (3, 5)]
+    status = scheduler.status()
+    assert status['running'] is False
+    assert status['characters'][2]['statistics']['consolidated_memories'] == 2
+    assert scheduler.due_characters() == []
+
+
+def test_backs_off_while_chat_is_busy(session_factory):
+    manager = _FakeManager()
+    scheduler = MaintenanceScheduler(
+        session_factory, manager, poll_interval=0.01, busy_messages_per_minute=3
+    )
+    for _ in range(3):
+        scheduler.notify_activity()
+    assert scheduler.is_busy()
+
+    scheduler.start()
+    try:
+        assert _wait_for(lambda: scheduler.status()['skipped_busy'] > 0)
+    finally:
+        scheduler.stop()
+    assert manager.calls == []
+
+
+def test_manual_run_reports_busy_while_a_cycle_is_running(session_factory):
+    started, release = threading.Event(), threading.Event()
+
+    class _SlowManager(_FakeManager):
+        def maintenance_cycle(self, db, character_id, time_budget=None):
+            started.set()
+            release.wait(5)
+            return super().maintenance_cycle(db, character_id, time_budget)
+
+    manager = _SlowManager()
+    scheduler = MaintenanceScheduler(session_factory, manager, time_budget=5)
+    first = threading.Thread(target=scheduler.run_character, args=(1,))
+    first.start()
+    assert started.wait(3)
+
+    assert scheduler.run_character(1) == {'busy': True, 'statistics': {}}
+    assert scheduler.status()['in_progress'] == [1]
+    release.set()
+    first.join()
+
+    assert manager.calls == [(1, 5)]
+    assert scheduler.run_character(1)['statistics']['consolidated_memories'] == 1
+    assert scheduler.status()['in_progress'] == []
+
+
+def test_schedulers_of_several_processes_share_the_leases(session_factory):
+    manager = _FakeManager()
+    schedulers = [
+        MaintenanceScheduler(
+            session_factory,
+            manager,
+            workers=2,
+            interval=3600,
+            poll_interval=0.01,
+            time_budget=5,
+            cpu_share=1.0,
+        )
+        for _ in range(3)
+    ]
+    for scheduler in schedulers:
+        scheduler.start()
+    try:
+        assert _wait_for(lambda: len(manager.calls) == 3)
+        time.sleep(0.1)
+    finally:
+        for scheduler in schedulers:
+            scheduler.stop()
+
+    # Chaque personnage n'est maintenu qu'une fois, tous processus confondus
+    assert sorted(manager.calls) == [(1, 5), (2, 5), (3, 5)]
+    assert all(scheduler.due_characters() == [] for scheduler in schedulers)
+
+
+def test_lease_held_by_another_process_makes_the_run_busy(session_factory):
+    started, release = threading.Event(), threading.Event()
+
+    class _SlowManager(_FakeManager):
+        def maintenance_cycle(self, db, character_id, time_budget=None):
+            started.set()
+            release.wait(5)
+            return super().maintenance_cycle(db, character_id, time_budget)
+
+    holder = MaintenanceScheduler(session_factory, _SlowManager(), time_budget=5)
+    other = MaintenanceScheduler(session_factory, _FakeManager(), time_budget=5)
+    first = threading.Thread(target=holder.run_character, args=(1,))
+    first.start()
+    assert started.wait(3)
+
+    assert other.run_character(1) == {'busy': True, 'statistics': {}}
+    assert 1 not in other.due_characters()
+    release.set()
+    first.join()
+    assert other.run_character(1)['statistics']['consolidated_memories'] == 1
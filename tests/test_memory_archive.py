@@ -0,0 +1,157 @@
+"""Archivage compressé des mémoires froides et restauration à la demande."""
+
+import datetime
+import importlib
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.config import EMBEDDING_CONFIG
+from backend.database import Base
+from backend.models.character import CharacterModel
+from backend.models.memory import ArchivedMemoryModel, FactModel, MemoryModel
+from backend.services.memory_archive import MemoryArchiver
+from backend.services.memory_index import memory_index
+from backend.services.memory_search import lexical_index
+
+DIMENSIONS = EMBEDDING_CONFIG['dimensions']
+
+
+@pytest.fixture
+def session(tmp_path):
+    from backend import models  # noqa: F401  (enregistre les tables)
+
+    engine = create_engine(
+        f'sqlite:///{tmp_path / "test.db"}', connect_args={'check_same_thread': False}
+    )
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add(
+        CharacterModel(
+            id=1,
+            name='Testeur',
+            description='Un personnage de test pour les tests unitaires.',
+            personality='Calme et curieux.',
+        )
+    )
+    now = datetime.datetime.now()
+    rows = [
+        # id, importance, âge (jours), accès, dernier accès (jours)
+        (1, 0.1, 200, 0, None),  # froide
+        (2, 0.2, 400, 2, 120),  # froide, consultée il y a longtemps
+        (3, 0.1, 200, 0, 10),  # consultée récemment : conservée
+        (4, 2.0, 200, 0, None),  # importante : conservée
+        (5, 0.1, 30, 0, None),  # récente : conservée
+        (6, 0.1, 200, 3, None),  # souvent consultée : conservée
+    ]
+    for memory_id, importance, age, access_count, accessed in rows:
+        db.add(
+            MemoryModel(
+                id=memory_id,
+                character_id=1,
+                type='conversation',
+                content=f'Souvenir lointain numéro {memory_id}. ' * 20,
+                importance=importance,
+                memory_metadata={'source': 'test', 'id': memory_id},
+                embedding=np.full(DIMENSIONS, memory_id, dtype=np.float32),
+                created_at=now - datetime.timedelta(days=age),
+                last_accessed=(
+                    now - datetime.timedelta(days=accessed) if accessed else None
+                ),
+                access_count=access_count,
+            )
+        )
+    db.add(
+        FactModel(
+            character_id=1,
+            subject='user',
+            predicate='aime',
+            object='le jazz',
+            source_memory_id=1,
+        )
+    )
+    db.commit()
+    yield db
+    db.close()
+
+
+def test_archive_moves_only_cold_memories(session):
+    index = memory_index.get(session, 1)
+    assert len(index) == 6
+
+    assert MemoryArchiver().archive(session, 1) == 2
+
+    session.expire_all()
+    assert sorted(m.id for m in session.query(MemoryModel)) == [3, 4, 5, 6]
+    assert sorted(index.ids.tolist()) == [3, 4, 5, 6]
+    archived = session.get(ArchivedMemoryModel, 1)
+    assert archived.importance == pytest.approx(0.1)
+    assert len(archived.payload) < len(f'Souvenir lointain numéro {1}. ' * 20)
+    assert sorted(lexical_index.search(session, 1, 'lointain', 10)) == [3, 4, 5, 6]
+
+
+def test_restore_rehydrates_memory(session):
+    archiver = MemoryArchiver()
+    archiver.archive(session, 1)
+
+    restored = archiver.restore(session, [1, 99])
+    assert [m.id for m in restored] == [1]
+    assert archiver.count(session, 1) == 1
+
+    session.expire_all()
+    memory = session.get(MemoryModel, 1)
+    assert memory.content == 'Souvenir lointain numéro 1. ' * 20
+    assert memory.memory_metadata == {'source': 'test', 'id': 1}
+    assert np.array_equal(memory.embedding, np.full(DIMENSIONS, 1, dtype=np.float32))
+    assert memory.last_accessed.date() == datetime.date.today()
+    assert session.query(FactModel).one().source_memory_id == 1
+    assert 1 in memory_index.get(session, 1).ids.tolist()
+    # Consultée à l'instant : n'est plus candidate à l'archivage
+    assert archiver.cold_memory_ids(session, 1) == []
+
+
+def test_restore_reassigns_a_reused_id(session):
+    archiver = MemoryArchiver()
+    archiver.archive(session, 1)
+    session.add(
+        MemoryModel(id=1, character_id=1, type='event', content='Nouvelle mémoire')
+    )
+    session.commit()
+    # Le fait de la mémoire archivée ne suit pas l'id réattribué
+    assert session.query(FactModel).one().source_memory_id is None
+
+    restored = archiver.restore(session, [1])
+    assert restored[0].id not in (1, 2)
+    assert session.get(MemoryModel, 1).content == 'Nouvelle mémoire'
+    assert session.query(FactModel).one().source_memory_id == restored[0].id
+
+
+def test_get_memory_restores_archived_memory(session):
+    memory_manager = importlib.import_module('backend.services.memory_manager')
+    manager = memory_manager.MemoryManager()
+    manager.archiver.archive(session, 1)
+
+    memory = manager.get_memory(session, 2)
+    assert memory is not None and memory.id == 2
+    assert manager.archiver.count(session, 1) == 1
+
+
+def test_archived_memories_can_be_updated_and_deleted(session):
+    memory_manager = importlib.import_module('backend.services.memory_manager')
+    manager = memory_manager.MemoryManager()
+    manager.archiver.archive(session, 1)
+    assert session.get(MemoryModel, 1) is None
+
+    # Modifier l'importance réintègre la mémoire, comme une lecture
+    assert manager.update_memory_importance(session, 1, 3.0)
+    assert session.get(MemoryModel, 1).importance == 3.0
+    assert session.get(ArchivedMemoryModel, 1) is None
+
+    # La supprimer la retire de l'archive sans la réintégrer
+    assert manager.delete_memory(session, 2)
+    assert session.get(ArchivedMemoryModel, 2) is None
+    assert session.get(MemoryModel, 2) is None
+    assert manager.archiver.count(session, 1) == 0
+    assert not manager.delete_memory(session, 2)
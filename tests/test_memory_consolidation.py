@@ -0,0 +1,115 @@
+"""Tests de la consolidation des mémoires par blocs et union-find."""
+
+import datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.config import EMBEDDING_CONFIG
+from backend.database import Base
+from backend.models.character import CharacterModel
+from backend.models.memory import FactModel, MemoryModel
+from backend.services.memory_consolidation import MemoryConsolidator, similar_pairs
+
+
+def _unit(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_similar_pairs_matches_brute_force_across_blocks():
+    rng = np.random.default_rng(0)
+    base = rng.normal(size=(40, 8))
+    vectors = _unit(np.vstack([base, base + rng.normal(scale=0.05, size=base.shape)]))
+
+    rows, cols = similar_pairs(vectors, 0.9, block_size=7)
+
+    full = vectors @ vectors.T
+    expected = {(i, j) for i, j in zip(*np.nonzero(np.triu(full, 1) > 0.9))}
+    assert set(zip(rows.tolist(), cols.tolist())) == expected
+    assert np.all(rows < cols)
+
+
+def test_clusters_are_transitive_and_split_by_type():
+    vectors = _unit([[1, 0, 0], [1, 0.1, 0], [1, 0.2, 0], [0, 1, 0], [1, 0.05, 0]])
+    types = np.array(['a', 'a', 'a', 'a', 'b'])
+
+    clusters, pairs = MemoryConsolidator().find_clusters(vectors, types, 0.99)
+
+    assert [sorted(c.tolist()) for c in clusters] == [[0, 1, 2]]
+    assert pairs == 2  # 0-1 et 1-2 ; 0-2 est regroupé par transitivité
+
+
+@pytest.fixture
+def session(tmp_path):
+    from backend import models  # noqa: F401  (enregistre les tables)
+
+    engine = create_engine(
+        f'sqlite:///{tmp_path / "test.db"}', connect_args={'check_same_thread': False}
+    )
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add(
+        CharacterModel(
+            id=1,
+            name='Testeur',
+            description='Un personnage de test pour les tests unitaires.',
+            personality='Calme et curieux.',
+        )
+    )
+    db.commit()
+    yield db
+    db.close()
+
+
+def test_consolidate_merges_clusters_in_one_pass(session):
+    now = datetime.datetime.now()
+    rows = [
+        # id, vecteur, importance, âge en jours
+        (1, [1, 0, 0, 0], 2.0, 3),
+        (2, [1, 0.01, 0, 0], 5.0, 2),
+        (3, [1, 0, 0.01, 0], 5.0, 1),
+        (4, [0, 1, 0, 0], 1.0, 1),
+        (5, [0, 0, 1, 0], 1.0, 1),
+    ]
+    for memory_id, vector, importance, age in rows:
+        embedding = np.zeros(EMBEDDING_CONFIG['dimensions'], dtype=np.float32)
+        embedding[:4] = vector
+        session.add(
+            MemoryModel(
+                id=memory_id,
+                character_id=1,
+                type='conversation',
+                content=f'Mémoire {memory_id}',
+                importance=importance,
+                embedding=embedding,
+                created_at=now - datetime.timedelta(days=age),
+            )
+        )
+    session.add(
+        FactModel(
+            character_id=1,
+            subject='Testeur',
+            predicate='aime',
+            object='le thé',
+            source_memory_id=1,
+        )
+    )
+    session.commit()
+
+    stats = MemoryConsolidator().consolidate(session, 1, 0.99)
+
+    assert stats['memories'] == 5
+    assert stats['clusters'] == 1 and stats['largest_cluster'] == 3
+    assert stats['merged'] == 2
+
+    session.expire_all()
+    remaining = {m.id: m for m in session.query(MemoryModel).all()}
+    # Importance égale : la plus récente est conservée
+    assert sorted(remaining) == [3, 4, 5]
+    kept = remaining[3]
+    assert kept.importance == pytest.approx(min(9.0, 5.0 * 1.2**2))
+    assert sorted(kept.memory_metadata['consolidated_with']) == [1, 2]
+    assert session.query(FactModel).one().source_memory_id == 3
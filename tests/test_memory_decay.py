@@ -0,0 +1,83 @@
+"""Dégradation des mémoires anciennes en un seul UPDATE SQL."""
+
+import datetime
+import importlib
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base
+from backend.models.character import CharacterModel
+from backend.models.memory import MemoryModel
+
+
+def _expected_importance(importance, age_in_days, access_count, days_threshold=90):
+    """Formule de référence (ancienne implémentation ligne à ligne)"""
+    decay_factor = 1.0 - min(0.5, (age_in_days - days_threshold) / 365)
+    if access_count == 0:
+        decay_factor *= 0.8
+    resistance = min(0.8, importance / 10.0)
+    return max(0.1, importance * (decay_factor + resistance) / 2)
+
+
+@pytest.fixture
+def session(tmp_path):
+    from backend import models  # noqa: F401  (enregistre les tables)
+
+    engine = create_engine(
+        f'sqlite:///{tmp_path / "test.db"}', connect_args={'check_same_thread': False}
+    )
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add(
+        CharacterModel(
+            id=1,
+            name='Testeur',
+            description='Un personnage de test pour les tests unitaires.',
+            personality='Calme et curieux.',
+        )
+    )
+    db.commit()
+    yield db
+    db.close()
+
+
+def test_decay_applies_formula_in_sql(session):
+    now = datetime.datetime.now()
+    rows = [
+        # id, importance, âge (jours), accès, dernier accès (jours)
+        (1, 5.0, 200, 0, None),  # dégradée, jamais consultée
+        (2, 5.0, 300, 2, 120),  # dégradée, consultée avant le seuil
+        (3, 5.0, 300, 2, 10),  # consultée récemment : ignorée
+        (4, 8.0, 300, 0, None),  # trop importante : ignorée
+        (5, 5.0, 30, 0, None),  # trop récente : ignorée
+        (6, 5.0, 300, 6, None),  # souvent consultée : ignorée
+        (7, 0.3, 95, 1, None),  # variation < 0.2 : ignorée
+    ]
+    for memory_id, importance, age, access_count, accessed in rows:
+        session.add(
+            MemoryModel(
+                id=memory_id,
+                character_id=1,
+                type='conversation',
+                content=f'Mémoire {memory_id}',
+                importance=importance,
+                access_count=access_count,
+                created_at=now - datetime.timedelta(days=age, hours=1),
+                last_accessed=(
+                    now - datetime.timedelta(days=accessed) if accessed else None
+                ),
+            )
+        )
+    session.commit()
+
+    manager = importlib.import_module('backend.services.memory_manager').memory_manager
+    assert manager.decay_old_memories(session, 1) == 2
+
+    session.expire_all()
+    importance = {m.id: m.importance for m in session.query(MemoryModel).all()}
+    assert importance[1] == pytest.approx(_expected_importance(5.0, 200, 0))
+    assert importance[2] == pytest.approx(_expected_importance(5.0, 300, 2))
+    assert {i: importance[i] for i in (3, 5, 6, 7)} == {3: 5.0, 5: 5.0, 6: 5.0, 7: 0.3}
+    assert importance[4] == 8.0
@@ -0,0 +1,62 @@
+"""Score d'importance des mémoires."""
+
+import pytest
+
+from backend.services.memory_importance import (
+    CATEGORY_WEIGHTS,
+    EMOTION_MARKERS,
+    IDENTITY_MARKERS,
+    IMPORTANT_MARKERS,
+    TEMPORAL_MARKERS,
+    TYPE_WEIGHTS,
+    ImportanceScorer,
+)
+
+
+def _legacy_importance(content, memory_type):
+    """Ancien calcul : un str.count par marqueur"""
+    lower = content.lower()
+    score = 1.0
+    for markers, category in (
+        (IMPORTANT_MARKERS, 'important'),
+        (TEMPORAL_MARKERS, 'temporal'),
+        (EMOTION_MARKERS, 'emotion'),
+        (IDENTITY_MARKERS, 'identity'),
+    ):
+        score += sum(lower.count(m) for m in markers) * CATEGORY_WEIGHTS[category]
+    score += content.count('?') * 0.4 + content.count('!') * 0.3
+    score += min(1.0, len(lower.split()) / 100) * 0.5
+    score *= TYPE_WEIGHTS.get(memory_type, 1.0)
+    return min(9.0, max(0.2, score))
+
+
+def test_keyword_shared_by_two_lexicons_counts_in_both():
+    scorer = ImportanceScorer(
+        lexicons={'important': ['jamais', 'Toujours'], 'temporal': ['toujours']},
+        category_weights={'important': 1.0, 'temporal': 0.5},
+        type_weights={},
+    )
+    assert scorer.keywords == {'jamais': 1.0, 'toujours': 1.5}
+    # 1 + 2 × (1.0 + 0.5) + 1 × 1.0 + bonus de longueur (5 mots)
+    assert scorer.score('toujours et à jamais, toujours', 'conversation') == (
+        pytest.approx(1 + 3.0 + 1.0 + 0.05 * 0.5)
+    )
+
+
+@pytest.mark.parametrize(
+    'content, memory_type',
+    [
+        ("Je m'appelle Marie et je suis furieux ! Plus jamais ça.", 'event'),
+        ("Aujourd'hui c'est crucial : mon père est ému ?", 'conversation'),
+        ('Rien de spécial.', 'observation'),
+        ('toujours ' * 40, 'user_message'),
+    ],
+)
+def test_score_matches_legacy_formula(content, memory_type):
+    scorer = ImportanceScorer()
+    assert scorer.score(content, memory_type) == pytest.approx(
+        _legacy_importance(content, memory_type)
+    )
+    assert scorer.score_many([content], [memory_type]) == [
+        scorer.score(content, memory_type)
+    ]
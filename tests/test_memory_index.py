@@ -0,0 +1,247 @@
+"""Tests de l'index vectoriel en mémoire vive (recherche, ajout, suppression)."""
+
+import datetime
+
+import numpy as np
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base
+from backend.models.character import CharacterModel
+from backend.models.memory import MemoryModel
+from backend.services.ann_index import IVFIndex
+from backend.services.memory_index import CharacterMemoryIndex, MemoryIndexRegistry
+from backend.services.memory_scoring import RelevanceScorer
+
+
+def _random_vectors(n, dimensions=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(n, dimensions)).astype(np.float32)
+
+
+def test_search_matches_brute_force_cosine():
+    vectors = _random_vectors(300)
+    index = CharacterMemoryIndex(16, capacity=8)  # force plusieurs agrandissements
+    index.add(np.arange(1, 301), vectors)
+    query = vectors[42] + 0.01
+
+    ids, scores = index.search(query, 5)
+
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    expected = normed @ (query / np.linalg.norm(query))
+    assert ids.tolist() == (np.argsort(-expected)[:5] + 1).tolist()
+    assert ids[0] == 43
+    assert np.allclose(scores, np.sort(expected)[::-1][:5], atol=1e-5)
+
+
+def test_remove_compacts_and_keeps_positions():
+    vectors = _random_vectors(10)
+    index = CharacterMemoryIndex(16)
+    index.add(np.arange(10, 20), vectors)
+
+    assert index.remove([12, 15, 99]) == 2
+    assert len(index) == 8
+    assert 12 not in index.ids.tolist()
+    assert index.position(16) == index.ids.tolist().index(16)
+
+    ids, _ = index.search(vectors[6], 1)
+    assert ids.tolist() == [16]
+
+
+def test_add_replaces_existing_id():
+    vectors = _random_vectors(3)
+    index = CharacterMemoryIndex(16)
+    index.add([1, 2, 3], vectors)
+    index.add([2], vectors[0])
+
+    assert len(index) == 3
+    ids, _ = index.search(vectors[0], 2)
+    assert set(ids.tolist()) == {1, 2}
+
+
+def test_search_on_empty_index():
+    index = CharacterMemoryIndex(16)
+    ids, scores = index.search(np.ones(16), 5)
+    assert ids.size == 0 and scores.size == 0
+
+
+def _clustered_vectors(n, dimensions=16, clusters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimensions))
+    labels = rng.integers(0, clusters, n)
+    noise = rng.normal(scale=0.3, size=(n, dimensions))
+    return (centers[labels] + noise).astype(np.float32)
+
+
+def test_ivf_recall_and_incremental_updates(tmp_path):
+    vectors = _clustered_vectors(3000)
+    index = CharacterMemoryIndex(16)
+    index.ann = IVFIndex(16, nlist=20, nprobe=5, min_size=1000, path=tmp_path / 'a.npz')
+    index.add(np.arange(1, 3001), vectors)
+
+    queries = vectors[:50] + 0.05
+    hits = 0
+    for query in queries:
+        exact = np.argsort(-index.similarities(query))[:10] + 1
+        approx, _ = index.search(query, 10)
+        hits += len(set(exact.tolist()) & set(approx.tolist()))
+    assert index.ann.trained
+    assert hits / (10 * len(queries)) > 0.9
+
+    # Ajout puis suppression : l'index approché reste aligné sur les lignes
+    index.add([5000], vectors[7] + 0.001)
+    ids, _ = index.search(vectors[7], 2)
+    assert 5000 in ids.tolist()
+    index.remove([5000, 8])
+    ids, _ = index.search(vectors[7], 2)
+    assert 5000 not in ids.tolist() and 8 not in ids.tolist()
+
+
+def test_ivf_reload_reuses_persisted_centroids(tmp_path):
+    vectors = _clustered_vectors(2000)
+    path = tmp_path / 'a.npz'
+    first = IVFIndex(16, nlist=10, min_size=100, path=path)
+    first.train(np.arange(2000), vectors / np.linalg.norm(vectors, axis=1)[:, None])
+
+    second = IVFIndex(16, nlist=10, min_size=100, path=path)
+    normed = vectors / np.linalg.norm(vectors, axis=1)[:, None]
+    assert second.load(np.arange(2000), normed)
+    assert np.array_equal(second.centroids, first.centroids)
+    assert not second.needs_training(2000)
+
+
+def test_relevance_scorer_honours_weights():
+    now = datetime.datetime(2025, 1, 1)
+    vectors = np.eye(16, dtype=np.float32)[:3]
+    index = CharacterMemoryIndex(16)
+    index.add(
+        [1, 2, 3],
+        vectors,
+        created_at=[
+            (now - datetime.timedelta(days=300)).timestamp(),
+            now.timestamp(),
+            now.timestamp(),
+        ],
+        importance=[1.0, 1.0, 9.0],
+    )
+    query = vectors[0]
+
+    by_similarity = RelevanceScorer().rank(index, query, 1, 0.0, 0.0, now=now)
+    assert by_similarity[0].memory_id == 1
+    assert by_similarity[0].similarity == 1.0
+
+    by_importance = RelevanceScorer().rank(index, query, 1, 0.0, 1.0, now=now)
+    assert by_importance[0].memory_id == 3
+    assert by_importance[0].importance == 0.9
+
+    by_recency = RelevanceScorer().rank(index, query, 3, 1.0, 0.0, now=now)
+    assert by_recency[-1].memory_id == 1
+    assert round(by_recency[-1].recency, 3) == round(1 - 300 / 365, 3)
+
+    # Les attributs mis à jour sont pris en compte au tour suivant
+    index.update([2], importance=10.0, access_count=40)
+    top = RelevanceScorer().rank(index, query, 1, 0.0, 1.0, now=now)[0]
+    assert top.memory_id == 2
+    assert top.relevance == 1.0 + 0.2
+
+
+def test_int8_index_rescores_in_full_precision():
+    vectors = _clustered_vectors(2000, dimensions=64)
+    exact = CharacterMemoryIndex(64)
+    exact.add(np.arange(1, 2001), vectors)
+    quantized = CharacterMemoryIndex(64, capacity=8, quantization='int8', rescore=50)
+    quantized.add(np.arange(1, 2001), vectors)
+    assert quantized.nbytes < exact.nbytes / 2
+    assert np.abs(quantized.vectors - exact.vectors).max() < 0.01
+
+    query = vectors[3] + 0.05
+    approx = quantized.similarities(query)
+    assert np.abs(approx - exact.similarities(query)).max() < 0.02
+
+    by_id = dict(zip(range(1, 2001), vectors))
+    quantized.exact_loader = lambda ids: {i: by_id[i] for i in ids}
+    expected_ids, expected_scores = exact.search(query, 10)
+    ids, scores = quantized.search(query, 10)
+    assert ids.tolist() == expected_ids.tolist()
+    assert np.allclose(scores, expected_scores, atol=1e-5)
+
+    # Suppression : les échelles restent alignées sur les codes
+    quantized.remove(expected_ids[:3])
+    exact.remove(expected_ids[:3])
+    assert np.abs(quantized.vectors - exact.vectors).max() < 0.01
+
+    now = datetime.datetime(2025, 1, 1)
+    for scorer_index in (exact, quantized):
+        scorer_index.update(
+            scorer_index.ids, created_at=now.timestamp(), importance=1.0
+        )
+    expected = RelevanceScorer().rank(exact, query, 5, now=now)
+    ranked = RelevanceScorer().rank(quantized, query, 5, now=now)
+    assert [m.memory_id for m in ranked] == [m.memory_id for m in expected]
+    assert np.allclose(
+        [m.similarity for m in ranked], [m.similarity for m in expected], atol=1e-5
+    )
+
+
+def test_registry_reloads_only_when_another_writer_changed_the_table(tmp_path):
+    from backend import models  # noqa: F401  (enregistre les tables)
+
+    engine = create_engine(
+        f'sqlite:///{tmp_path / "test.db"}', connect_args={'check_same_thread': False}
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    vectors = _random_vectors(5)
+
+    def memory(memory_id):
+        return MemoryModel(
+            id=memory_id,
+            character_id=1,
+            type='conversation',
+            content=f'Souvenir {memory_id}',
+            embedding=vectors[memory_id - 1],
+        )
+
+    db = factory()
+    db.add(
+        CharacterModel(id=1, name='Testeur', description='Test', personality='Calme')
+    )
+    db.add_all([memory(1), memory(2), memory(3)])
+    db.commit()
+    # Ligne héritée dont l'embedding JSON vaut 'null' : jamais indexée
+    db.execute(text("UPDATE memories SET embedding = 'null' WHERE id = 3"))
+    db.commit()
+
+    registry = MemoryIndexRegistry(dimensions=16)
+    index = registry.get(db, 1)
+    assert sorted(index.ids.tolist()) == [1, 2]
+
+    statements = []
+    event.listen(
+        engine, 'before_cursor_execute', lambda *args: statements.append(args[2])
+    )
+    # Aucun rechargement ni comptage des lignes tant que rien n'a changé
+    assert registry.get(db, 1) is index
+    assert registry.get(db, 1) is index
+    assert not [s for s in statements if 'count(' in s.lower()]
+    assert len(statements) == 2
+
+    # Écriture de ce processus, répercutée par le registre : pas de rechargement
+    db.add(memory(4))
+    db.commit()
+    registry.add(db, 1, [4], vectors[3:4])
+    db.query(MemoryModel).filter_by(id=1).delete()
+    db.commit()
+    registry.remove(db, 1, [1])
+    assert registry.get(db, 1) is index
+    assert sorted(index.ids.tolist()) == [2, 4]
+
+    # Écriture d'un autre processus : l'index est rechargé
+    with factory() as other:
+        other.add(memory(5))
+        other.commit()
+    reloaded = registry.get(db, 1)
+    assert reloaded is not index
+    assert sorted(reloaded.ids.tolist()) == [2, 4, 5]
+    assert registry.get(db, 1) is reloaded
+    db.close()
@@ -0,0 +1,180 @@
+"""Pipeline de mémorisation en arrière-plan : étapes, reprise et relance."""
+
+import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base
+from backend.models.character import CharacterModel
+from backend.models.memory import FactModel, MemoryJobModel, MemoryModel
+from backend.services.memory_pipeline import MemoryPipeline
+
+
+class RecordingTraits:
+    """Remplace le gestionnaire de traits ; échoue un nombre donné de fois"""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = []
+
+    def update_traits_from_interaction(self, db, character_id, text, intensity=1.0):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError('base indisponible')
+        self.calls.append((character_id, text))
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    from backend import models  # noqa: F401  (enregistre les tables)
+
+    engine = create_engine(
+        f'sqlite:///{tmp_path / "test.db"}', connect_args={'check_same_thread': False}
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        db.add(
+            CharacterModel(
+                id=1,
+                name='Testeur',
+                description='Un personnage de test pour les tests unitaires.',
+                personality='Calme et curieux.',
+            )
+        )
+        db.commit()
+    return factory
+
+
+def _pipeline(session_factory, traits, **kwargs):
+    from backend.services.memory_manager import MemoryManager
+
+    return MemoryPipeline(
+        session_factory=session_factory,
+        manager=MemoryManager(),
+        traits=traits,
+        retry_delay=0.01,
+        **kwargs,
+    )
+
+
+def test_submit_runs_every_stage(session_factory):
+    traits = RecordingTraits()
+    pipeline = _pipeline(session_factory, traits)
+
+    job_id = pipeline.submit(1, "User: J'aime le jazz.\nMoi aussi !", "J'aime le jazz.")
+    assert pipeline.drain(timeout=30)
+    pipeline.stop()
+
+    with session_factory() as db:
+        # Le job terminé ne laisse aucune ligne dans memory_jobs
+        assert db.get(MemoryJobModel, job_id) is None
+        assert db.query(MemoryJobModel).count() == 0
+        memory = db.query(MemoryModel).one()
+        assert memory.type == 'conversation'
+        assert memory.importance > 1.0
+        fact = db.query(FactModel).one()
+        assert (fact.predicate, fact.object, fact.source_memory_id) == (
+            'aime',
+            'jazz',
+            memory.id,
+        )
+    assert traits.calls == [(1, "J'aime le jazz.")]
+    assert pipeline.stats['completed'] == 1
+
+
+def test_failed_stage_is_retried_then_abandoned(session_factory):
+    traits = RecordingTraits(failures=1)
+    pipeline = _pipeline(session_factory, traits, max_attempts=2)
+
+    pipeline.submit(1, 'Premier échange', 'Bonjour')
+    assert pipeline.drain(timeout=30)
+    traits.failures = 2
+    pipeline.submit(1, 'Second échange', 'Salut')
+    assert pipeline.drain(timeout=30)
+    pipeline.stop()
+
+    with session_factory() as db:
+        # Seul le job abandonné reste (SQLite peut réattribuer l'id du premier)
+        job = db.query(MemoryJobModel).one()
+        assert job.content == 'Second échange'
+        assert job.status == 'failed'
+        assert job.attempts == 2
+        assert 'base indisponible' in job.last_error
+        # La mémoire déjà enregistrée n'est pas dupliquée par les relances
+        assert db.query(MemoryModel).count() == 2
+    assert pipeline.stats == {'submitted': 2, 'completed': 1, 'retried': 2, 'failed': 1}
+
+
+def test_recover_resumes_unfinished_jobs(session_factory):
+    with session_factory() as db:
+        db.add(
+            MemoryJobModel(
+                character_id=1,
+                content='Échange interrompu',
+                interaction_text='Au revoir',
+                stage='importance',
+            )
+        )
+        db.add(MemoryJobModel(character_id=1, content='Ancien', status='done'))
+        db.commit()
+
+    traits = RecordingTraits()
+    pipeline = _pipeline(session_factory, traits)
+    assert pipeline.recover() == 1
+    assert pipeline.drain(timeout=30)
+    pipeline.stop()
+
+    with session_factory() as db:
+        assert db.query(MemoryJobModel).count() == 0
+        assert db.query(MemoryModel).one().content == 'Échange interrompu'
+    assert traits.calls == [(1, 'Au revoir')]
+
+
+def test_each_pending_job_is_recovered_by_a_single_process(session_factory):
+    with session_factory() as db:
+        db.add(MemoryJobModel(character_id=1, content='Échange', stage='traits'))
+        db.add(
+            MemoryJobModel(
+                character_id=1,
+                content='Échange en cours ailleurs',
+                stage='traits',
+                status='running',
+                owner='autre:1',
+                leased_at=datetime.datetime.now(),
+            )
+        )
+        db.commit()
+
+    traits = RecordingTraits()
+    first = _pipeline(session_factory, traits)
+    second = _pipeline(session_factory, traits)
+    # Deux workers uvicorn qui démarrent : un seul réclame le job en attente
+    assert first.recover() + second.recover() == 1
+    assert first.drain(timeout=30) and second.drain(timeout=30)
+    first.stop()
+    second.stop()
+
+    with session_factory() as db:
+        assert db.query(MemoryJobModel).one().owner == 'autre:1'
+
+
+def test_stage_that_commits_before_failing_is_not_replayed(session_factory):
+    class CommittingTraits(RecordingTraits):
+        def update_traits_from_interaction(self, db, character_id, text, intensity=1.0):
+            self.calls.append((character_id, text))
+            db.commit()  # comme PersonalityService.update_trait
+            raise RuntimeError('erreur après validation')
+
+    traits = CommittingTraits()
+    pipeline = _pipeline(session_factory, traits)
+    pipeline.submit(1, 'Échange', 'Bonjour')
+    assert pipeline.drain(timeout=30)
+    pipeline.stop()
+
+    assert traits.calls == [(1, 'Bonjour')]
+    assert pipeline.stats['completed'] == 1 and pipeline.stats['retried'] == 0
+    with session_factory() as db:
+        assert db.query(MemoryJobModel).count() == 0
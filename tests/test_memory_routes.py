@@ -7,7 +7,7 @@ mirroring the pattern used in backend/routes/characters.py tests.
 
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 
 from backend.app import app
@@ -101,6 +101,18 @@ def test_get_memory_not_found(client):
     assert r.status_code == 404
 
 
+def test_missing_archive_table_is_created_on_demand(client):
+    """A database created before archiving existed still answers 404."""
+    db = next(app.dependency_overrides[get_db]())
+    db.execute(text('DROP TABLE memory_archive'))
+    db.commit()
+    db.close()
+
+    assert client.get('/api/memory/memories/99999').status_code == 404
+    assert client.post('/api/memory/memories/99999/restore').status_code == 404
+    assert client.delete('/api/memory/memories/99999').status_code == 404
+
+
 def test_update_importance(client):
     """PUT /importance updates importance and returns success."""
     payload = {
@@ -158,6 +170,11 @@ def test_maintenance_cycle(client):
     assert data['success'] is True
     assert 'statistics' in data
 
+    # The manual run is reported by the scheduler status endpoint
+    r2 = client.get('/api/memory/maintenance/status')
+    assert r2.status_code == 200, r2.text
+    assert '999' in r2.json()['characters']
+
 
 def test_character_id_mismatch(client):
     """POST with mismatched character_id returns 400."""
@@ -169,3 +186,56 @@ def test_character_id_mismatch(client):
     }
     r = client.post('/api/memory/character/999/memories', json=payload)
     assert r.status_code == 400
+
+
+def test_bulk_create_reports_per_item_status(client):
+    """POST /memories/bulk creates valid items in one batch and reports errors."""
+    items = [
+        {'memory_type': 'conversation', 'content': "J'aime le jazz."},
+        {'memory_type': 'unknown', 'content': 'Type invalide.'},
+        {'character_id': 1, 'memory_type': 'event', 'content': 'Mauvais personnage.'},
+        {'memory_type': 'event', 'content': 'Un événement important.', 'importance': 6},
+    ]
+    r = client.post('/api/memory/character/999/memories/bulk', json=items)
+    assert r.status_code == 200, r.text
+    data = r.json()
+    assert data['created'] == 2 and data['failed'] == 2
+    assert [item['status'] for item in data['items']] == [
+        'created',
+        'error',
+        'error',
+        'created',
+    ]
+
+    memories = client.get('/api/memory/character/999/memories').json()
+    assert {m['content'] for m in memories} == {
+        "J'aime le jazz.",
+        'Un événement important.',
+    }
+    facts = client.get('/api/memory/character/999/facts').json()
+    assert [(f['predicate'], f['object']) for f in facts] == [('aime', 'jazz')]
+
+
+def test_bulk_create_accepts_ndjson(client):
+    """NDJSON bodies are parsed line by line; a bad line does not block the rest."""
+    body = '\n'.join(
+        [
+            '{"memory_type": "observation", "content": "Première ligne."}',
+            '',
+            '{pas du json',
+            '{"memory_type": "observation", "content": "Dernière ligne."}',
+        ]
+    )
+    r = client.post(
+        '/api/memory/character/999/memories/bulk',
+        content=body,
+        headers={'content-type': 'application/x-ndjson'},
+    )
+    assert r.status_code == 200, r.text
+    data = r.json()
+    assert data['created'] == 2
+    assert [(i['index'], i['status']) for i in data['items']] == [
+        (0, 'created'),
+        (2, 'error'),
+        (3, 'created'),
+    ]
@@ -0,0 +1,110 @@
+"""Recherche hybride : index plein texte FTS5 et fusion par rang réciproque."""
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base
+from backend.models.character import CharacterModel
+from backend.models.memory import MemoryModel
+from backend.services.memory_index import CharacterMemoryIndex
+from backend.services.memory_scoring import RelevanceScorer, reciprocal_rank_fusion
+from backend.services.memory_search import LexicalMemoryIndex
+
+
+@pytest.fixture
+def session(tmp_path):
+    from backend import models  # noqa: F401  (enregistre les tables)
+
+    engine = create_engine(
+        f'sqlite:///{tmp_path / "test.db"}', connect_args={'check_same_thread': False}
+    )
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    for character_id in (1, 2):
+        db.add(
+            CharacterModel(
+                id=character_id,
+                name=f'Testeur {character_id}',
+                description='Un personnage de test pour les tests unitaires.',
+                personality='Calme et curieux.',
+            )
+        )
+    db.commit()
+    yield db
+    db.close()
+
+
+def _memory(db, character_id, content):
+    memory = MemoryModel(
+        character_id=character_id, type='conversation', content=content, importance=1.0
+    )
+    db.add(memory)
+    db.commit()
+    return memory.id
+
+
+def test_fts_indexes_history_and_follows_writes(session):
+    old = _memory(session, 1, 'Le dragon Élodrin garde la passe du nord.')
+    lexical = LexicalMemoryIndex()
+
+    # Les mémoires antérieures à la création de la table sont indexées
+    assert lexical.search(session, 1, 'Où vit elodrin ?', 10) == [old]
+
+    new = _memory(session, 1, 'Elodrin, encore Elodrin : toujours Elodrin.')
+    _memory(session, 2, 'Élodrin est un nom inconnu ici.')
+    assert lexical.search(session, 1, 'élodrin', 10) == [new, old]
+
+    session.execute(
+        update(MemoryModel).where(MemoryModel.id == old).values(content='Une forêt.')
+    )
+    session.commit()
+    assert lexical.search(session, 1, 'dragon', 10) == []
+    assert lexical.search(session, 1, 'forêt', 10) == [old]
+
+    session.delete(session.get(MemoryModel, new))
+    session.commit()
+    assert lexical.search(session, 1, 'elodrin', 10) == []
+
+
+def test_match_expression_quotes_terms():
+    lexical = LexicalMemoryIndex(max_terms=2)
+    assert lexical.match_expression('"NEAR(a b)" OR -x') == '"near" OR "a"'
+    assert lexical.match_expression('?!') is None
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 4]], k=1)
+    assert [memory_id for memory_id, _ in fused] == [3, 1, 2, 4]
+    assert fused[0][1] == pytest.approx(1 / 4 + 1 / 2)
+
+
+def test_rank_hybrid_surfaces_lexical_match():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(200, 16)).astype(np.float32)
+    index = CharacterMemoryIndex(16)
+    index.add(
+        np.arange(1, 201), vectors, created_at=0.0, importance=1.0, access_count=0
+    )
+    query = vectors[0]
+    scorer = RelevanceScorer()
+
+    vector_only = [m.memory_id for m in scorer.rank(index, query, 5)]
+    remote = next(
+        memory_id
+        for memory_id in reversed(index.search(query, 200)[0].tolist())
+        if memory_id not in vector_only
+    )
+
+    ranked = scorer.rank_hybrid(index, query, [remote, 999], 5, candidates=10)
+    ids = [m.memory_id for m in ranked]
+    assert len(ids) == 5
+    assert remote in ids
+    assert ids[0] == vector_only[0]
+    # Le détail reste multi-critères ; la pertinence suit l'ordre fusionné
+    detail = scorer.score(index, query, [remote])[0]
+    assert ranked[ids.index(remote)][2:] == detail[2:]
+    relevance = [m.relevance for m in ranked]
+    assert relevance == sorted(relevance, reverse=True)
+    assert relevance[0] == pytest.approx(1 / 61)
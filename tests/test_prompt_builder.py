@@ -0,0 +1,96 @@
+"""Assemblage du prompt sous le budget de jetons du modèle."""
+
+from backend.services.prompt_builder import (
+    PromptAssembler,
+    count_tokens,
+    truncate_to_tokens,
+)
+
+SHARES = {'profile': 0.25, 'facts': 0.10, 'memories': 0.25, 'history': 1.0}
+
+
+def _assembler(max_context_length=1000):
+    return PromptAssembler(
+        max_context_length=max_context_length,
+        reply_tokens=200,
+        shares=SHARES,
+        safety_margin=50,
+    )
+
+
+def test_count_tokens_counts_words_and_punctuation():
+    assert count_tokens('') == 0
+    assert count_tokens('Bonjour, toi !') == 5  # bonj|our , toi !
+    assert count_tokens('un deux trois') == 4
+
+
+def test_truncate_to_tokens_keeps_a_prefix_within_budget():
+    text = 'un deux trois quatre cinq'
+    assert truncate_to_tokens(text, 100) == text
+    short = truncate_to_tokens(text, 4)
+    assert text.startswith(short) and count_tokens(short) <= 4
+
+
+def test_small_prompt_keeps_every_section_in_order():
+    prompt = _assembler().assemble(
+        'Et maintenant ?',
+        system_prompt='Tu es Alezia.',
+        profile='Alezia, exploratrice.',
+        facts=['user aime le thé'],
+        memories=["L'utilisateur a visité Lyon."],
+        history=[('assistant', 'Bonjour !'), ('user', 'Salut')],
+    )
+    text = prompt.text
+    assert text.index('# CHARACTER PROFILE:') < text.index('# KNOWN FACTS:')
+    assert text.index('# RELEVANT MEMORIES:') < text.index('# CONVERSATION:')
+    assert text.index('User: Salut') < text.index('Assistant: Bonjour !')
+    assert text.endswith('User: Et maintenant ?\nAssistant: ')
+
+
+def test_long_inputs_never_exceed_the_context_window():
+    assembler = _assembler(max_context_length=1000)
+    history = [('user', f'Message numéro {i} ' + 'bla ' * 20) for i in range(200)]
+    prompt = assembler.assemble(
+        'Question finale',
+        system_prompt='Consigne',
+        profile='Profil très détaillé ' * 500,
+        facts=[f'fait {i}' for i in range(500)],
+        memories=[f'souvenir {i} ' + 'détail ' * 10 for i in range(100)],
+        history=history,
+    )
+    budget = 1000 - 200 - 50
+    assert prompt.tokens <= budget
+    assert count_tokens(prompt.text) + count_tokens('Consigne') <= budget
+    # Chaque section est plafonnée à sa part, l'historique prend le reste
+    assert prompt.sections['profile'] <= 0.25 * budget
+    assert prompt.sections['facts'] <= 0.10 * budget
+    # Les messages les plus récents sont conservés
+    assert 'Message numéro 0 ' in prompt.text
+    assert 'Message numéro 199 ' not in prompt.text
+
+
+def test_unused_share_rolls_over_to_history():
+    assembler = _assembler(max_context_length=1000)
+    history = [('user', f'm{i} ' + 'mot ' * 10) for i in range(100)]
+    prompt = assembler.assemble('Question', history=history)
+    assert prompt.sections['history'] > 0.5 * (1000 - 200 - 50)
+
+
+def test_continuation_turn_fits_what_the_context_leaves():
+    assembler = _assembler(max_context_length=1000)
+    memories = [f'souvenir {i} ' + 'détail ' * 10 for i in range(100)]
+    prompt = assembler.assemble_turn(
+        'Et ensuite ?',
+        context_tokens=600,
+        facts=['user aime le thé'],
+        memories=memories,
+    )
+    assert prompt.tokens <= 1000 - 600 - 200 - 50
+    assert prompt.text.startswith('# KNOWN FACTS:\n- user aime le thé')
+    assert prompt.text.endswith('\n\nUser: Et ensuite ?\nAssistant: ')
+    assert prompt.kept['facts'] == ['user aime le thé']
+    assert prompt.kept['memories'] == memories[: len(prompt.kept['memories'])]
+    assert 0 < len(prompt.kept['memories']) < len(memories)
+
+    alone = assembler.assemble_turn('Et ensuite ?', context_tokens=600)
+    assert alone.text == 'User: Et ensuite ?\nAssistant: '
@@ -0,0 +1,47 @@
+"""Cache des contextes KV d'Ollama par session de chat."""
+
+from backend.services.session_context import SessionContextCache
+
+
+def test_context_is_reused_only_under_the_same_fingerprint():
+    cache = SessionContextCache(max_tokens=100, headroom=10)
+    first = cache.fingerprint('llama3', 'Consigne', 'Profil')
+    cache.store('s1', first, [1, 2, 3], sent=['Alice aime le thé'])
+
+    assert cache.lookup('s1', first) == ([1, 2, 3], {'Alice aime le thé'})
+    changed = cache.fingerprint('llama3', 'Consigne', 'Profil modifié')
+    assert cache.lookup('s1', changed) is None
+    # L'entrée invalidée est supprimée, même sous l'ancienne empreinte
+    assert cache.lookup('s1', first) is None
+    assert cache.stats == {'hits': 1, 'misses': 2, 'invalidations': 1}
+
+
+def test_full_context_window_falls_back_to_full_prompt():
+    cache = SessionContextCache(max_tokens=100, headroom=10)
+    fingerprint = cache.fingerprint('llama3')
+    cache.store('s1', fingerprint, list(range(90)))
+    assert cache.lookup('s1', fingerprint).tokens == list(range(90))
+    cache.store('s1', fingerprint, list(range(91)))
+    assert cache.lookup('s1', fingerprint) is None
+
+
+def test_new_message_must_fit_next_to_the_context():
+    cache = SessionContextCache(max_tokens=100, headroom=10)
+    fingerprint = cache.fingerprint('llama3')
+    cache.store('s1', fingerprint, list(range(80)))
+    assert cache.lookup('s1', fingerprint, turn_tokens=10) is not None
+    assert cache.lookup('s1', fingerprint, turn_tokens=11) is None
+    assert cache.lookup('s1', fingerprint) is None  # entrée abandonnée
+
+
+def test_least_recently_used_session_is_evicted():
+    cache = SessionContextCache(max_sessions=2)
+    fingerprint = cache.fingerprint('llama3')
+    cache.store('a', fingerprint, [1])
+    cache.store('b', fingerprint, [2])
+    cache.lookup('a', fingerprint)
+    cache.store('c', fingerprint, [3])
+
+    assert cache.lookup('b', fingerprint) is None
+    assert cache.lookup('a', fingerprint).tokens == [1]
+    assert cache.lookup('c', fingerprint).tokens == [3]